@@ -0,0 +1,332 @@
+"""
+Caché con expiración y etiquetas de invalidación.
+
+El backend se elige con CACHE_BACKEND: "memoria" (LRU del proceso, por defecto) o
+"redis" (compartido entre procesos; requiere el paquete redis y CACHE_URL).
+"""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Protocol, Set, Tuple, Union
+
+# Número máximo de entradas antes de descartar las menos usadas
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "2048"))
+
+# Segundos por defecto de las respuestas guardadas con @cacheado. Las escrituras de los
+# repositorios las invalidan antes; el límite cubre cambios hechos fuera de la aplicación.
+RESPUESTAS_TTL = 300
+
+# Segundos de vida de los conjuntos de etiquetas de CacheCompartida. Es también el
+# máximo de vida de un valor, para que ningún valor sobreviva al conjunto que permite
+# invalidarlo; los conjuntos abandonados desaparecen solos.
+ETIQUETAS_TTL = 24 * 3600
+
+
+class CacheMemoria:
+    """
+    Caché LRU en memoria con expiración opcional por entrada.
+
+    Cada entrada puede llevar etiquetas (por ejemplo "citas:doctor:12:2026-10-20");
+    invalidar una etiqueta descarta todas las entradas asociadas. Así las escrituras
+    solo necesitan conocer qué datos cambiaron, no qué claves los contienen.
+    """
+
+    def __init__(self, max_entradas: int = CACHE_MAX_ENTRADAS):
+        self._max = max_entradas
+        self._entradas: "OrderedDict[str, Tuple[Any, Optional[float], Tuple[str, ...]]]" = OrderedDict()
+        self._por_etiqueta: Dict[str, Set[str]] = {}
+        self._invalidaciones = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        """Retorna el valor guardado o None si no existe o expiró"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            valor, expira, _ = entrada
+            if expira is not None and time.monotonic() >= expira:
+                self._descartar(clave)
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(
+        self,
+        clave: str,
+        valor: Any,
+        etiquetas: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        marca: Optional[int] = None
+    ) -> None:
+        """
+        Guarda un valor con sus etiquetas y, opcionalmente, un tiempo de vida en segundos.
+
+        Si se indica `marca` (obtenida con marca() antes de calcular el valor) y desde
+        entonces hubo alguna invalidación, no se guarda: el valor pudo quedar obsoleto.
+        """
+        expira = time.monotonic() + ttl if ttl is not None else None
+        etiquetas = tuple(etiquetas)
+        with self._lock:
+            if marca is not None and marca != self._invalidaciones:
+                return
+            if clave in self._entradas:
+                self._descartar(clave)
+            self._entradas[clave] = (valor, expira, etiquetas)
+            for etiqueta in etiquetas:
+                self._por_etiqueta.setdefault(etiqueta, set()).add(clave)
+            while len(self._entradas) > self._max:
+                self._descartar(next(iter(self._entradas)))
+
+    def invalidar(self, *etiquetas: str) -> None:
+        """Descarta todas las entradas asociadas a alguna de las etiquetas"""
+        with self._lock:
+            self._invalidaciones += 1
+            for etiqueta in etiquetas:
+                for clave in self._por_etiqueta.pop(etiqueta, set()):
+                    self._descartar(clave)
+
+    def marca(self) -> int:
+        """Contador de invalidaciones, para guardar() condicional"""
+        return self._invalidaciones
+
+    def limpiar(self) -> None:
+        """Descarta todas las entradas"""
+        with self._lock:
+            self._invalidaciones += 1
+            self._entradas.clear()
+            self._por_etiqueta.clear()
+
+    def _descartar(self, clave: str) -> None:
+        entrada = self._entradas.pop(clave, None)
+        if entrada is None:
+            return
+        for etiqueta in entrada[2]:
+            claves = self._por_etiqueta.get(etiqueta)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_etiqueta[etiqueta]
+
+
+class Almacen(Protocol):
+    """
+    Operaciones que CacheCompartida necesita de un almacén clave-valor compartido.
+    Es un subconjunto del cliente de redis-py, así que un redis.Redis sirve tal cual.
+
+    eval debe ejecutar el script completo de forma atómica, sin que se intercalen
+    comandos de otros clientes (Redis lo garantiza): guardar() compara la marca y
+    escribe el valor y sus etiquetas en un solo paso.
+    """
+
+    def get(self, clave: str) -> Optional[bytes]: ...
+    def delete(self, *claves: str) -> Any: ...
+    def smembers(self, clave: str) -> Set[Union[bytes, str]]: ...
+    def incr(self, clave: str) -> int: ...
+    def scan_iter(self, match: str) -> Iterator[Union[bytes, str]]: ...
+    def eval(self, script: str, numkeys: int, *claves_y_argumentos: Any) -> Any: ...
+
+
+# Guarda un valor y lo añade a los conjuntos de sus etiquetas solo si el contador de
+# invalidaciones sigue en la marca recibida (ARGV[1] vacío: sin marca).
+# KEYS: contador, clave del valor, conjuntos de etiqueta. ARGV: marca, valor, ttl, ttl_etiquetas.
+SCRIPT_GUARDAR = """
+if ARGV[1] ~= '' and tonumber(redis.call('GET', KEYS[1]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+for i = 3, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[2])
+    redis.call('EXPIRE', KEYS[i], ARGV[4])
+end
+return 1
+"""
+
+
+class CacheCompartida:
+    """
+    Caché sobre un almacén compartido entre procesos (p. ej. Redis), con la misma
+    interfaz que CacheMemoria.
+
+    Los valores se guardan con pickle; cada etiqueta es un conjunto con las claves que
+    la llevan y un contador global de invalidaciones hace las veces de marca().
+
+    Todo valor expira (como máximo a los ttl_etiquetas segundos) y cada vez que se
+    añade una clave a un conjunto de etiqueta se renueva la expiración del conjunto a
+    ttl_etiquetas, así que el conjunto siempre sobrevive a sus valores vigentes y deja
+    de existir cuando ya no se guardan valores con esa etiqueta.
+
+    guardar() con marca es un único script atómico (SCRIPT_GUARDAR): si la comparación
+    y la escritura fueran comandos separados, una invalidación de otro proceso entre
+    ambos dejaría el valor obsoleto en caché hasta que venza.
+    """
+
+    def __init__(self, almacen: Almacen, prefijo: str = "cache:", ttl_etiquetas: int = ETIQUETAS_TTL):
+        self._almacen = almacen
+        self._prefijo = prefijo
+        self._ttl_etiquetas = ttl_etiquetas
+
+    def _contador(self) -> str:
+        return f"{self._prefijo}invalidaciones"
+
+    def _clave(self, clave: str) -> str:
+        return f"{self._prefijo}valor:{clave}"
+
+    def _etiqueta(self, etiqueta: str) -> str:
+        return f"{self._prefijo}etiqueta:{etiqueta}"
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        """Retorna el valor guardado o None si no existe o expiró"""
+        datos = self._almacen.get(self._clave(clave))
+        return pickle.loads(datos) if datos is not None else None
+
+    def guardar(
+        self,
+        clave: str,
+        valor: Any,
+        etiquetas: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        marca: Optional[int] = None
+    ) -> None:
+        """Guarda un valor con sus etiquetas, como CacheMemoria.guardar(); sin ttl expira a los ttl_etiquetas segundos"""
+        ttl = self._ttl_etiquetas if ttl is None else min(max(int(ttl), 1), self._ttl_etiquetas)
+        claves = [self._contador(), self._clave(clave), *(self._etiqueta(e) for e in etiquetas)]
+        self._almacen.eval(
+            SCRIPT_GUARDAR, len(claves), *claves,
+            "" if marca is None else str(marca), pickle.dumps(valor), ttl, self._ttl_etiquetas
+        )
+
+    def invalidar(self, *etiquetas: str) -> None:
+        """Descarta todas las entradas asociadas a alguna de las etiquetas"""
+        # El contador aumenta antes de leer los conjuntos: un guardar() con la marca
+        # anterior que llegue después ya no escribe
+        self._almacen.incr(self._contador())
+        for etiqueta in etiquetas:
+            conjunto = self._etiqueta(etiqueta)
+            claves = [c.decode() if isinstance(c, bytes) else c for c in self._almacen.smembers(conjunto)]
+            self._almacen.delete(conjunto, *claves)
+
+    def marca(self) -> int:
+        """Contador de invalidaciones, para guardar() condicional"""
+        valor = self._almacen.get(self._contador())
+        return int(valor) if valor is not None else 0
+
+    def limpiar(self) -> None:
+        """Descarta todas las entradas de este prefijo"""
+        self._almacen.incr(self._contador())
+        claves = [c.decode() if isinstance(c, bytes) else c for c in self._almacen.scan_iter(match=f"{self._prefijo}*")]
+        claves = [c for c in claves if c != self._contador()]
+        if claves:
+            self._almacen.delete(*claves)
+
+
+class Cache:
+    """
+    Punto de acceso a la caché de la aplicación. Delega en un backend (CacheMemoria o
+    CacheCompartida) que se puede reemplazar con usar(), p. ej. en las pruebas.
+    """
+
+    def __init__(self, backend: Union[CacheMemoria, CacheCompartida]):
+        self.backend = backend
+
+    def usar(self, backend: Union[CacheMemoria, CacheCompartida]) -> None:
+        self.backend = backend
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        return self.backend.obtener(clave)
+
+    def guardar(
+        self,
+        clave: str,
+        valor: Any,
+        etiquetas: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        marca: Optional[int] = None
+    ) -> None:
+        self.backend.guardar(clave, valor, etiquetas, ttl, marca)
+
+    def invalidar(self, *etiquetas: str) -> None:
+        self.backend.invalidar(*etiquetas)
+
+    def marca(self) -> int:
+        return self.backend.marca()
+
+    def limpiar(self) -> None:
+        self.backend.limpiar()
+
+
+def crear_backend() -> Union[CacheMemoria, CacheCompartida]:
+    """Crea el backend indicado en CACHE_BACKEND"""
+    backend = os.getenv("CACHE_BACKEND", "memoria")
+    if backend == "memoria":
+        return CacheMemoria()
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requiere instalar el paquete redis") from e
+        return CacheCompartida(redis.Redis.from_url(os.getenv("CACHE_URL", "redis://localhost:6379/0")))
+    raise ValueError(f"CACHE_BACKEND no válido: {backend}")
+
+
+cache = Cache(crear_backend())
+
+
+def cacheado(
+    etiquetas: Union[Iterable[str], Callable[..., Iterable[str]]],
+    ttl: Optional[float] = RESPUESTAS_TTL,
+    ignorar: Tuple[str, ...] = ("db",)
+):
+    """
+    Decorador para endpoints de lectura: guarda la respuesta por función y argumentos.
+
+    Solo se guardan respuestas {"success": True, ...}. Si hubo una invalidación mientras
+    se calculaba, la respuesta no se guarda.
+
+    Args:
+        etiquetas: Etiquetas de la entrada, o una función que las calcula a partir de
+            los argumentos del endpoint (recibe los argumentos por nombre)
+        ttl: Segundos de vida de la entrada
+        ignorar: Argumentos que no forman parte de la clave (la sesión de base de datos)
+
+    Ejemplo:
+        @router.get("/doctor/{doctor_id}")
+        @cacheado(lambda doctor_id, **_: [f"horarios:doctor:{doctor_id}"])
+        def obtener_horarios_doctor(doctor_id: int, db: Session = Depends(get_db)): ...
+    """
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+        nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            valores = {n: v for n, v in argumentos.arguments.items() if n not in ignorar}
+            huella = hashlib.sha1(repr(sorted(valores.items())).encode("utf-8")).hexdigest()
+            clave = f"respuesta:{nombre}:{huella}"
+
+            respuesta = cache.obtener(clave)
+            if respuesta is not None:
+                return respuesta
+
+            marca = cache.marca()
+            respuesta = funcion(*args, **kwargs)
+            if isinstance(respuesta, dict) and respuesta.get("success"):
+                cache.guardar(
+                    clave,
+                    respuesta,
+                    etiquetas(**valores) if callable(etiquetas) else etiquetas,
+                    ttl,
+                    marca
+                )
+            return respuesta
+
+        return envoltura
+
+    return decorador
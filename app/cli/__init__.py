@@ -0,0 +1,3 @@
+"""
+Comandos de mantenimiento que se ejecutan con python -m app.cli.<comando>
+"""
@@ -0,0 +1,39 @@
+"""
+Recalcula las tablas estadistica_diaria y estadistica_anticipacion desde cita_medica y factura.
+
+Sirve para la carga inicial (backfill) y para reparar el acumulado si se desvió
+por escrituras hechas fuera de la aplicación.
+
+Uso:
+    python -m app.cli.reconstruir_estadisticas [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+"""
+import argparse
+import time
+from datetime import date
+
+from app.database import SessionLocal, init_db
+from app.repositories import estadisticas_repository
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula las estadísticas diarias de citas y facturas")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Primer día a recalcular (por defecto, todos)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Último día a recalcular (por defecto, todos)")
+    args = parser.parse_args(argv)
+
+    if args.desde and args.hasta and args.hasta < args.desde:
+        parser.error("--hasta no puede ser anterior a --desde")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        filas = estadisticas_repository.reconstruir(db, args.desde, args.hasta)
+        print(f"estadísticas: {filas} filas recalculadas en {time.perf_counter() - inicio:.2f} s")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
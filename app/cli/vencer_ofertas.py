@@ -0,0 +1,26 @@
+"""
+Devuelve a la cola las solicitudes de lista de espera cuya oferta venció sin respuesta
+y ofrece cada slot a la siguiente solicitud.
+
+Pensado para ejecutarse periódicamente (cron, cada pocos minutos).
+
+Uso:
+    python -m app.cli.vencer_ofertas
+"""
+import argparse
+
+from app.database import SessionLocal
+from app.services.lista_espera_service import ListaEsperaService
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reasigna los slots de las ofertas de lista de espera vencidas")
+    parser.parse_args(argv)
+
+    vencidas = ListaEsperaService.vencer_ofertas(SessionLocal)
+    print(f"lista de espera: {vencidas} ofertas vencidas reasignadas")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -49,13 +49,25 @@ def get_db():
     finally:
         db.close()
 
+def get_session_factory():
+    """
+    Dependencia que entrega la fábrica de sesiones, para el trabajo que se ejecuta
+    después de responder (BackgroundTasks, respuestas en streaming) y abre su propia
+    sesión. Las pruebas la reemplazan con dependency_overrides, igual que get_db.
+    Uso:
+        @router.delete("/example")
+        def example(background_tasks: BackgroundTasks, sesiones=Depends(get_session_factory)):
+            background_tasks.add_task(tarea, sesiones)
+    """
+    return SessionLocal
+
 def init_db():
     """
     Inicializa todas las tablas en la base de datos.
     Nota: En producción, usar migraciones con Alembic.
     """
     # Importar todos los modelos aquí para que SQLAlchemy los registre
-    from app.models import paciente, doctor, cita, horario, usuario, historia, factura
+    from app.models import paciente, doctor, cita, horario, usuario, historia, factura, lista_espera, estadistica
     
     Base.metadata.create_all(bind=engine)
 
@@ -7,7 +7,10 @@ from fastapi.responses import JSONResponse
 import os
 from dotenv import load_dotenv
 
-from app.database import check_connection
+from fastapi.concurrency import run_in_threadpool
+
+from app.database import SessionLocal, check_connection
+from app.repositories.indice_pacientes import indice_pacientes
 from app.routers import (
     pacientes_api,
     doctores_api,
@@ -16,7 +19,11 @@ from app.routers import (
     citas_api,
     historias_api,
     facturas_api,
-    metodos_pago_api
+    metodos_pago_api,
+    lista_espera_api,
+    calendario_api,
+    reportes_api,
+    dashboard_api
 )
 
 # Cargar variables de entorno
@@ -49,6 +56,21 @@ app.include_router(citas_api.router)
 app.include_router(historias_api.router)
 app.include_router(facturas_api.router)
 app.include_router(metodos_pago_api.router)
+app.include_router(lista_espera_api.router)
+app.include_router(calendario_api.router)
+app.include_router(reportes_api.router)
+app.include_router(dashboard_api.router)
+
+def _cargar_indices():
+    """Carga el índice de búsqueda de pacientes antes de atender peticiones"""
+    db = SessionLocal()
+    try:
+        indice_pacientes.cargar(db)
+        print("✅ Índice de búsqueda de pacientes cargado")
+    except Exception as e:
+        print(f"⚠️  No se pudo cargar el índice de pacientes (se cargará en la primera búsqueda): {e}")
+    finally:
+        db.close()
 
 @app.on_event("startup")
 async def startup_event():
@@ -58,6 +80,7 @@ async def startup_event():
     # Verificar conexión a base de datos
     if check_connection():
         print("✅ Conexión a base de datos MySQL exitosa")
+        await run_in_threadpool(_cargar_indices)
     else:
         print("❌ Error: No se pudo conectar a la base de datos MySQL")
         print("   Verifica las credenciales en el archivo .env")
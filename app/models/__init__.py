@@ -10,6 +10,8 @@ from app.models.cita import CitaMedica, EstadoCita
 from app.models.usuario import Usuario, RolUsuario
 from app.models.historia import HistoriaClinica
 from app.models.factura import Factura, MetodoPago, EstadoFactura
+from app.models.lista_espera import ListaEspera, EstadoListaEspera
+from app.models.estadistica import EstadisticaDiaria, EstadisticaAnticipacion
 
 __all__ = [
     "Paciente",
@@ -24,5 +26,9 @@ __all__ = [
     "HistoriaClinica",
     "Factura",
     "MetodoPago",
-    "EstadoFactura"
+    "EstadoFactura",
+    "ListaEspera",
+    "EstadoListaEspera",
+    "EstadisticaDiaria",
+    "EstadisticaAnticipacion"
 ]
\ No newline at end of file
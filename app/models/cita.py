@@ -1,7 +1,7 @@
 """
 Modelo SQLAlchemy para la entidad Cita Médica
 """
-from sqlalchemy import Column, Integer, String, Date, Time, ForeignKey, TIMESTAMP, func, Enum as SQLEnum, Text
+from sqlalchemy import Column, Integer, String, Date, Time, ForeignKey, TIMESTAMP, func, Enum as SQLEnum, Text, Computed, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -19,6 +19,15 @@ class CitaMedica(Base):
     Almacena las citas médicas agendadas entre pacientes y doctores.
     """
     __tablename__ = "cita_medica"
+    __table_args__ = (
+        # Un doctor no puede tener dos citas activas en la misma fecha y hora
+        UniqueConstraint('id_doctor', 'fecha', 'hora', 'slot_activo', name='uq_cita_slot_activo'),
+        # Orden del listado general y de su paginación por cursor
+        Index('ix_cita_fecha_hora', 'fecha', 'hora', 'id_cita'),
+        # Filtros del listado: citas de un paciente o en ciertos estados por rango de fechas
+        Index('ix_cita_paciente_fecha', 'id_paciente', 'fecha', 'hora'),
+        Index('ix_cita_estado_fecha', 'estado', 'fecha'),
+    )
 
     id_cita = Column(Integer, primary_key=True, index=True, autoincrement=True)
     id_paciente = Column(Integer, ForeignKey('paciente.id_paciente', ondelete='CASCADE'), nullable=False)
@@ -32,6 +41,9 @@ class CitaMedica(Base):
         index=True
     )
     observaciones = Column(Text)
+    # 1 mientras la cita está activa y NULL si está cancelada. Los NULL no colisionan
+    # en un índice único, así que las citas canceladas liberan el slot.
+    slot_activo = Column(Integer, Computed("CASE WHEN estado <> 'cancelada' THEN 1 END"))
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
 
@@ -0,0 +1,53 @@
+"""
+Modelo SQLAlchemy para las estadísticas diarias precalculadas
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, DECIMAL, TIMESTAMP, func, Index
+from app.database import Base
+
+class EstadisticaDiaria(Base):
+    """
+    Modelo de la tabla estadistica_diaria.
+    Acumulado de citas y montos facturados por día, doctor y estado de la cita.
+
+    Se mantiene de forma incremental en la misma transacción que cada escritura de
+    citas y facturas; los reportes la consultan en lugar de recorrer las tablas
+    originales. Los montos se atribuyen a la fecha de la cita, no a la de emisión.
+    """
+    __tablename__ = "estadistica_diaria"
+    __table_args__ = (
+        # Reportes por doctor en un rango de fechas
+        Index('ix_estadistica_doctor_fecha', 'id_doctor', 'fecha'),
+    )
+
+    fecha = Column(Date, primary_key=True)
+    id_doctor = Column(Integer, primary_key=True)
+    estado = Column(String(20), primary_key=True)
+    citas = Column(Integer, nullable=False, default=0)
+    monto_facturado = Column(DECIMAL(14, 2), nullable=False, default=0)
+    monto_pagado = Column(DECIMAL(14, 2), nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<EstadisticaDiaria(fecha='{self.fecha}', doctor_id={self.id_doctor}, estado='{self.estado}', citas={self.citas})>"
+
+
+class EstadisticaAnticipacion(Base):
+    """
+    Modelo de la tabla estadistica_anticipacion.
+    Acumulado de citas por día, doctor, tramo de anticipación y estado de la cita.
+
+    La anticipación es el tramo (ver estadisticas_repository.TRAMOS_ANTICIPACION) de
+    los días entre el registro de la cita y su fecha. Se mantiene igual que
+    estadistica_diaria y sirve para las tasas de cancelación e inasistencia.
+    """
+    __tablename__ = "estadistica_anticipacion"
+
+    fecha = Column(Date, primary_key=True)
+    id_doctor = Column(Integer, primary_key=True)
+    anticipacion = Column(SmallInteger, primary_key=True)
+    estado = Column(String(20), primary_key=True)
+    citas = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<EstadisticaAnticipacion(fecha='{self.fecha}', doctor_id={self.id_doctor}, anticipacion={self.anticipacion}, estado='{self.estado}', citas={self.citas})>"
@@ -0,0 +1,88 @@
+"""
+Modelo SQLAlchemy para la entidad Lista de Espera
+"""
+from sqlalchemy import Column, Integer, String, Date, DateTime, Time, Boolean, ForeignKey, TIMESTAMP, func, Enum as SQLEnum, Index
+from sqlalchemy.orm import relationship
+from app.database import Base
+import enum
+
+class EstadoListaEspera(str, enum.Enum):
+    """Enumeración de estados de una solicitud en lista de espera"""
+    ACTIVA = "activa"
+    OFRECIDA = "ofrecida"
+    ASIGNADA = "asignada"
+    CANCELADA = "cancelada"
+
+class ListaEspera(Base):
+    """
+    Modelo de la tabla lista_espera.
+    Pacientes que esperan un cupo con un doctor o en una especialidad dentro de
+    una ventana de fechas (y opcionalmente de horas).
+    """
+    __tablename__ = "lista_espera"
+    __table_args__ = (
+        # Búsqueda de candidatos cuando se libera un slot: por doctor o por especialidad,
+        # solo solicitudes activas y cuya ventana contiene la fecha del slot
+        Index('ix_lista_espera_doctor', 'id_doctor', 'estado', 'fecha_desde', 'fecha_hasta'),
+        Index('ix_lista_espera_especialidad', 'id_especialidad', 'estado', 'fecha_desde', 'fecha_hasta'),
+        # Ofertas vencidas que hay que volver a ofrecer
+        Index('ix_lista_espera_oferta', 'estado', 'oferta_expira'),
+    )
+
+    id_lista_espera = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id_paciente = Column(Integer, ForeignKey('paciente.id_paciente', ondelete='CASCADE'), nullable=False, index=True)
+    id_doctor = Column(Integer, ForeignKey('doctor.id_doctor', ondelete='CASCADE'))
+    id_especialidad = Column(Integer, ForeignKey('especialidad.id_especialidad'))
+    fecha_desde = Column(Date, nullable=False)
+    fecha_hasta = Column(Date, nullable=False)
+    hora_desde = Column(Time)
+    hora_hasta = Column(Time)
+    motivo = Column(String(255), nullable=False)
+    agendar_automatico = Column(Boolean, default=False)
+    estado = Column(
+        SQLEnum('activa', 'ofrecida', 'asignada', 'cancelada', name='estado_lista_espera_enum'),
+        default='activa',
+        nullable=False
+    )
+    # Slot ofrecido al paciente (estado 'ofrecida') o cita asignada (estado 'asignada').
+    # En una solicitud 'activa' es el último slot que rechazó o dejó vencer: no se le vuelve a ofrecer.
+    oferta_id_doctor = Column(Integer, ForeignKey('doctor.id_doctor', ondelete='SET NULL'))
+    oferta_fecha = Column(Date)
+    oferta_hora = Column(Time)
+    # Hasta cuándo puede aceptar el slot ofrecido
+    oferta_expira = Column(DateTime)
+    id_cita = Column(Integer, ForeignKey('cita_medica.id_cita', ondelete='SET NULL'))
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    # Relaciones
+    paciente = relationship("Paciente", foreign_keys=[id_paciente])
+    doctor = relationship("Doctor", foreign_keys=[id_doctor])
+
+    def __repr__(self):
+        return f"<ListaEspera(id={self.id_lista_espera}, paciente_id={self.id_paciente}, estado='{self.estado}')>"
+
+    def to_dict(self):
+        """Convierte el modelo a diccionario para serialización JSON"""
+        return {
+            "id_lista_espera": self.id_lista_espera,
+            "id_paciente": self.id_paciente,
+            "id_doctor": self.id_doctor,
+            "id_especialidad": self.id_especialidad,
+            "fecha_desde": str(self.fecha_desde) if self.fecha_desde else None,
+            "fecha_hasta": str(self.fecha_hasta) if self.fecha_hasta else None,
+            "hora_desde": str(self.hora_desde) if self.hora_desde else None,
+            "hora_hasta": str(self.hora_hasta) if self.hora_hasta else None,
+            "motivo": self.motivo,
+            "agendar_automatico": self.agendar_automatico,
+            "estado": self.estado,
+            "oferta": {
+                "id_doctor": self.oferta_id_doctor,
+                "fecha": str(self.oferta_fecha),
+                "hora": str(self.oferta_hora),
+                "expira": str(self.oferta_expira) if self.oferta_expira else None
+            } if self.oferta_fecha and self.estado in ('ofrecida', 'asignada') else None,
+            "id_cita": self.id_cita,
+            "created_at": str(self.created_at) if self.created_at else None,
+            "updated_at": str(self.updated_at) if self.updated_at else None
+        }
@@ -20,7 +20,7 @@ class Paciente(Base):
     direccion = Column(String(255))
     fecha_nacimiento = Column(Date, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
-    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp(), index=True)
 
     def __repr__(self):
         return f"<Paciente(id={self.id_paciente}, nombre='{self.nombre} {self.apellido}', documento='{self.documento}')>"
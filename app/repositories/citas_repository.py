@@ -1,28 +1,255 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, insert, func
+from sqlalchemy.exc import IntegrityError
 from app.models.cita import CitaMedica
+from app.models.paciente import Paciente
+from app.models.doctor import Doctor
+from app.models.factura import Factura
+from app.repositories import estadisticas_repository
+from app.cache import cache
 from app.schemas.cita import CitaCreate, CitaUpdate
+from app.utils.paginacion import paginar
+from app.utils.proyeccion import Proyeccion, aplicar_proyeccion
 from typing import Optional, List
-from datetime import date, time
+from datetime import date, datetime, time
+
+# Clave de orden de la paginación por cursor (índice ix_cita_fecha_hora)
+ORDEN_LISTADO = (CitaMedica.fecha, CitaMedica.hora, CitaMedica.id_cita)
+
+# Relaciones que se pueden incluir con ?expand=
+RELACIONES = {
+    "paciente": (CitaMedica.paciente,),
+    "doctor": (CitaMedica.doctor,),
+    "especialidad": (CitaMedica.doctor, Doctor.especialidad)
+}
+
+# Relaciones que usa la representación por defecto de una cita
+PRECARGAR = (CitaMedica.paciente, CitaMedica.doctor)
+
+def invalidar_cache(doctor_id: int, fecha: date) -> None:
+    """Descarta los datos en caché que dependen de las citas de un doctor en una fecha"""
+    cache.invalidar("citas", f"citas:doctor:{doctor_id}:{fecha}", f"reportes:{fecha:%Y-%m}")
+
+def _con_registro(filas: List[dict]) -> List[dict]:
+    """
+    Fija created_at con el reloj de la aplicación. El tramo de anticipación de una cita
+    nueva, el de sus cambios de estado y el de reconstruir() salen todos de created_at;
+    si lo pusiera CURRENT_TIMESTAMP (UTC en SQLite, zona de la sesión en MySQL) el día
+    podría diferir del de la aplicación y los conteos se moverían entre tramos.
+    """
+    ahora = datetime.now()
+    for fila in filas:
+        fila.setdefault("created_at", ahora)
+    return filas
+
+def _registrar_nuevas(db: Session, filas) -> None:
+    """Suma las citas nuevas a las estadísticas diarias y de anticipación (antes del commit)"""
+    estadisticas_repository.registrar(db, (
+        (f["fecha"], f["id_doctor"], f.get("estado") or 'pendiente', 1, 0, 0) for f in filas
+    ))
+    estadisticas_repository.registrar_anticipacion(db, (
+        (f["fecha"], f["id_doctor"], estadisticas_repository.tramo_anticipacion(f["created_at"].date(), f["fecha"]),
+         f.get("estado") or 'pendiente', 1)
+        for f in filas
+    ))
 
 def create(db: Session, cita_data: CitaCreate) -> CitaMedica:
-    cita = CitaMedica(**cita_data.dict())
+    cita = CitaMedica(**_con_registro([cita_data.dict()])[0])
     db.add(cita)
+    db.flush()
+    _registrar_nuevas(db, [{
+        "fecha": cita.fecha, "id_doctor": cita.id_doctor, "estado": cita.estado, "created_at": cita.created_at
+    }])
     db.commit()
     db.refresh(cita)
+    invalidar_cache(cita.id_doctor, cita.fecha)
     return cita
 
-def get_by_id(db: Session, cita_id: int) -> Optional[CitaMedica]:
-    return db.query(CitaMedica).options(
-        joinedload(CitaMedica.paciente),
-        joinedload(CitaMedica.doctor)
-    ).filter(CitaMedica.id_cita == cita_id).first()
+def create_lote(db: Session, filas: List[dict]) -> None:
+    """Inserta varias citas en una sola transacción usando executemany"""
+    db.execute(insert(CitaMedica), _con_registro(filas))
+    _registrar_nuevas(db, filas)
+    db.commit()
+    for doctor_id, fecha in {(f["id_doctor"], f["fecha"]) for f in filas}:
+        invalidar_cache(doctor_id, fecha)
+
+def insertar_si_libre(db: Session, fila: dict) -> bool:
+    """Inserta una cita dentro de un savepoint; retorna False si viola una restricción (sin hacer commit)"""
+    try:
+        with db.begin_nested():
+            db.execute(insert(CitaMedica), _con_registro([fila]))
+        _registrar_nuevas(db, [fila])
+        return True
+    except IntegrityError:
+        return False
+
+def get_agenda_doctor(db: Session, doctor_id: int, fecha: date) -> List[tuple]:
+    """Obtiene las citas de un doctor en una fecha con el nombre del paciente, en una sola consulta"""
+    return db.query(
+        CitaMedica.id_cita,
+        CitaMedica.hora,
+        CitaMedica.estado,
+        CitaMedica.motivo,
+        CitaMedica.id_paciente,
+        Paciente.nombre,
+        Paciente.apellido
+    ).join(Paciente, Paciente.id_paciente == CitaMedica.id_paciente).filter(
+        CitaMedica.id_doctor == doctor_id,
+        CitaMedica.fecha == fecha
+    ).order_by(CitaMedica.hora).all()
+
+def _filtro_feed(id_doctor: Optional[int], id_paciente: Optional[int]):
+    return CitaMedica.id_doctor == id_doctor if id_doctor is not None else CitaMedica.id_paciente == id_paciente
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[CitaMedica]:
-    return db.query(CitaMedica).options(
-        joinedload(CitaMedica.paciente),
-        joinedload(CitaMedica.doctor)
-    ).offset(skip).limit(limit).all()
+def get_version_feed(db: Session, id_doctor: Optional[int] = None, id_paciente: Optional[int] = None) -> tuple:
+    """
+    Obtiene la versión del feed de un doctor o paciente sin cargar las filas: cantidad de
+    citas y última modificación de las citas y de los pacientes y doctores que incluye
+    (el feed muestra sus nombres).
+
+    Returns:
+        Tupla (cantidad, cita, paciente, doctor) con los updated_at máximos
+    """
+    return db.query(
+        func.count(CitaMedica.id_cita),
+        func.max(CitaMedica.updated_at),
+        func.max(Paciente.updated_at),
+        func.max(Doctor.updated_at)
+    ).join(Paciente, Paciente.id_paciente == CitaMedica.id_paciente).join(
+        Doctor, Doctor.id_doctor == CitaMedica.id_doctor
+    ).filter(
+        _filtro_feed(id_doctor, id_paciente)
+    ).one()
+
+def iterar_feed(
+    db: Session,
+    id_doctor: Optional[int] = None,
+    id_paciente: Optional[int] = None,
+    lote: int = 500
+):
+    """
+    Recorre las citas de un doctor o paciente con los nombres de ambos, por lotes.
+
+    Las filas se leen con yield_per y un cursor del lado del servidor, así que el
+    historial completo nunca se carga en memoria.
+    """
+    return db.query(
+        CitaMedica.id_cita,
+        CitaMedica.fecha,
+        CitaMedica.hora,
+        CitaMedica.motivo,
+        CitaMedica.estado,
+        CitaMedica.updated_at,
+        Paciente.nombre.label("paciente_nombre"),
+        Paciente.apellido.label("paciente_apellido"),
+        Doctor.nombre.label("doctor_nombre"),
+        Doctor.apellido.label("doctor_apellido")
+    ).join(Paciente, Paciente.id_paciente == CitaMedica.id_paciente).join(
+        Doctor, Doctor.id_doctor == CitaMedica.id_doctor
+    ).filter(
+        _filtro_feed(id_doctor, id_paciente)
+    ).order_by(CitaMedica.fecha, CitaMedica.hora).execution_options(
+        stream_results=True
+    ).yield_per(lote)
+
+def confirmar_lote(db: Session, filas: List[dict]) -> None:
+    """Confirma las inserciones hechas con insertar_si_libre"""
+    db.commit()
+    for doctor_id, fecha in {(f["id_doctor"], f["fecha"]) for f in filas}:
+        invalidar_cache(doctor_id, fecha)
+
+def get_activas_de_paciente_en_fechas(db: Session, paciente_id: int, doctor_id: int, fechas: List[date]) -> List[CitaMedica]:
+    """Obtiene las citas activas de un paciente con un doctor en un conjunto de fechas"""
+    return db.query(CitaMedica).filter(
+        CitaMedica.id_paciente == paciente_id,
+        CitaMedica.id_doctor == doctor_id,
+        CitaMedica.fecha.in_(fechas),
+        CitaMedica.estado != 'cancelada'
+    ).all()
+
+def get_by_id(db: Session, cita_id: int, proyeccion: Optional[Proyeccion] = None) -> Optional[CitaMedica]:
+    query = aplicar_proyeccion(db.query(CitaMedica), proyeccion, PRECARGAR)
+    return query.filter(CitaMedica.id_cita == cita_id).first()
+
+def get_para_actualizar(db: Session, cita_id: int) -> Optional[CitaMedica]:
+    """
+    Obtiene una cita bloqueando su fila hasta el fin de la transacción, para que dos
+    cambios de estado simultáneos no partan del mismo estado anterior
+    """
+    return db.query(CitaMedica).filter(CitaMedica.id_cita == cita_id).with_for_update().first()
+
+def get_all(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    id_doctor: Optional[int] = None,
+    id_paciente: Optional[int] = None,
+    estados: Optional[List[str]] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    hora: Optional[time] = None,
+    proyeccion: Optional[Proyeccion] = None
+) -> List[CitaMedica]:
+    """
+    Lista citas en orden cronológico con filtros opcionales.
+
+    Cada combinación habitual de filtros tiene un índice que empieza por la columna
+    de igualdad y sigue por fecha: uq_cita_slot_activo (doctor), ix_cita_paciente_fecha
+    (paciente), ix_cita_estado_fecha (estado) e ix_cita_fecha_hora (solo fechas).
+    """
+    query = aplicar_proyeccion(db.query(CitaMedica), proyeccion, PRECARGAR, ORDEN_LISTADO)
+    query = _filtrar(query, id_doctor, id_paciente, estados, fecha_desde, fecha_hasta, hora)
+    return paginar(query, ORDEN_LISTADO, cursor, skip, limit)
+
+def _filtrar(
+    query,
+    id_doctor: Optional[int] = None,
+    id_paciente: Optional[int] = None,
+    estados: Optional[List[str]] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    hora: Optional[time] = None
+):
+    if id_doctor is not None:
+        query = query.filter(CitaMedica.id_doctor == id_doctor)
+    if id_paciente is not None:
+        query = query.filter(CitaMedica.id_paciente == id_paciente)
+    if estados:
+        query = query.filter(CitaMedica.estado.in_(estados))
+    if fecha_desde is not None:
+        query = query.filter(CitaMedica.fecha >= fecha_desde)
+    if fecha_hasta is not None:
+        query = query.filter(CitaMedica.fecha <= fecha_hasta)
+    if hora is not None:
+        query = query.filter(CitaMedica.hora == hora)
+    return query
+
+# Columnas de la exportación de citas, en el orden de iterar_exportacion
+COLUMNAS_EXPORTACION = (
+    "id_cita", "fecha", "hora", "estado", "motivo", "observaciones",
+    "id_paciente", "paciente_nombre", "paciente_apellido",
+    "id_doctor", "doctor_nombre", "doctor_apellido",
+    "created_at", "updated_at"
+)
+
+def iterar_exportacion(db: Session, lote: int = 1000, **filtros):
+    """
+    Recorre las citas filtradas como tuplas de columnas, por lotes y con cursor del
+    lado del servidor, sin construir objetos ORM.
+    """
+    query = db.query(
+        CitaMedica.id_cita, CitaMedica.fecha, CitaMedica.hora, CitaMedica.estado,
+        CitaMedica.motivo, CitaMedica.observaciones,
+        CitaMedica.id_paciente, Paciente.nombre, Paciente.apellido,
+        CitaMedica.id_doctor, Doctor.nombre, Doctor.apellido,
+        CitaMedica.created_at, CitaMedica.updated_at
+    ).join(Paciente, Paciente.id_paciente == CitaMedica.id_paciente).join(
+        Doctor, Doctor.id_doctor == CitaMedica.id_doctor
+    )
+    return _filtrar(query, **filtros).order_by(*ORDEN_LISTADO).execution_options(
+        stream_results=True
+    ).yield_per(lote)
 
 def verificar_disponibilidad(db: Session, doctor_id: int, fecha: date, hora: time, cita_id_excluir: Optional[int] = None) -> bool:
     query = db.query(CitaMedica).filter(
@@ -35,18 +262,40 @@ def verificar_disponibilidad(db: Session, doctor_id: int, fecha: date, hora: tim
         query = query.filter(CitaMedica.id_cita != cita_id_excluir)
     return query.first() is None
 
+def get_horas_ocupadas(db: Session, doctor_ids: List[int], fecha_desde: date, fecha_hasta: date) -> List[tuple]:
+    """Obtiene (id_doctor, fecha, hora) de las citas no canceladas de varios doctores en un rango, en una sola consulta"""
+    return db.query(CitaMedica.id_doctor, CitaMedica.fecha, CitaMedica.hora).filter(
+        CitaMedica.id_doctor.in_(doctor_ids),
+        CitaMedica.fecha >= fecha_desde,
+        CitaMedica.fecha <= fecha_hasta,
+        CitaMedica.estado != 'cancelada'
+    ).order_by(CitaMedica.id_doctor, CitaMedica.fecha, CitaMedica.hora).all()
+
+def _cambiar_estado(db: Session, cita: CitaMedica, estado: str) -> None:
+    """Cambia el estado de una cita y traslada su conteo (y su factura) en las estadísticas"""
+    factura = db.query(Factura).filter(Factura.id_cita == cita.id_cita).first()
+    estadisticas_repository.registrar(db, estadisticas_repository.movimientos_cambio_estado(
+        cita.fecha, cita.id_doctor, cita.estado, estado, factura
+    ))
+    estadisticas_repository.registrar_anticipacion(db, estadisticas_repository.movimientos_anticipacion(
+        cita.fecha, cita.id_doctor, estadisticas_repository.fecha_registro(cita), cita.estado, estado
+    ))
+    cita.estado = estado
+
 def update_estado(db: Session, cita_id: int, estado: str) -> CitaMedica:
     cita = db.query(CitaMedica).filter(CitaMedica.id_cita == cita_id).first()
     if cita:
-        cita.estado = estado
+        _cambiar_estado(db, cita, estado)
         db.commit()
         db.refresh(cita)
+        invalidar_cache(cita.id_doctor, cita.fecha)
     return cita
 
 def delete(db: Session, cita_id: int) -> bool:
     cita = get_by_id(db, cita_id)
     if cita:
-        cita.estado = 'cancelada'
+        _cambiar_estado(db, cita, 'cancelada')
         db.commit()
+        invalidar_cache(cita.id_doctor, cita.fecha)
         return True
     return False
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Repositorio de las cifras del panel principal
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from app.models.paciente import Paciente
+from app.models.doctor import Doctor
+from app.models.cita import CitaMedica, EstadoCita
+from typing import List, Tuple
+from datetime import date
+
+def _contar(columna, *condiciones):
+    return select(func.count(columna)).where(*condiciones).scalar_subquery()
+
+def contar(db: Session, hoy: date) -> Tuple[int, int, int, int, int]:
+    """
+    Cuenta pacientes, doctores activos, citas del día y citas pendientes y confirmadas
+    en una sola consulta (un COUNT por subconsulta, cada uno sobre su índice).
+
+    Returns:
+        Tupla (pacientes, doctores_activos, citas_hoy, pendientes, confirmadas)
+    """
+    return db.query(
+        _contar(Paciente.id_paciente),
+        _contar(Doctor.id_doctor, Doctor.activo == True),
+        _contar(CitaMedica.id_cita, CitaMedica.fecha == hoy),
+        _contar(CitaMedica.id_cita, CitaMedica.estado == EstadoCita.PENDIENTE.value),
+        _contar(CitaMedica.id_cita, CitaMedica.estado == EstadoCita.CONFIRMADA.value)
+    ).one()
+
+def actividad_reciente(db: Session, limite: int = 5) -> List[tuple]:
+    """
+    Obtiene las últimas citas registradas, solo con las columnas que muestra el panel.
+
+    Returns:
+        Tuplas (id_cita, fecha, hora, estado, paciente_nombre, paciente_apellido,
+        doctor_nombre, doctor_apellido), de la más reciente a la más antigua
+    """
+    return db.query(
+        CitaMedica.id_cita, CitaMedica.fecha, CitaMedica.hora, CitaMedica.estado,
+        Paciente.nombre, Paciente.apellido, Doctor.nombre, Doctor.apellido
+    ).join(Paciente, Paciente.id_paciente == CitaMedica.id_paciente)\
+        .join(Doctor, Doctor.id_doctor == CitaMedica.id_doctor)\
+        .order_by(CitaMedica.id_cita.desc())\
+        .limit(limite)\
+        .all()
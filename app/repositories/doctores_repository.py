@@ -1,11 +1,28 @@
 """
 Repositorio para operaciones CRUD de Doctores
 """
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, selectinload
 from app.models.doctor import Doctor, Especialidad
+from app.models.horario import Horario
+from app.cache import cache
 from app.schemas.doctor import DoctorCreate, DoctorUpdate
+from app.repositories import horarios_repository
+from app.utils.paginacion import paginar
+from app.utils.proyeccion import Proyeccion, aplicar_proyeccion
 from typing import Optional, List
 
+# Clave de orden de la paginación por cursor
+ORDEN_LISTADO = (Doctor.id_doctor,)
+
+# Relaciones que se pueden incluir con ?expand=
+RELACIONES = {
+    "especialidad": (Doctor.especialidad,)
+}
+
+def invalidar_cache(doctor_id: Optional[int] = None) -> None:
+    """Descarta los datos en caché que dependen de los doctores (directorio, listados, reportes)"""
+    cache.invalidar("doctores", *([f"doctor:{doctor_id}"] if doctor_id is not None else []))
+
 def create(db: Session, doctor_data: DoctorCreate) -> Doctor:
     """
     Crea un nuevo doctor en la base de datos.
@@ -31,22 +48,23 @@ def create(db: Session, doctor_data: DoctorCreate) -> Doctor:
     db.add(doctor)
     db.commit()
     db.refresh(doctor)
+    invalidar_cache(doctor.id_doctor)
     
     return doctor
 
-def get_by_id(db: Session, doctor_id: int) -> Optional[Doctor]:
+def get_by_id(db: Session, doctor_id: int, proyeccion: Optional[Proyeccion] = None) -> Optional[Doctor]:
     """
     Obtiene un doctor por su ID con información de especialidad.
     
     Args:
         db: Sesión de base de datos
         doctor_id: ID del doctor
+        proyeccion: Campos y relaciones a cargar (por defecto, todo con la especialidad)
         
     Returns:
         Doctor encontrado o None
     """
-    return db.query(Doctor)\
-        .options(joinedload(Doctor.especialidad))\
+    return aplicar_proyeccion(db.query(Doctor), proyeccion, (Doctor.especialidad,))\
         .filter(Doctor.id_doctor == doctor_id)\
         .first()
 
@@ -89,23 +107,28 @@ def get_by_correo(db: Session, correo: str) -> Optional[Doctor]:
     """
     return db.query(Doctor).filter(Doctor.correo == correo).first()
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[Doctor]:
+def get_all(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    proyeccion: Optional[Proyeccion] = None
+) -> List[Doctor]:
     """
     Obtiene lista de doctores con paginación.
     
     Args:
         db: Sesión de base de datos
-        skip: Número de registros a saltar
+        skip: Número de registros a saltar (si no se usa cursor)
         limit: Límite de registros a retornar
+        cursor: Cursor de la página anterior (paginación por id_doctor)
+        proyeccion: Campos y relaciones a cargar
         
     Returns:
         Lista de doctores
     """
-    return db.query(Doctor)\
-        .options(joinedload(Doctor.especialidad))\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
+    query = aplicar_proyeccion(db.query(Doctor), proyeccion, (Doctor.especialidad,), ORDEN_LISTADO)
+    return paginar(query, ORDEN_LISTADO, cursor, skip, limit)
 
 def get_by_especialidad(db: Session, especialidad_id: int) -> List[Doctor]:
     """
@@ -122,6 +145,56 @@ def get_by_especialidad(db: Session, especialidad_id: int) -> List[Doctor]:
         .filter(Doctor.id_especialidad == especialidad_id, Doctor.activo == True)\
         .all()
 
+def get_by_ids(db: Session, doctor_ids: List[int]) -> List[Doctor]:
+    """
+    Obtiene varios doctores por sus IDs en una sola consulta.
+    
+    Args:
+        db: Sesión de base de datos
+        doctor_ids: Lista de IDs de doctores
+        
+    Returns:
+        Lista de doctores encontrados
+    """
+    return db.query(Doctor)\
+        .filter(Doctor.id_doctor.in_(doctor_ids))\
+        .all()
+
+def get_directorio(
+    db: Session,
+    especialidad_id: Optional[int] = None,
+    dia_semana: Optional[str] = None
+) -> List[Doctor]:
+    """
+    Obtiene los doctores activos con su especialidad y sus horarios activos.
+    
+    Se resuelve con tres consultas (doctores, especialidades y horarios) sin
+    importar cuántos doctores haya.
+    
+    Args:
+        db: Sesión de base de datos
+        especialidad_id: Si se indica, solo doctores de esa especialidad
+        dia_semana: Si se indica, solo doctores que atienden ese día y solo sus horarios de ese día
+        
+    Returns:
+        Lista de doctores con especialidad y horarios cargados
+    """
+    condicion_horario = Horario.activo == True
+    if dia_semana:
+        condicion_horario = condicion_horario & (Horario.dia_semana == dia_semana)
+    
+    query = db.query(Doctor).options(
+        selectinload(Doctor.especialidad),
+        selectinload(Doctor.horarios.and_(condicion_horario))
+    ).filter(Doctor.activo == True)
+    
+    if especialidad_id is not None:
+        query = query.filter(Doctor.id_especialidad == especialidad_id)
+    if dia_semana:
+        query = query.filter(Doctor.horarios.any(condicion_horario))
+    
+    return query.order_by(Doctor.apellido, Doctor.nombre, Doctor.id_doctor).all()
+
 def update(db: Session, doctor_id: int, doctor_data: DoctorUpdate) -> Doctor:
     """
     Actualiza información de un doctor.
@@ -144,6 +217,7 @@ def update(db: Session, doctor_id: int, doctor_data: DoctorUpdate) -> Doctor:
         
         db.commit()
         db.refresh(doctor)
+        invalidar_cache(doctor_id)
     
     return doctor
 
@@ -163,6 +237,7 @@ def delete(db: Session, doctor_id: int) -> bool:
     if doctor:
         db.delete(doctor)
         db.commit()
+        horarios_repository.invalidar_doctor(doctor_id)
         return True
     
     return False
@@ -0,0 +1,198 @@
+"""
+Repositorio de las estadísticas diarias precalculadas (tabla estadistica_diaria)
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, Integer, case, cast, delete, func, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+from app.models.estadistica import EstadisticaDiaria, EstadisticaAnticipacion
+from app.models.cita import CitaMedica
+from app.models.factura import Factura
+from typing import Iterable, List, Optional, Tuple
+from datetime import date
+
+# Movimiento sobre el acumulado: (fecha, id_doctor, estado, citas, monto_facturado, monto_pagado)
+Movimiento = Tuple[date, int, str, int, Decimal, Decimal]
+
+# Movimiento sobre estadistica_anticipacion: (fecha, id_doctor, anticipacion, estado, citas)
+MovimientoAnticipacion = Tuple[date, int, int, str, int]
+
+_CLAVE = ("fecha", "id_doctor", "estado")
+_CLAVE_ANTICIPACION = ("fecha", "id_doctor", "anticipacion", "estado")
+
+# Primer día de cada tramo de anticipación: mismo día, 1 día, 2-7, 8-14, 15-30 y 31 o más
+TRAMOS_ANTICIPACION = (0, 1, 2, 8, 15, 31)
+
+def tramo_anticipacion(registro: date, fecha: date) -> int:
+    """Tramo de anticipación de una cita registrada en `registro` para el día `fecha`"""
+    return max(bisect_right(TRAMOS_ANTICIPACION, (fecha - registro).days) - 1, 0)
+
+def fecha_registro(cita: CitaMedica) -> date:
+    """
+    Día en que se registró la cita. created_at lo fija la aplicación al insertar
+    (citas_repository), igual que el tramo con que se sumó la cita nueva.
+    """
+    return cita.created_at.date() if cita.created_at else date.today()
+
+def montos_factura(estado: Optional[str], monto) -> Tuple[Decimal, Decimal]:
+    """Monto facturado y monto pagado que aporta una factura según su estado"""
+    if estado is None or estado == 'anulada':
+        return Decimal(0), Decimal(0)
+    monto = Decimal(str(monto))
+    return monto, monto if estado == 'pagada' else Decimal(0)
+
+def movimientos_cambio_estado(
+    fecha: date,
+    id_doctor: int,
+    anterior: str,
+    nuevo: str,
+    factura: Optional[Factura] = None
+) -> List[Movimiento]:
+    """Movimientos que trasladan una cita (y su factura, si tiene) de un estado a otro"""
+    if anterior == nuevo:
+        return []
+    facturado, pagado = montos_factura(factura.estado, factura.monto) if factura else (Decimal(0), Decimal(0))
+    return [
+        (fecha, id_doctor, anterior, -1, -facturado, -pagado),
+        (fecha, id_doctor, nuevo, 1, facturado, pagado)
+    ]
+
+def movimientos_anticipacion(
+    fecha: date,
+    id_doctor: int,
+    registro: date,
+    anterior: str,
+    nuevo: str
+) -> List[MovimientoAnticipacion]:
+    """Movimientos que trasladan una cita de un estado a otro en estadistica_anticipacion"""
+    if anterior == nuevo:
+        return []
+    tramo = tramo_anticipacion(registro, fecha)
+    return [(fecha, id_doctor, tramo, anterior, -1), (fecha, id_doctor, tramo, nuevo, 1)]
+
+def _upsert(db: Session, tabla=EstadisticaDiaria, clave=_CLAVE, columnas=("citas", "monto_facturado", "monto_pagado")):
+    """INSERT que suma los valores al acumulado si la fila ya existe, según el motor de base de datos"""
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "mysql":
+        stmt = mysql.insert(tabla)
+        nuevos = stmt.inserted
+    else:
+        stmt = (postgresql if dialecto == "postgresql" else sqlite).insert(tabla)
+        nuevos = stmt.excluded
+    sumas = {columna: getattr(tabla, columna) + getattr(nuevos, columna) for columna in columnas}
+    sumas["updated_at"] = func.current_timestamp()
+    if dialecto == "mysql":
+        return stmt.on_duplicate_key_update(**sumas)
+    return stmt.on_conflict_do_update(index_elements=list(clave), set_=sumas)
+
+def registrar(db: Session, movimientos: Iterable[Movimiento]) -> None:
+    """
+    Suma los movimientos al acumulado con un único upsert, sin hacer commit.
+
+    Se llama antes del commit de la escritura que los origina, de modo que el
+    acumulado y los datos originales se confirman (o se revierten) juntos.
+    """
+    acumulado = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for fecha, id_doctor, estado, citas, facturado, pagado in movimientos:
+        totales = acumulado[(fecha, id_doctor, estado)]
+        totales[0] += citas
+        totales[1] += facturado
+        totales[2] += pagado
+
+    filas = [
+        {
+            "fecha": fecha, "id_doctor": id_doctor, "estado": estado,
+            "citas": citas, "monto_facturado": facturado, "monto_pagado": pagado
+        }
+        for (fecha, id_doctor, estado), (citas, facturado, pagado) in acumulado.items()
+        if citas or facturado or pagado
+    ]
+    if filas:
+        db.execute(_upsert(db), filas)
+
+def registrar_anticipacion(db: Session, movimientos: Iterable[MovimientoAnticipacion]) -> None:
+    """Suma los movimientos a estadistica_anticipacion con un único upsert, sin hacer commit"""
+    acumulado = defaultdict(int)
+    for fecha, id_doctor, anticipacion, estado, citas in movimientos:
+        acumulado[(fecha, id_doctor, anticipacion, estado)] += citas
+
+    filas = [
+        {"fecha": fecha, "id_doctor": id_doctor, "anticipacion": anticipacion, "estado": estado, "citas": citas}
+        for (fecha, id_doctor, anticipacion, estado), citas in acumulado.items()
+        if citas
+    ]
+    if filas:
+        db.execute(_upsert(db, EstadisticaAnticipacion, _CLAVE_ANTICIPACION, ("citas",)), filas)
+
+def _dias_anticipacion(db: Session):
+    """Expresión SQL con los días entre el registro de la cita y su fecha, según el motor"""
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "mysql":
+        return func.datediff(CitaMedica.fecha, CitaMedica.created_at)
+    if dialecto == "postgresql":
+        return CitaMedica.fecha - cast(CitaMedica.created_at, Date)
+    return cast(func.julianday(CitaMedica.fecha) - func.julianday(func.date(CitaMedica.created_at)), Integer)
+
+def _tramo_sql(dias):
+    """CASE equivalente a tramo_anticipacion"""
+    return case(
+        *((dias >= inicio, tramo) for tramo, inicio in reversed(list(enumerate(TRAMOS_ANTICIPACION)))),
+        else_=0
+    )
+
+def reconstruir(db: Session, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None) -> int:
+    """
+    Recalcula estadistica_diaria y estadistica_anticipacion desde cita_medica y factura,
+    para cargarlas por primera vez o repararlas. Borra e inserta las filas del rango en
+    una sola transacción.
+
+    Args:
+        db: Sesión de base de datos
+        fecha_desde: Primer día a recalcular (por defecto, desde el inicio)
+        fecha_hasta: Último día a recalcular (por defecto, hasta el final)
+
+    Returns:
+        Número de filas escritas en ambas tablas
+    """
+    filtro_citas, filtro_acumulado, filtro_anticipacion = [], [], []
+    if fecha_desde:
+        filtro_citas.append(CitaMedica.fecha >= fecha_desde)
+        filtro_acumulado.append(EstadisticaDiaria.fecha >= fecha_desde)
+        filtro_anticipacion.append(EstadisticaAnticipacion.fecha >= fecha_desde)
+    if fecha_hasta:
+        filtro_citas.append(CitaMedica.fecha <= fecha_hasta)
+        filtro_acumulado.append(EstadisticaDiaria.fecha <= fecha_hasta)
+        filtro_anticipacion.append(EstadisticaAnticipacion.fecha <= fecha_hasta)
+
+    facturado = func.coalesce(func.sum(case((Factura.estado != 'anulada', Factura.monto), else_=0)), 0)
+    pagado = func.coalesce(func.sum(case((Factura.estado == 'pagada', Factura.monto), else_=0)), 0)
+    agregados = select(
+        CitaMedica.fecha, CitaMedica.id_doctor, CitaMedica.estado,
+        func.count(CitaMedica.id_cita), facturado, pagado
+    ).select_from(CitaMedica)\
+        .outerjoin(Factura, Factura.id_cita == CitaMedica.id_cita)\
+        .where(*filtro_citas)\
+        .group_by(CitaMedica.fecha, CitaMedica.id_doctor, CitaMedica.estado)
+
+    tramo = _tramo_sql(_dias_anticipacion(db))
+    por_anticipacion = select(
+        CitaMedica.fecha, CitaMedica.id_doctor, tramo, CitaMedica.estado, func.count(CitaMedica.id_cita)
+    ).where(*filtro_citas)\
+        .group_by(CitaMedica.fecha, CitaMedica.id_doctor, tramo, CitaMedica.estado)
+
+    try:
+        db.execute(delete(EstadisticaDiaria).where(*filtro_acumulado))
+        resultado = db.execute(insert(EstadisticaDiaria).from_select(
+            [*_CLAVE, "citas", "monto_facturado", "monto_pagado"], agregados
+        ))
+        db.execute(delete(EstadisticaAnticipacion).where(*filtro_anticipacion))
+        resultado_anticipacion = db.execute(insert(EstadisticaAnticipacion).from_select(
+            [*_CLAVE_ANTICIPACION, "citas"], por_anticipacion
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return resultado.rowcount + resultado_anticipacion.rowcount
@@ -1,26 +1,81 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from app.models.factura import Factura, MetodoPago
 from app.schemas.factura import FacturaCreate
+from app.utils.paginacion import paginar
+from app.utils.proyeccion import Proyeccion, aplicar_proyeccion
+from app.models.cita import CitaMedica
+from app.repositories import estadisticas_repository
+from app.cache import cache
 from typing import List, Optional
+from datetime import date, datetime
+
+# Clave de orden de la paginación por cursor
+ORDEN_LISTADO = (Factura.id_factura,)
+
+# Relaciones que se pueden incluir con ?expand=
+RELACIONES = {
+    "cita": (Factura.cita,),
+    "metodo_pago": (Factura.metodo_pago,),
+    "paciente": (Factura.cita, CitaMedica.paciente),
+    "doctor": (Factura.cita, CitaMedica.doctor)
+}
+
+def invalidar_cache(fecha_cita: date, fecha_emision: datetime) -> None:
+    """Descarta los listados de facturas y los reportes del mes de la cita facturada y del mes de emisión"""
+    cache.invalidar("facturas", f"reportes:{fecha_cita:%Y-%m}", f"facturas:{fecha_emision:%Y-%m}")
+
+def _registrar_montos(db: Session, factura: Factura, estado_anterior: Optional[str]) -> CitaMedica:
+    """Suma a las estadísticas diarias la diferencia de montos de la factura (antes del commit)"""
+    cita = db.query(CitaMedica).filter(CitaMedica.id_cita == factura.id_cita).first()
+    facturado_antes, pagado_antes = estadisticas_repository.montos_factura(estado_anterior, factura.monto)
+    facturado, pagado = estadisticas_repository.montos_factura(factura.estado, factura.monto)
+    estadisticas_repository.registrar(db, [(
+        cita.fecha, cita.id_doctor, cita.estado, 0, facturado - facturado_antes, pagado - pagado_antes
+    )])
+    return cita
 
 def create(db: Session, factura_data: FacturaCreate) -> Factura:
     factura = Factura(**factura_data.dict())
     db.add(factura)
+    db.flush()
+    cita = _registrar_montos(db, factura, None)
     db.commit()
     db.refresh(factura)
+    invalidar_cache(cita.fecha, factura.fecha_emision)
     return factura
 
-def get_by_id(db: Session, factura_id: int) -> Optional[Factura]:
-    return db.query(Factura).options(
-        joinedload(Factura.cita),
-        joinedload(Factura.metodo_pago)
-    ).filter(Factura.id_factura == factura_id).first()
+def get_by_id(db: Session, factura_id: int, proyeccion: Optional[Proyeccion] = None) -> Optional[Factura]:
+    query = aplicar_proyeccion(db.query(Factura), proyeccion, (Factura.cita, Factura.metodo_pago))
+    return query.filter(Factura.id_factura == factura_id).first()
 
 def get_by_cita(db: Session, cita_id: int) -> Optional[Factura]:
     return db.query(Factura).filter(Factura.id_cita == cita_id).first()
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[Factura]:
-    return db.query(Factura).offset(skip).limit(limit).all()
+def get_all(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    proyeccion: Optional[Proyeccion] = None
+) -> List[Factura]:
+    query = aplicar_proyeccion(db.query(Factura), proyeccion, columnas_requeridas=ORDEN_LISTADO)
+    return paginar(query, ORDEN_LISTADO, cursor, skip, limit)
+
+# Columnas de la exportación de facturas, en el orden de iterar_exportacion
+COLUMNAS_EXPORTACION = (
+    "id_factura", "id_cita", "id_metodo_pago", "metodo_pago", "monto", "estado",
+    "fecha_emision", "observaciones", "created_at", "updated_at"
+)
+
+def iterar_exportacion(db: Session, lote: int = 1000):
+    """Recorre las facturas como tuplas de columnas, por lotes y con cursor del lado del servidor"""
+    return db.query(
+        Factura.id_factura, Factura.id_cita, Factura.id_metodo_pago, MetodoPago.nombre,
+        Factura.monto, Factura.estado, Factura.fecha_emision, Factura.observaciones,
+        Factura.created_at, Factura.updated_at
+    ).join(MetodoPago, MetodoPago.id_metodo_pago == Factura.id_metodo_pago).order_by(
+        *ORDEN_LISTADO
+    ).execution_options(stream_results=True).yield_per(lote)
 
 def get_all_metodos_pago(db: Session) -> List[MetodoPago]:
     return db.query(MetodoPago).filter(MetodoPago.activo == True).all()
@@ -29,7 +84,10 @@ def update_estado(db: Session, factura_id: int, estado: str) -> Factura:
     """Actualiza el estado de una factura"""
     factura = db.query(Factura).filter(Factura.id_factura == factura_id).first()
     if factura:
+        estado_anterior = factura.estado
         factura.estado = estado
+        cita = _registrar_montos(db, factura, estado_anterior)
         db.commit()
         db.refresh(factura)
+        invalidar_cache(cita.fecha, factura.fecha_emision)
     return factura
\ No newline at end of file
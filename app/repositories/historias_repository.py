@@ -2,6 +2,7 @@
 from sqlalchemy.orm import Session, joinedload
 from app.models.historia import HistoriaClinica
 from app.schemas.historia import HistoriaCreate
+from app.cache import cache
 from typing import List
 
 def create(db: Session, historia_data: HistoriaCreate) -> HistoriaClinica:
@@ -9,6 +10,7 @@ def create(db: Session, historia_data: HistoriaCreate) -> HistoriaClinica:
     db.add(historia)
     db.commit()
     db.refresh(historia)
+    cache.invalidar(f"historias:paciente:{historia.id_paciente}")
     return historia
 
 def get_by_paciente(db: Session, paciente_id: int) -> List[HistoriaClinica]:
@@ -2,12 +2,32 @@
 Repositorio para operaciones CRUD de Horarios
 """
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from sqlalchemy import and_, insert
+from collections import defaultdict
 from app.models.horario import Horario
-from app.schemas.horario import HorarioCreate, HorarioUpdate
-from typing import Optional, List
+from app.models.doctor import Doctor
+from app.schemas.horario import HorarioCreate, HorarioUpdate, BloqueHorario
+from app.repositories.indice_horarios import indice_horarios
+from app.cache import cache
+from typing import Optional, List, Dict
 from datetime import time
 
+def invalidar_doctor(doctor_id: int) -> None:
+    """Descarta el índice y los datos en caché que dependen de los horarios de un doctor"""
+    indice_horarios.invalidar(doctor_id)
+    cache.invalidar(f"horarios:doctor:{doctor_id}", f"doctor:{doctor_id}", "doctores")
+
+def bloquear_doctores(db: Session, doctor_ids: List[int]) -> None:
+    """
+    Bloquea las filas de los doctores (SELECT ... FOR UPDATE) hasta el commit de la
+    transacción. Toda escritura de horarios lo hace antes de leer los existentes, así
+    que las escrituras simultáneas de un mismo doctor se serializan. Las filas se
+    bloquean en orden de id para que dos lotes no se bloqueen mutuamente.
+    """
+    db.query(Doctor.id_doctor).filter(
+        Doctor.id_doctor.in_(doctor_ids)
+    ).order_by(Doctor.id_doctor).with_for_update().all()
+
 def create(db: Session, horario_data: HorarioCreate) -> Horario:
     """Crea un nuevo horario"""
     horario = Horario(
@@ -20,6 +40,7 @@ def create(db: Session, horario_data: HorarioCreate) -> Horario:
     db.add(horario)
     db.commit()
     db.refresh(horario)
+    invalidar_doctor(horario.id_doctor)
     return horario
 
 def get_by_id(db: Session, horario_id: int) -> Optional[Horario]:
@@ -33,6 +54,13 @@ def get_by_doctor(db: Session, doctor_id: int) -> List[Horario]:
         Horario.activo == True
     ).all()
 
+def get_by_doctores(db: Session, doctor_ids: List[int]) -> List[Horario]:
+    """Obtiene los horarios activos de varios doctores en una sola consulta"""
+    return db.query(Horario).filter(
+        Horario.id_doctor.in_(doctor_ids),
+        Horario.activo == True
+    ).order_by(Horario.id_doctor, Horario.hora_inicio).all()
+
 def verificar_solapamiento(
     db: Session,
     doctor_id: int,
@@ -41,8 +69,16 @@ def verificar_solapamiento(
     hora_fin: time,
     horario_id_excluir: Optional[int] = None
 ) -> bool:
-    """Verifica si hay solapamiento de horarios para un doctor en un día"""
-    query = db.query(Horario).filter(
+    """
+    Verifica si hay solapamiento de horarios para un doctor en un día.
+
+    Se consulta la base de datos y no el índice en memoria, que puede estar desfasado
+    respecto de otros procesos. Antes se bloquea la fila del doctor (bloquear_doctores)
+    hasta el commit de la escritura, de modo que dos altas, cambios o plantillas
+    simultáneos para el mismo doctor no pueden aceptar horarios que se solapan.
+    """
+    bloquear_doctores(db, [doctor_id])
+    query = db.query(Horario.id_horario).filter(
         Horario.id_doctor == doctor_id,
         Horario.dia_semana == dia_semana,
         Horario.activo == True,
@@ -52,10 +88,10 @@ def verificar_solapamiento(
             Horario.hora_fin > hora_inicio
         )
     )
-    
+
     if horario_id_excluir:
         query = query.filter(Horario.id_horario != horario_id_excluir)
-    
+
     return query.first() is not None
 
 def update(db: Session, horario_id: int, horario_data: HorarioUpdate) -> Horario:
@@ -67,6 +103,7 @@ def update(db: Session, horario_id: int, horario_data: HorarioUpdate) -> Horario
             setattr(horario, key, value)
         db.commit()
         db.refresh(horario)
+        invalidar_doctor(horario.id_doctor)
     return horario
 
 def delete(db: Session, horario_id: int) -> bool:
@@ -75,5 +112,73 @@ def delete(db: Session, horario_id: int) -> bool:
     if horario:
         db.delete(horario)
         db.commit()
+        invalidar_doctor(horario.id_doctor)
         return True
-    return False
\ No newline at end of file
+    return False
+
+def reemplazar_plantilla(db: Session, doctor_ids: List[int], bloques: List[BloqueHorario]) -> Dict[int, dict]:
+    """
+    Reemplaza los horarios activos de uno o varios doctores por una plantilla semanal,
+    en una sola transacción.
+
+    Primero se bloquean las filas de los doctores (bloquear_doctores), así que no se
+    intercala con otra plantilla ni con altas de horarios de los mismos doctores.
+    Por cada doctor se conservan los bloques idénticos, se reutilizan (UPDATE) las filas
+    sobrantes para los bloques nuevos, se insertan con executemany los que falten y se
+    desactivan las filas que ya no forman parte de la plantilla.
+
+    Returns:
+        Resumen por doctor: {id_doctor: {"creados", "actualizados", "desactivados", "sin_cambios"}}
+    """
+    bloquear_doctores(db, doctor_ids)
+    existentes = defaultdict(list)
+    for h in get_by_doctores(db, doctor_ids):
+        existentes[h.id_doctor].append(h)
+
+    claves_plantilla = {(b.dia_semana, b.hora_inicio, b.hora_fin) for b in bloques}
+    plantilla = sorted(claves_plantilla)
+    nuevas = []
+    resumen = {}
+
+    for doctor_id in doctor_ids:
+        actuales = {}
+        sobrantes = []
+        for h in existentes.get(doctor_id, []):
+            clave = (h.dia_semana, h.hora_inicio, h.hora_fin)
+            if clave in actuales:
+                sobrantes.append(h)
+            else:
+                actuales[clave] = h
+
+        faltantes = [clave for clave in plantilla if clave not in actuales]
+        sobrantes += [h for clave, h in actuales.items() if clave not in claves_plantilla]
+        sobrantes.sort(key=lambda h: (h.dia_semana, h.hora_inicio))
+
+        actualizados = min(len(faltantes), len(sobrantes))
+        for (dia, inicio, fin), h in zip(faltantes, sobrantes):
+            h.dia_semana, h.hora_inicio, h.hora_fin = dia, inicio, fin
+        for h in sobrantes[actualizados:]:
+            h.activo = False
+        for dia, inicio, fin in faltantes[actualizados:]:
+            nuevas.append({
+                "id_doctor": doctor_id,
+                "dia_semana": dia,
+                "hora_inicio": inicio,
+                "hora_fin": fin,
+                "activo": True
+            })
+
+        resumen[doctor_id] = {
+            "creados": len(faltantes) - actualizados,
+            "actualizados": actualizados,
+            "desactivados": len(sobrantes) - actualizados,
+            "sin_cambios": len(plantilla) - len(faltantes)
+        }
+
+    if nuevas:
+        db.execute(insert(Horario), nuevas)
+    db.commit()
+
+    for doctor_id in doctor_ids:
+        invalidar_doctor(doctor_id)
+    return resumen
@@ -0,0 +1,142 @@
+"""
+Índice en memoria de los horarios activos por doctor y día de la semana
+"""
+import os
+import threading
+import time as reloj
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from app.models.horario import Horario
+
+# Segundos que una entrada del índice se considera válida. Acota el desfase entre
+# procesos cuando otro worker modifica horarios de un doctor.
+INDICE_HORARIOS_TTL = float(os.getenv("INDICE_HORARIOS_TTL", "300"))
+
+# Bloque de horario: (hora_inicio, hora_fin, id_horario)
+Bloque = Tuple[time, time, int]
+
+
+def _a_minutos(hora: time) -> int:
+    return hora.hour * 60 + hora.minute
+
+
+class _BloquesDoctor:
+    """Bloques activos de un doctor, ordenados por hora de inicio en cada día"""
+
+    __slots__ = ("cargado", "por_dia", "inicios", "minutos")
+
+    def __init__(self, horarios: List[Horario]):
+        por_dia = defaultdict(list)
+        for h in horarios:
+            por_dia[h.dia_semana].append((h.hora_inicio, h.hora_fin, h.id_horario))
+        for rangos in por_dia.values():
+            rangos.sort()
+
+        self.cargado = reloj.monotonic()
+        self.por_dia: Dict[str, List[Bloque]] = dict(por_dia)
+        self.inicios = {dia: [b[0] for b in rangos] for dia, rangos in self.por_dia.items()}
+        self.minutos = {
+            dia: [(_a_minutos(ini), _a_minutos(fin)) for ini, fin, _ in rangos]
+            for dia, rangos in self.por_dia.items()
+        }
+
+
+class IndiceHorarios:
+    """
+    Índice de intervalos de los horarios activos, por doctor y día de la semana.
+
+    Cada doctor se carga de forma perezosa con una sola consulta la primera vez que
+    se necesita y se invalida cuando sus horarios cambian. Las consultas de
+    solapamiento y de pertenencia al horario se resuelven con búsqueda binaria
+    sobre los intervalos ordenados, sin ir a la base de datos.
+    """
+
+    def __init__(self, ttl_segundos: float = INDICE_HORARIOS_TTL):
+        self._ttl = ttl_segundos
+        self._doctores: Dict[int, _BloquesDoctor] = {}
+        self._versiones: Dict[int, int] = defaultdict(int)
+        self._generacion = 0
+        self._lock = threading.Lock()
+
+    def _vigente(self, doctor_id: int) -> Optional[_BloquesDoctor]:
+        entrada = self._doctores.get(doctor_id)
+        if entrada and reloj.monotonic() - entrada.cargado < self._ttl:
+            return entrada
+        return None
+
+    def _cargar(self, db: Session, doctor_ids: List[int]) -> Dict[int, _BloquesDoctor]:
+        """Carga en una sola consulta los doctores que no están en el índice"""
+        resultado = {}
+        faltantes = []
+        with self._lock:
+            for doctor_id in doctor_ids:
+                entrada = self._vigente(doctor_id)
+                if entrada:
+                    resultado[doctor_id] = entrada
+                else:
+                    faltantes.append(doctor_id)
+            versiones = {doctor_id: (self._generacion, self._versiones[doctor_id]) for doctor_id in faltantes}
+
+        if not faltantes:
+            return resultado
+
+        horarios = defaultdict(list)
+        for h in db.query(Horario).filter(Horario.id_doctor.in_(faltantes), Horario.activo == True).all():
+            horarios[h.id_doctor].append(h)
+
+        with self._lock:
+            for doctor_id in faltantes:
+                entrada = _BloquesDoctor(horarios.get(doctor_id, []))
+                # Si hubo una invalidación durante la consulta, no se guarda el resultado
+                if (self._generacion, self._versiones[doctor_id]) == versiones[doctor_id]:
+                    self._doctores[doctor_id] = entrada
+                resultado[doctor_id] = entrada
+        return resultado
+
+    def bloques(self, db: Session, doctor_id: int) -> Dict[str, List[Bloque]]:
+        """Obtiene los bloques activos de un doctor agrupados por día de la semana"""
+        return self._cargar(db, [doctor_id])[doctor_id].por_dia
+
+    def bloques_en_minutos(self, db: Session, doctor_ids: List[int]) -> Dict[int, Dict[str, List[Tuple[int, int]]]]:
+        """Obtiene los bloques de varios doctores como rangos (inicio, fin) en minutos del día"""
+        return {doctor_id: entrada.minutos for doctor_id, entrada in self._cargar(db, doctor_ids).items()}
+
+    def tiene_horario(self, db: Session, doctor_id: int) -> bool:
+        """Indica si el doctor tiene al menos un bloque de horario activo"""
+        return bool(self._cargar(db, [doctor_id])[doctor_id].por_dia)
+
+    def dentro_de_horario(
+        self,
+        db: Session,
+        doctor_id: int,
+        dia_semana: str,
+        hora: time,
+        hora_fin: Optional[time] = None
+    ) -> bool:
+        """Verifica si la hora (o el rango hasta hora_fin) cae dentro de un bloque activo del día"""
+        entrada = self._cargar(db, [doctor_id])[doctor_id]
+        rangos = entrada.por_dia.get(dia_semana, [])
+        i = bisect_right(entrada.inicios.get(dia_semana, []), hora)
+        for inicio, fin, _ in reversed(rangos[:i]):
+            if hora < fin and (hora_fin is None or hora_fin <= fin):
+                return True
+        return False
+
+    def invalidar(self, doctor_id: int) -> None:
+        """Descarta los bloques de un doctor; se recargan en el próximo acceso"""
+        with self._lock:
+            self._versiones[doctor_id] += 1
+            self._doctores.pop(doctor_id, None)
+
+    def limpiar(self) -> None:
+        """Descarta todo el índice"""
+        with self._lock:
+            self._generacion += 1
+            self._doctores.clear()
+
+
+indice_horarios = IndiceHorarios()
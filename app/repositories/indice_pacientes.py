@@ -0,0 +1,248 @@
+"""
+Índice en memoria para la búsqueda de pacientes por prefijo de nombre, apellido,
+documento y correo
+"""
+import os
+import re
+import threading
+import time as reloj
+import unicodedata
+import heapq
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+from app.models.paciente import Paciente
+
+# Segundos entre sincronizaciones incrementales con la base de datos. Acota el desfase
+# cuando otro worker crea o modifica pacientes.
+INDICE_PACIENTES_SYNC = float(os.getenv("INDICE_PACIENTES_SYNC", "30"))
+
+# Filas que se leen por lote al cargar el índice
+LOTE_CARGA = 5000
+
+_COLUMNAS = (Paciente.id_paciente, Paciente.nombre, Paciente.apellido, Paciente.documento, Paciente.correo)
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Pasa el texto a minúsculas y sin tildes ("Pérez" -> "perez")"""
+    if not texto:
+        return ""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(*textos: Optional[str]) -> List[str]:
+    """Divide los textos normalizados en términos alfanuméricos, conservando el orden"""
+    return [t for texto in textos for t in re.findall(r"[a-z0-9]+", normalizar(texto))]
+
+
+class IndicePacientes:
+    """
+    Índice invertido término -> pacientes, con los términos ordenados para resolver
+    prefijos con búsqueda binaria.
+
+    Se carga al iniciar la aplicación (cargar()) o, si no, en la primera consulta, y se
+    mantiene al día con las escrituras de este proceso. Las de otros procesos se
+    incorporan con una sincronización incremental por updated_at; las eliminaciones
+    ajenas se descartan al leer de la base de datos los pacientes encontrados.
+
+    Las lecturas a la base de datos se hacen fuera de _lock, que solo protege el
+    intercambio o la mezcla de las estructuras; _lock_sync evita que varias
+    peticiones sincronicen a la vez.
+    """
+
+    def __init__(self, intervalo_sync: float = INDICE_PACIENTES_SYNC):
+        self._intervalo = intervalo_sync
+        self._pacientes: Dict[str, Set[int]] = {}
+        self._terminos: List[str] = []
+        self._por_paciente: Dict[int, Tuple[str, ...]] = {}
+        self._cargado = False
+        self._sincronizado = 0.0
+        self._marca: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._lock_sync = threading.Lock()
+
+    def _agregar(self, paciente_id: int, terminos: Tuple[str, ...], nuevos: Optional[List[str]] = None) -> None:
+        """
+        Indexa un paciente. Los términos que no estaban en el índice se insertan en
+        _terminos, o se acumulan en `nuevos` para mezclarlos de una vez.
+        """
+        self._quitar(paciente_id)
+        self._por_paciente[paciente_id] = terminos
+        for termino in set(terminos):
+            ids = self._pacientes.get(termino)
+            if ids is None:
+                ids = self._pacientes[termino] = set()
+                if nuevos is None:
+                    insort(self._terminos, termino)
+                else:
+                    nuevos.append(termino)
+            ids.add(paciente_id)
+
+    def _quitar(self, paciente_id: int) -> None:
+        for termino in set(self._por_paciente.pop(paciente_id, ())):
+            ids = self._pacientes[termino]
+            ids.discard(paciente_id)
+            if not ids:
+                del self._pacientes[termino]
+                i = bisect_left(self._terminos, termino)
+                if i < len(self._terminos) and self._terminos[i] == termino:
+                    del self._terminos[i]
+
+    @staticmethod
+    def _leer(db: Session, desde: Optional[datetime] = None):
+        """Pacientes (id, términos) y el mayor updated_at leído, modificados desde `desde` si se indica"""
+        query = db.query(*_COLUMNAS, Paciente.updated_at)
+        if desde is not None:
+            # >= porque updated_at tiene resolución de segundos; reindexar es idempotente
+            query = query.filter(Paciente.updated_at >= desde)
+
+        filas, marca = [], desde
+        for id_paciente, nombre, apellido, documento, correo, updated_at in query.yield_per(LOTE_CARGA):
+            filas.append((id_paciente, tuple(tokenizar(nombre, apellido, documento, correo))))
+            if updated_at is not None and (marca is None or updated_at > marca):
+                marca = updated_at
+        return filas, marca
+
+    def _cargar(self, db: Session) -> None:
+        """Construye el índice completo y ordena los términos una sola vez"""
+        ahora = reloj.monotonic()
+        filas, marca = self._leer(db)
+        pacientes: Dict[str, Set[int]] = {}
+        por_paciente: Dict[int, Tuple[str, ...]] = {}
+        for paciente_id, terminos in filas:
+            por_paciente[paciente_id] = terminos
+            for termino in set(terminos):
+                pacientes.setdefault(termino, set()).add(paciente_id)
+        terminos_ordenados = sorted(pacientes)
+
+        with self._lock:
+            self._pacientes = pacientes
+            self._terminos = terminos_ordenados
+            self._por_paciente = por_paciente
+            self._marca = marca
+            self._cargado = True
+            self._sincronizado = ahora
+
+    def cargar(self, db: Session) -> None:
+        """Carga el índice completo; se llama al iniciar la aplicación"""
+        with self._lock_sync:
+            self._cargar(db)
+
+    def _sincronizar(self, db: Session) -> None:
+        """Carga el índice completo o, si ya está cargado, los pacientes modificados desde la última vez"""
+        ahora = reloj.monotonic()
+        if self._cargado and ahora - self._sincronizado < self._intervalo:
+            return
+        # Si otra petición ya está sincronizando, se busca sobre el índice actual
+        if not self._lock_sync.acquire(blocking=not self._cargado):
+            return
+        try:
+            if not self._cargado:
+                self._cargar(db)
+                return
+
+            filas, marca = self._leer(db, self._marca)
+            with self._lock:
+                nuevos: List[str] = []
+                for paciente_id, terminos in filas:
+                    self._agregar(paciente_id, terminos, nuevos)
+                nuevos = sorted({t for t in nuevos if t in self._pacientes})
+                if nuevos:
+                    self._terminos = list(heapq.merge(self._terminos, nuevos))
+                self._marca = marca
+                self._sincronizado = ahora
+        finally:
+            self._lock_sync.release()
+
+    def _rango(self, prefijo: str):
+        """Términos del índice que empiezan por el prefijo, en orden"""
+        i = bisect_left(self._terminos, prefijo)
+        while i < len(self._terminos) and self._terminos[i].startswith(prefijo):
+            yield self._terminos[i]
+            i += 1
+
+    def _frecuencia(self, prefijo: str) -> int:
+        """Tamaño (con repeticiones) de las listas de pacientes de los términos con el prefijo"""
+        return sum(len(self._pacientes[termino]) for termino in self._rango(prefijo))
+
+    def _coincidencias(self, prefijo: str) -> Set[int]:
+        """Pacientes con algún término que empieza por el prefijo"""
+        return set().union(*(self._pacientes[termino] for termino in self._rango(prefijo)))
+
+    def _candidatos(self, consulta: List[str]) -> Set[int]:
+        """Intersección de los pacientes de cada término, empezando por el de menos coincidencias"""
+        candidatos = None
+        for q in sorted(consulta, key=self._frecuencia):
+            coincidencias = self._coincidencias(q)
+            candidatos = coincidencias if candidatos is None else candidatos & coincidencias
+            if not candidatos:
+                break
+        return candidatos
+
+    def buscar(self, db: Session, texto: str, limite: int = 20) -> List[int]:
+        """
+        Busca pacientes cuyos términos empiecen por cada uno de los términos del texto.
+
+        Los resultados se ordenan por número de términos que coinciden exactamente,
+        luego por la posición del primer término que coincide (nombre y apellido antes
+        que documento y correo) y por último por ID.
+
+        Returns:
+            IDs de los pacientes encontrados, del más al menos relevante
+        """
+        consulta = list(dict.fromkeys(tokenizar(texto)))
+        if not consulta:
+            return []
+
+        self._sincronizar(db)
+        with self._lock:
+            candidatos = self._candidatos(consulta)
+
+            # Se recorren por ID: cuando ya hay `limite` resultados con la mejor puntuación
+            # posible (todas exactas, en el primer término), ninguno posterior los supera
+            mejor = (-len(consulta), 0)
+            resultado, perfectos = [], 0
+            for paciente_id in sorted(candidatos):
+                terminos = self._por_paciente[paciente_id]
+                exactas = 0
+                posicion = len(terminos)
+                for q in consulta:
+                    exactas += q in terminos
+                    posicion = min(posicion, next(i for i, t in enumerate(terminos) if t.startswith(q)))
+                resultado.append((-exactas, posicion, paciente_id))
+                if (-exactas, posicion) == mejor:
+                    perfectos += 1
+                    if perfectos == limite:
+                        break
+
+        resultado.sort()
+        return [paciente_id for _, _, paciente_id in resultado[:limite]]
+
+    def actualizar(self, paciente: Paciente) -> None:
+        """Reindexa un paciente creado o modificado en este proceso"""
+        with self._lock:
+            if self._cargado:
+                self._agregar(
+                    paciente.id_paciente,
+                    tuple(tokenizar(paciente.nombre, paciente.apellido, paciente.documento, paciente.correo))
+                )
+
+    def quitar(self, paciente_id: int) -> None:
+        """Retira del índice un paciente eliminado"""
+        with self._lock:
+            self._quitar(paciente_id)
+
+    def limpiar(self) -> None:
+        """Descarta todo el índice; se recarga en la próxima búsqueda"""
+        with self._lock:
+            self._pacientes = {}
+            self._terminos = []
+            self._por_paciente = {}
+            self._cargado = False
+            self._marca = None
+
+
+indice_pacientes = IndicePacientes()
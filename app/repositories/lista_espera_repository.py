@@ -0,0 +1,176 @@
+"""
+Repositorio para operaciones de la Lista de Espera
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from app.models.lista_espera import ListaEspera
+from app.models.cita import CitaMedica
+from app.schemas.lista_espera import ListaEsperaCreate
+from typing import Iterable, Optional, List
+from datetime import date, datetime, time
+
+def create(db: Session, data: ListaEsperaCreate) -> ListaEspera:
+    """Inscribe a un paciente en la lista de espera"""
+    entrada = ListaEspera(**data.dict(), estado='activa')
+    db.add(entrada)
+    db.commit()
+    db.refresh(entrada)
+    return entrada
+
+def get_by_id(db: Session, entrada_id: int) -> Optional[ListaEspera]:
+    """Obtiene una solicitud de la lista de espera por ID"""
+    return db.query(ListaEspera).filter(ListaEspera.id_lista_espera == entrada_id).first()
+
+def get_all(
+    db: Session,
+    id_paciente: Optional[int] = None,
+    id_doctor: Optional[int] = None,
+    estado: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[ListaEspera]:
+    """Lista solicitudes de la lista de espera con filtros opcionales"""
+    query = db.query(ListaEspera)
+    if id_paciente:
+        query = query.filter(ListaEspera.id_paciente == id_paciente)
+    if id_doctor:
+        query = query.filter(ListaEspera.id_doctor == id_doctor)
+    if estado:
+        query = query.filter(ListaEspera.estado == estado)
+    return query.order_by(ListaEspera.created_at, ListaEspera.id_lista_espera).offset(skip).limit(limit).all()
+
+def _candidatas(db: Session, doctor_id: int, fecha: date, hora: time, excluir: Iterable[int]):
+    query = db.query(ListaEspera).filter(
+        ListaEspera.estado == 'activa',
+        ListaEspera.fecha_desde <= fecha,
+        ListaEspera.fecha_hasta >= fecha,
+        or_(ListaEspera.hora_desde == None, ListaEspera.hora_desde <= hora),
+        or_(ListaEspera.hora_hasta == None, ListaEspera.hora_hasta > hora),
+        # Quien ya rechazó o dejó vencer este mismo slot no vuelve a recibirlo
+        or_(
+            ListaEspera.oferta_fecha == None,
+            ListaEspera.oferta_id_doctor == None,
+            ListaEspera.oferta_id_doctor != doctor_id,
+            ListaEspera.oferta_fecha != fecha,
+            ListaEspera.oferta_hora != hora
+        )
+    )
+    excluir = list(excluir)
+    if excluir:
+        query = query.filter(ListaEspera.id_lista_espera.notin_(excluir))
+    return query.order_by(ListaEspera.created_at, ListaEspera.id_lista_espera)
+
+def buscar_candidata(
+    db: Session,
+    doctor_id: int,
+    especialidad_id: int,
+    fecha: date,
+    hora: time,
+    excluir: Iterable[int] = ()
+) -> Optional[ListaEspera]:
+    """
+    Busca la solicitud activa más antigua que acepta un slot liberado, sin contar las
+    de `excluir` (solicitudes con las que ya no se pudo agendar el slot).
+
+    Se consulta por separado quienes esperan a ese doctor y quienes esperan cualquier
+    doctor de la especialidad, para que cada consulta use su índice compuesto
+    (doctor/especialidad, estado, ventana de fechas) en lugar de recorrer la tabla.
+    """
+    excluir = list(excluir)
+    por_doctor = _candidatas(db, doctor_id, fecha, hora, excluir).filter(ListaEspera.id_doctor == doctor_id).first()
+    por_especialidad = _candidatas(db, doctor_id, fecha, hora, excluir).filter(
+        ListaEspera.id_doctor == None,
+        ListaEspera.id_especialidad == especialidad_id
+    ).first()
+
+    candidatas = [c for c in (por_doctor, por_especialidad) if c]
+    if not candidatas:
+        return None
+    return min(candidatas, key=lambda c: (c.created_at, c.id_lista_espera))
+
+def hay_oferta_vigente(db: Session, doctor_id: int, fecha: date, hora: time, ahora: datetime) -> bool:
+    """Indica si el slot ya está ofrecido a una solicitud y la oferta no ha vencido"""
+    return db.query(ListaEspera.id_lista_espera).filter(
+        ListaEspera.estado == 'ofrecida',
+        ListaEspera.oferta_expira > ahora,
+        ListaEspera.oferta_id_doctor == doctor_id,
+        ListaEspera.oferta_fecha == fecha,
+        ListaEspera.oferta_hora == hora
+    ).first() is not None
+
+def ofrecer(db: Session, entrada: ListaEspera, doctor_id: int, fecha: date, hora: time, expira: datetime) -> ListaEspera:
+    """Registra el slot ofrecido a una solicitud y hasta cuándo puede aceptarlo"""
+    entrada.estado = 'ofrecida'
+    entrada.oferta_id_doctor = doctor_id
+    entrada.oferta_fecha = fecha
+    entrada.oferta_hora = hora
+    entrada.oferta_expira = expira
+    db.commit()
+    db.refresh(entrada)
+    return entrada
+
+def asignar(db: Session, entrada: ListaEspera, cita: CitaMedica) -> ListaEspera:
+    """Marca una solicitud como atendida con la cita agendada"""
+    entrada.estado = 'asignada'
+    entrada.id_cita = cita.id_cita
+    entrada.oferta_id_doctor = cita.id_doctor
+    entrada.oferta_fecha = cita.fecha
+    entrada.oferta_hora = cita.hora
+    entrada.oferta_expira = None
+    db.commit()
+    db.refresh(entrada)
+    return entrada
+
+def reactivar(db: Session, entrada: ListaEspera, recordar_oferta: bool = False) -> ListaEspera:
+    """
+    Devuelve una solicitud a la cola y descarta la oferta pendiente.
+
+    Con recordar_oferta (oferta rechazada o vencida) se conserva el slot para no
+    volver a ofrecérselo.
+    """
+    entrada.estado = 'activa'
+    entrada.oferta_expira = None
+    if not recordar_oferta:
+        entrada.oferta_id_doctor = None
+        entrada.oferta_fecha = None
+        entrada.oferta_hora = None
+    db.commit()
+    db.refresh(entrada)
+    return entrada
+
+def rechazar(db: Session, entrada: ListaEspera) -> ListaEspera:
+    """Da por vencida la oferta pendiente de una solicitud, para reasignar el slot"""
+    entrada.oferta_expira = datetime.now()
+    db.commit()
+    db.refresh(entrada)
+    return entrada
+
+def reactivar_vencidas(db: Session, ahora: datetime) -> List[tuple]:
+    """
+    Devuelve a la cola, en una sola transacción, las solicitudes cuya oferta venció sin
+    respuesta (o que el paciente rechazó), recordando el slot para no volver a ofrecérselo.
+
+    Las filas se bloquean (SKIP LOCKED) para que dos procesos no reasignen el mismo slot.
+
+    Returns:
+        Slots (id_doctor, fecha, hora) que quedaron libres para reasignar
+    """
+    vencidas = db.query(ListaEspera).filter(
+        ListaEspera.estado == 'ofrecida',
+        ListaEspera.oferta_expira <= ahora
+    ).order_by(ListaEspera.oferta_expira).with_for_update(skip_locked=True).all()
+
+    slots = []
+    for entrada in vencidas:
+        entrada.estado = 'activa'
+        entrada.oferta_expira = None
+        slots.append((entrada.oferta_id_doctor, entrada.oferta_fecha, entrada.oferta_hora))
+    db.commit()
+    return slots
+
+def cancelar(db: Session, entrada: ListaEspera) -> ListaEspera:
+    """Retira una solicitud de la lista de espera"""
+    entrada.estado = 'cancelada'
+    db.commit()
+    db.refresh(entrada)
+    return entrada
@@ -4,8 +4,19 @@ Repositorio para operaciones CRUD de Pacientes
 from sqlalchemy.orm import Session
 from app.models.paciente import Paciente
 from app.schemas.paciente import PacienteCreate, PacienteUpdate
+from app.utils.paginacion import paginar
+from app.utils.proyeccion import Proyeccion, aplicar_proyeccion
+from app.repositories.indice_pacientes import indice_pacientes
+from app.cache import cache
 from typing import Optional, List
 
+# Clave de orden de la paginación por cursor
+ORDEN_LISTADO = (Paciente.id_paciente,)
+
+def invalidar_cache(paciente_id: int) -> None:
+    """Descarta los datos en caché que dependen de un paciente (listados, historias)"""
+    cache.invalidar("pacientes", f"paciente:{paciente_id}")
+
 def create(db: Session, paciente_data: PacienteCreate) -> Paciente:
     """
     Crea un nuevo paciente en la base de datos.
@@ -30,21 +41,25 @@ def create(db: Session, paciente_data: PacienteCreate) -> Paciente:
     db.add(paciente)
     db.commit()
     db.refresh(paciente)
+    indice_pacientes.actualizar(paciente)
+    invalidar_cache(paciente.id_paciente)
     
     return paciente
 
-def get_by_id(db: Session, paciente_id: int) -> Optional[Paciente]:
+def get_by_id(db: Session, paciente_id: int, proyeccion: Optional[Proyeccion] = None) -> Optional[Paciente]:
     """
     Obtiene un paciente por su ID.
     
     Args:
         db: Sesión de base de datos
         paciente_id: ID del paciente
+        proyeccion: Campos a cargar (por defecto, todos)
         
     Returns:
         Paciente encontrado o None
     """
-    return db.query(Paciente).filter(Paciente.id_paciente == paciente_id).first()
+    return aplicar_proyeccion(db.query(Paciente), proyeccion)\
+        .filter(Paciente.id_paciente == paciente_id).first()
 
 def get_by_documento(db: Session, documento: str) -> Optional[Paciente]:
     """
@@ -72,19 +87,69 @@ def get_by_correo(db: Session, correo: str) -> Optional[Paciente]:
     """
     return db.query(Paciente).filter(Paciente.correo == correo).first()
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[Paciente]:
+def get_all(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    proyeccion: Optional[Proyeccion] = None
+) -> List[Paciente]:
     """
     Obtiene lista de pacientes con paginación.
     
     Args:
         db: Sesión de base de datos
-        skip: Número de registros a saltar
+        skip: Número de registros a saltar (si no se usa cursor)
         limit: Límite de registros a retornar
+        cursor: Cursor de la página anterior (paginación por id_paciente)
+        proyeccion: Campos a cargar (por defecto, todos)
         
     Returns:
         Lista de pacientes
     """
-    return db.query(Paciente).offset(skip).limit(limit).all()
+    query = aplicar_proyeccion(db.query(Paciente), proyeccion, columnas_requeridas=ORDEN_LISTADO)
+    return paginar(query, ORDEN_LISTADO, cursor, skip, limit)
+
+def buscar(db: Session, texto: str, limit: int = 20) -> List[Paciente]:
+    """
+    Busca pacientes por prefijo de nombre, apellido, documento o correo, sin
+    distinguir mayúsculas ni tildes.
+    
+    Args:
+        db: Sesión de base de datos
+        texto: Términos a buscar; cada uno debe ser prefijo de algún campo
+        limit: Límite de registros a retornar
+        
+    Returns:
+        Lista de pacientes ordenada por relevancia
+    """
+    ids = indice_pacientes.buscar(db, texto, limit)
+    if not ids:
+        return []
+    pacientes = {p.id_paciente: p for p in db.query(Paciente).filter(Paciente.id_paciente.in_(ids)).all()}
+    return [pacientes[i] for i in ids if i in pacientes]
+
+# Columnas de la exportación de pacientes, en el orden de iterar_exportacion
+COLUMNAS_EXPORTACION = (
+    "id_paciente", "nombre", "apellido", "documento", "correo", "telefono",
+    "fecha_nacimiento", "direccion", "created_at", "updated_at"
+)
+
+def iterar_exportacion(db: Session, lote: int = 1000):
+    """
+    Recorre todos los pacientes como tuplas de columnas.
+    
+    Args:
+        db: Sesión de base de datos
+        lote: Filas que se leen por lote con el cursor del lado del servidor
+        
+    Returns:
+        Iterador de filas en el orden de COLUMNAS_EXPORTACION
+    """
+    return db.query(*(getattr(Paciente, c) for c in COLUMNAS_EXPORTACION))\
+        .order_by(*ORDEN_LISTADO)\
+        .execution_options(stream_results=True)\
+        .yield_per(lote)
 
 def update(db: Session, paciente_id: int, paciente_data: PacienteUpdate) -> Paciente:
     """
@@ -108,6 +173,8 @@ def update(db: Session, paciente_id: int, paciente_data: PacienteUpdate) -> Paci
         
         db.commit()
         db.refresh(paciente)
+        indice_pacientes.actualizar(paciente)
+        invalidar_cache(paciente_id)
     
     return paciente
 
@@ -127,6 +194,8 @@ def delete(db: Session, paciente_id: int) -> bool:
     if paciente:
         db.delete(paciente)
         db.commit()
+        indice_pacientes.quitar(paciente_id)
+        invalidar_cache(paciente_id)
         return True
     
     return False
\ No newline at end of file
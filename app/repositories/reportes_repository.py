@@ -0,0 +1,216 @@
+"""
+Repositorio de consultas agregadas para reportes.
+
+Las cifras de citas y montos se leen de estadistica_diaria, que se mantiene al día
+con cada escritura, en lugar de recorrer cita_medica y factura.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from app.models.estadistica import EstadisticaDiaria, EstadisticaAnticipacion
+from app.models.doctor import Doctor, Especialidad
+from app.models.cita import CitaMedica
+from app.models.factura import Factura, MetodoPago
+from app.models.horario import Horario
+from typing import List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+
+_TOTAL = func.sum(EstadisticaDiaria.citas)
+
+def _rango(query, fecha_desde: date, fecha_hasta: date):
+    return query.filter(EstadisticaDiaria.fecha >= fecha_desde, EstadisticaDiaria.fecha <= fecha_hasta)
+
+def citas_por_estado(db: Session, fecha_desde: date, fecha_hasta: date) -> List[tuple]:
+    """
+    Cuenta las citas del rango agrupadas por estado.
+
+    Returns:
+        Tuplas (estado, total)
+    """
+    query = db.query(EstadisticaDiaria.estado, _TOTAL)
+    return _rango(query, fecha_desde, fecha_hasta).group_by(EstadisticaDiaria.estado).all()
+
+def citas_por_especialidad(db: Session, fecha_desde: date, fecha_hasta: date) -> List[tuple]:
+    """
+    Cuenta las citas del rango agrupadas por la especialidad del doctor.
+
+    Returns:
+        Tuplas (id_especialidad, nombre, total) de mayor a menor total
+    """
+    query = db.query(Especialidad.id_especialidad, Especialidad.nombre, _TOTAL)\
+        .select_from(EstadisticaDiaria)\
+        .join(Doctor, Doctor.id_doctor == EstadisticaDiaria.id_doctor)\
+        .join(Especialidad, Especialidad.id_especialidad == Doctor.id_especialidad)
+    return _rango(query, fecha_desde, fecha_hasta)\
+        .group_by(Especialidad.id_especialidad, Especialidad.nombre)\
+        .having(_TOTAL > 0)\
+        .order_by(_TOTAL.desc())\
+        .all()
+
+def citas_por_dia(db: Session, fecha_desde: date, fecha_hasta: date) -> List[tuple]:
+    """
+    Cuenta las citas del rango agrupadas por fecha.
+
+    Returns:
+        Tuplas (fecha, total) ordenadas por fecha; los días sin citas no aparecen
+    """
+    query = db.query(EstadisticaDiaria.fecha, _TOTAL)
+    return _rango(query, fecha_desde, fecha_hasta)\
+        .group_by(EstadisticaDiaria.fecha)\
+        .order_by(EstadisticaDiaria.fecha)\
+        .all()
+
+def top_doctores(db: Session, fecha_desde: date, fecha_hasta: date, limite: int = 5) -> List[tuple]:
+    """
+    Obtiene los doctores con más citas en el rango.
+
+    Returns:
+        Tuplas (id_doctor, nombre, apellido, especialidad, total) de mayor a menor total
+    """
+    query = db.query(Doctor.id_doctor, Doctor.nombre, Doctor.apellido, Especialidad.nombre, _TOTAL)\
+        .select_from(EstadisticaDiaria)\
+        .join(Doctor, Doctor.id_doctor == EstadisticaDiaria.id_doctor)\
+        .join(Especialidad, Especialidad.id_especialidad == Doctor.id_especialidad)
+    return _rango(query, fecha_desde, fecha_hasta)\
+        .group_by(Doctor.id_doctor, Doctor.nombre, Doctor.apellido, Especialidad.nombre)\
+        .having(_TOTAL > 0)\
+        .order_by(_TOTAL.desc(), Doctor.id_doctor)\
+        .limit(limite)\
+        .all()
+
+def montos(db: Session, fecha_desde: date, fecha_hasta: date) -> Tuple:
+    """
+    Suma los montos facturados y pagados de las citas del rango.
+
+    Returns:
+        Tupla (monto_facturado, monto_pagado); None si no hay filas
+    """
+    query = db.query(func.sum(EstadisticaDiaria.monto_facturado), func.sum(EstadisticaDiaria.monto_pagado))
+    return _rango(query, fecha_desde, fecha_hasta).one()
+
+def facturas_por_dia(
+    db: Session,
+    fecha_desde: date,
+    fecha_hasta: date,
+    agrupar: Optional[str] = None
+) -> List[tuple]:
+    """
+    Cuenta y suma (DECIMAL exacto) las facturas emitidas en el rango por día de emisión,
+    estado y, opcionalmente, método de pago o especialidad del doctor.
+
+    Args:
+        agrupar: "metodo_pago", "especialidad" o None para no separar
+
+    Returns:
+        Tuplas (dia, id_grupo, nombre_grupo, estado, cantidad, monto)
+    """
+    dia = func.date(Factura.fecha_emision)
+    if agrupar == "metodo_pago":
+        grupo = (MetodoPago.id_metodo_pago, MetodoPago.nombre)
+    elif agrupar == "especialidad":
+        grupo = (Especialidad.id_especialidad, Especialidad.nombre)
+    else:
+        grupo = ()
+
+    query = db.query(dia, *grupo, Factura.estado, func.count(Factura.id_factura), func.sum(Factura.monto))
+    if agrupar == "metodo_pago":
+        query = query.join(MetodoPago, MetodoPago.id_metodo_pago == Factura.id_metodo_pago)
+    elif agrupar == "especialidad":
+        query = query.join(CitaMedica, CitaMedica.id_cita == Factura.id_cita)\
+            .join(Doctor, Doctor.id_doctor == CitaMedica.id_doctor)\
+            .join(Especialidad, Especialidad.id_especialidad == Doctor.id_especialidad)
+
+    filas = query.filter(
+        Factura.fecha_emision >= datetime.combine(fecha_desde, time.min),
+        Factura.fecha_emision < datetime.combine(fecha_hasta + timedelta(days=1), time.min)
+    ).group_by(dia, *grupo, Factura.estado).all()
+
+    if not grupo:
+        return [(d, None, None, estado, cantidad, monto) for d, estado, cantidad, monto in filas]
+    return filas
+
+def doctores_activos(db: Session) -> List[tuple]:
+    """
+    Obtiene los doctores activos con su especialidad, solo las columnas del reporte.
+
+    Returns:
+        Tuplas (id_doctor, nombre, apellido, especialidad) ordenadas por id_doctor
+    """
+    return db.query(Doctor.id_doctor, Doctor.nombre, Doctor.apellido, Especialidad.nombre)\
+        .join(Especialidad, Especialidad.id_especialidad == Doctor.id_especialidad)\
+        .filter(Doctor.activo == True)\
+        .order_by(Doctor.id_doctor)\
+        .all()
+
+def bloques_horario(db: Session) -> List[tuple]:
+    """
+    Obtiene los bloques de atención activos de los doctores activos.
+
+    Returns:
+        Tuplas (id_doctor, dia_semana, hora_inicio, hora_fin)
+    """
+    return db.query(Horario.id_doctor, Horario.dia_semana, Horario.hora_inicio, Horario.hora_fin)\
+        .join(Doctor, Doctor.id_doctor == Horario.id_doctor)\
+        .filter(Horario.activo == True, Doctor.activo == True)\
+        .all()
+
+def citas_reservadas_por_dia(db: Session, fecha_desde: date, fecha_hasta: date) -> List[tuple]:
+    """
+    Cuenta las citas no canceladas del rango por doctor y día.
+
+    Returns:
+        Tuplas (id_doctor, fecha, total)
+    """
+    query = db.query(EstadisticaDiaria.id_doctor, EstadisticaDiaria.fecha, _TOTAL)\
+        .filter(EstadisticaDiaria.estado != 'cancelada')
+    return _rango(query, fecha_desde, fecha_hasta)\
+        .group_by(EstadisticaDiaria.id_doctor, EstadisticaDiaria.fecha)\
+        .having(_TOTAL > 0)\
+        .all()
+
+def citas_por_grupo_y_estado(
+    db: Session,
+    fecha_desde: date,
+    fecha_hasta: date,
+    hoy: date,
+    por: str
+) -> List[tuple]:
+    """
+    Cuenta las citas del rango (desde estadistica_anticipacion) por grupo, estado y
+    según si su fecha ya pasó.
+
+    Args:
+        por: "doctor", "especialidad", "dia_semana" (agrupa por fecha) o "anticipacion"
+
+    Returns:
+        Tuplas (id_grupo, nombre_grupo, estado, pasada, total); nombre_grupo es None
+        para dia_semana (id_grupo es la fecha) y anticipacion (id_grupo es el tramo)
+    """
+    total = func.sum(EstadisticaAnticipacion.citas)
+    pasada = case((EstadisticaAnticipacion.fecha < hoy, 1), else_=0)
+    if por == "doctor":
+        grupo = (Doctor.id_doctor, Doctor.nombre + " " + Doctor.apellido)
+    elif por == "especialidad":
+        grupo = (Especialidad.id_especialidad, Especialidad.nombre)
+    elif por == "dia_semana":
+        grupo = (EstadisticaAnticipacion.fecha,)
+    else:
+        grupo = (EstadisticaAnticipacion.anticipacion,)
+
+    query = db.query(*grupo, EstadisticaAnticipacion.estado, pasada, total).select_from(EstadisticaAnticipacion)
+    if por in ("doctor", "especialidad"):
+        query = query.join(Doctor, Doctor.id_doctor == EstadisticaAnticipacion.id_doctor)
+    if por == "especialidad":
+        query = query.join(Especialidad, Especialidad.id_especialidad == Doctor.id_especialidad)
+
+    filas = query.filter(
+        EstadisticaAnticipacion.fecha >= fecha_desde,
+        EstadisticaAnticipacion.fecha <= fecha_hasta
+    ).group_by(*grupo, EstadisticaAnticipacion.estado, pasada).having(total > 0).all()
+
+    if len(grupo) == 1:
+        return [(id_grupo, None, estado, pasada, total) for id_grupo, estado, pasada, total in filas]
+    return filas
+
+def contar_doctores_activos(db: Session) -> int:
+    """Cuenta los doctores activos"""
+    return db.query(func.count(Doctor.id_doctor)).filter(Doctor.activo == True).scalar()
@@ -58,7 +58,8 @@ def login(
         token = generate_user_token(
             id_usuario=usuario.id_usuario,
             correo=usuario.correo,
-            rol=usuario.rol
+            rol=usuario.rol,
+            id_referencia=usuario.id_referencia
         )
         
         return {
@@ -70,7 +71,8 @@ def login(
                 "usuario": {
                     "id_usuario": usuario.id_usuario,
                     "correo": usuario.correo,
-                    "rol": usuario.rol
+                    "rol": usuario.rol,
+                    "id_referencia": usuario.id_referencia
                 }
             }
         }
@@ -0,0 +1,60 @@
+"""
+Router API para los feeds iCalendar (ICS) de citas
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db, get_session_factory
+from app.services.calendario_service import CalendarioService
+from app.utils.condicional import no_modificado, respuesta_no_modificada, cabeceras_etag
+
+router = APIRouter(prefix="/api/calendario", tags=["Calendario"])
+
+TIPO_ICS = "text/calendar"
+
+def _feed(request: Request, db: Session, sesiones, id_doctor: Optional[int] = None, id_paciente: Optional[int] = None):
+    try:
+        nombre = CalendarioService.validar_propietario(db, id_doctor, id_paciente)
+        etag = CalendarioService.calcular_etag(db, nombre, id_doctor, id_paciente)
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+    if no_modificado(request, etag):
+        return respuesta_no_modificada(etag)
+
+    return StreamingResponse(
+        CalendarioService.generar_ics(sesiones, nombre, id_doctor, id_paciente),
+        media_type=TIPO_ICS,
+        headers=cabeceras_etag(etag)
+    )
+
+@router.get("/doctor/{doctor_id}.ics")
+def feed_doctor(
+    doctor_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
+    """
+    Feed ICS con todas las citas de un doctor, para suscribirse desde una aplicación de calendario.
+    
+    Soporta **If-None-Match**: si el feed no cambió desde el último ETag se responde 304 sin cuerpo.
+    """
+    return _feed(request, db, sesiones, id_doctor=doctor_id)
+
+@router.get("/paciente/{paciente_id}.ics")
+def feed_paciente(
+    paciente_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
+    """
+    Feed ICS con todas las citas de un paciente.
+    
+    Soporta **If-None-Match**: si el feed no cambió desde el último ETag se responde 304 sin cuerpo.
+    """
+    return _feed(request, db, sesiones, id_paciente=paciente_id)
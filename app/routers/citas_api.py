@@ -1,12 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.cita import CitaCreate, CitaUpdateEstado
+from typing import List, Optional
+from datetime import date, time
+from app.database import get_db, get_session_factory
+from app.schemas.cita import CitaCreate, CitaUpdateEstado, CitaLoteCreate
 from app.services.citas_service import CitaService
-from app.dependencies.auth import require_any_authenticated
+from app.models.cita import CitaMedica, EstadoCita
+from app.services.disponibilidad_service import DisponibilidadService, DURACION_SLOT_DEFECTO
+from app.services.lista_espera_service import ListaEsperaService
+from app.repositories import citas_repository
+from app.utils.paginacion import siguiente_cursor
+from app.utils.proyeccion import crear_proyeccion
+from app.cache import cacheado
+from app.utils.condicional import etag_entidad, no_modificado, respuesta_no_modificada, cabeceras_etag
+from app.utils.exportacion import respuesta_exportacion
+from app.dependencies.auth import require_admin, require_any_authenticated
 
 router = APIRouter(prefix="/api/citas", tags=["Citas"])
 
+def _ofrecer_slot_liberado(background_tasks: BackgroundTasks, sesiones, cita, anterior: str) -> None:
+    """
+    Programa, después de responder, la reasignación del slot a la lista de espera.
+    Solo si la cita acaba de cancelarse: cancelarla otra vez no libera nada nuevo.
+    """
+    if cita.estado == 'cancelada' and anterior != 'cancelada':
+        background_tasks.add_task(
+            ListaEsperaService.procesar_slot_liberado, sesiones, cita.id_doctor, cita.fecha, cita.hora
+        )
+
+def _cita_listado(c) -> dict:
+    return {"id_cita": c.id_cita, "fecha": str(c.fecha), "hora": str(c.hora),
+            "id_paciente": c.id_paciente, "id_doctor": c.id_doctor,
+            "paciente": f"{c.paciente.nombre} {c.paciente.apellido}",
+            "doctor": f"{c.doctor.nombre} {c.doctor.apellido}",
+            "motivo": c.motivo,
+            "estado": c.estado}
+
 @router.post("", response_model=dict, status_code=status.HTTP_200_OK)
 def registrar_cita(cita_data: CitaCreate, db: Session = Depends(get_db)):
     try:
@@ -17,32 +46,251 @@ def registrar_cita(cita_data: CitaCreate, db: Session = Depends(get_db)):
     except:
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
+@router.post("/lote", response_model=dict, status_code=status.HTTP_200_OK)
+def registrar_citas_lote(lote: CitaLoteCreate, db: Session = Depends(get_db)):
+    """
+    Registra varias citas de un paciente con un doctor en una sola operación.
+    
+    - **ocurrencias**: Lista explícita de {fecha, hora}, o bien
+    - **recurrencia**: {fecha_inicio, hora, intervalo_dias, repeticiones}
+    - **todo_o_nada**: Si es true y alguna ocurrencia tiene conflicto, no se registra ninguna
+    
+    Retorna las citas creadas y los conflictos por ocurrencia.
+    """
+    try:
+        resultado = CitaService.crear_citas_lote(db, lote)
+        if resultado["conflictos"] and not resultado["creadas"]:
+            return {
+                "success": False,
+                "mensaje": "No se registró ninguna cita por conflictos de horario",
+                "error_code": 409,
+                "data": resultado
+            }
+        return {
+            "success": True,
+            "mensaje": f"{len(resultado['creadas'])} citas registradas, {len(resultado['conflictos'])} conflictos",
+            "data": resultado
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
 @router.get("", response_model=dict)
-def listar_citas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@cacheado(["citas", "pacientes", "doctores"])
+def listar_citas(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    id_doctor: Optional[int] = None,
+    id_paciente: Optional[int] = None,
+    estado: Optional[List[EstadoCita]] = Query(None, description="Uno o varios estados (repetir el parámetro)"),
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    hora: Optional[time] = None,
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: paciente, doctor, especialidad"),
+    db: Session = Depends(get_db)
+):
+    """
+    Lista citas en orden cronológico. Los filtros se aplican en la base de datos:
+
+    - **id_doctor** / **id_paciente**: citas de un doctor o de un paciente
+    - **estado**: uno o varios estados, p. ej. `?estado=pendiente&estado=confirmada`
+    - **fecha_desde** / **fecha_hasta**: rango de fechas (inclusive)
+    - **hora**: hora exacta de la cita
+    - **fields**: Columnas a retornar (p. ej. `id_cita,fecha,hora,estado`); solo se leen esas columnas
+    - **expand**: Incluye el paciente, el doctor o la especialidad completos
+    """
+    try:
+        proyeccion = crear_proyeccion(CitaMedica, fields, expand, citas_repository.RELACIONES)
+        citas = CitaService.listar_citas(
+            db, skip, limit, cursor,
+            id_doctor=id_doctor,
+            id_paciente=id_paciente,
+            estados=[e.value for e in estado] if estado else None,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            hora=hora,
+            proyeccion=proyeccion
+        )
+        data = [proyeccion.serializar(c, _cita_listado) for c in citas]
+        return {
+            "success": True,
+            "mensaje": "Citas obtenidas",
+            "data": data,
+            "next_cursor": siguiente_cursor(citas, citas_repository.ORDEN_LISTADO, limit)
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.get("/exportar")
+def exportar_citas(
+    formato: str = Query("ndjson", description="ndjson o csv"),
+    id_doctor: Optional[int] = None,
+    id_paciente: Optional[int] = None,
+    estado: Optional[List[EstadoCita]] = Query(None, description="Uno o varios estados (repetir el parámetro)"),
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    hora: Optional[time] = None,
+    sesiones=Depends(get_session_factory),
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Exporta las citas como NDJSON o CSV (requiere rol admin).
+
+    Acepta los mismos filtros que el listado. Las filas se envían a medida que se
+    leen, sin cargar la tabla en memoria.
+    """
+    try:
+        filtros = {
+            "id_doctor": id_doctor,
+            "id_paciente": id_paciente,
+            "estados": [e.value for e in estado] if estado else None,
+            "fecha_desde": fecha_desde,
+            "fecha_hasta": fecha_hasta,
+            "hora": hora
+        }
+        CitaService.validar_filtros(**filtros)
+        return respuesta_exportacion(
+            sesiones, "citas", formato, citas_repository.COLUMNAS_EXPORTACION,
+            lambda db: citas_repository.iterar_exportacion(db, **filtros)
+        )
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.get("/mias", response_model=dict)
+def listar_mis_citas(
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    estado: Optional[List[EstadoCita]] = Query(None, description="Uno o varios estados (repetir el parámetro)"),
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    id_doctor: Optional[int] = Query(None, description="Solo para pacientes: citas con un doctor"),
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: paciente, doctor, especialidad"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_any_authenticated)
+):
+    """
+    Lista las citas del usuario autenticado: las del doctor si el rol es doctor o
+    las del paciente si el rol es paciente, según el token.
+    """
     try:
-        citas = CitaService.listar_citas(db, skip, limit)
-        data = [{"id_cita": c.id_cita, "fecha": str(c.fecha), "hora": str(c.hora), 
-                 "paciente": f"{c.paciente.nombre} {c.paciente.apellido}",
-                 "doctor": f"{c.doctor.nombre} {c.doctor.apellido}", 
-                 "estado": c.estado} for c in citas]
-        return {"success": True, "mensaje": "Citas obtenidas", "data": data}
+        proyeccion = crear_proyeccion(CitaMedica, fields, expand, citas_repository.RELACIONES)
+        filtros = {
+            "estados": [e.value for e in estado] if estado else None,
+            "fecha_desde": fecha_desde,
+            "fecha_hasta": fecha_hasta,
+            "proyeccion": proyeccion
+        }
+        if current_user.get("rol") == "paciente":
+            filtros["id_doctor"] = id_doctor
+        citas = CitaService.listar_citas_usuario(db, current_user, limit, cursor, **filtros)
+        data = [proyeccion.serializar(c, _cita_listado) for c in citas]
+        return {
+            "success": True,
+            "mensaje": "Citas obtenidas",
+            "data": data,
+            "next_cursor": siguiente_cursor(citas, citas_repository.ORDEN_LISTADO, limit)
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.get("/disponibilidad", response_model=dict)
+def consultar_disponibilidad(
+    id_doctor: List[int] = Query(..., description="Uno o varios IDs de doctor"),
+    fecha_desde: date = Query(...),
+    fecha_hasta: Optional[date] = None,
+    duracion: int = Query(DURACION_SLOT_DEFECTO, ge=5, le=240, description="Duración del slot en minutos"),
+    db: Session = Depends(get_db)
+):
+    """
+    Calcula los slots libres de uno o varios doctores en un rango de fechas.
+    
+    - **id_doctor**: ID del doctor (se puede repetir para consultar varios)
+    - **fecha_desde**: Fecha inicial (YYYY-MM-DD)
+    - **fecha_hasta**: Fecha final (default: fecha_desde)
+    - **duracion**: Duración de cada slot en minutos (default: 30)
+    """
+    try:
+        data = DisponibilidadService.consultar_disponibilidad(
+            db, id_doctor, fecha_desde, fecha_hasta or fecha_desde, duracion
+        )
+        return {"success": True, "mensaje": "Disponibilidad obtenida", "data": data}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.get("/disponibilidad/especialidad/{especialidad_id}", response_model=dict)
+def proximos_slots_especialidad(
+    especialidad_id: int,
+    cantidad: int = Query(10, ge=1, le=100),
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    duracion: int = Query(DURACION_SLOT_DEFECTO, ge=5, le=240),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca los primeros slots libres entre todos los doctores activos de una especialidad.
+    
+    - **especialidad_id**: ID de la especialidad
+    - **cantidad**: Número de slots a retornar (default: 10)
+    - **fecha_desde**: Fecha inicial de búsqueda (default: hoy)
+    - **fecha_hasta**: Fecha final de búsqueda (default: fecha_desde + 61 días)
+    - **duracion**: Duración de cada slot en minutos (default: 30)
+    """
+    try:
+        data = DisponibilidadService.proximos_slots_especialidad(
+            db, especialidad_id, cantidad, fecha_desde, fecha_hasta, duracion
+        )
+        return {"success": True, "mensaje": "Próximos horarios disponibles", "data": data}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except:
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
 @router.get("/{cita_id}", response_model=dict)
-def obtener_cita(cita_id: int, db: Session = Depends(get_db)):
+def obtener_cita(
+    cita_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: paciente, doctor, especialidad"),
+    db: Session = Depends(get_db)
+):
+    """Soporta **If-None-Match**: si la cita (y lo expandido) no cambió se responde 304 sin cuerpo."""
     try:
-        cita = CitaService.obtener_cita(db, cita_id)
-        return {"success": True, "mensaje": "Cita encontrada", "data": cita.to_dict()}
+        proyeccion = crear_proyeccion(CitaMedica, fields, expand, citas_repository.RELACIONES)
+        etag = etag_entidad(db, CitaMedica, cita_id, proyeccion.rutas_incluidas(), proyeccion.variante)
+        if etag and no_modificado(request, etag):
+            return respuesta_no_modificada(etag)
+        cita = CitaService.obtener_cita(db, cita_id, proyeccion)
+        if etag:
+            response.headers.update(cabeceras_etag(etag))
+        return {"success": True, "mensaje": "Cita encontrada", "data": proyeccion.serializar(cita)}
     except HTTPException as e:
         return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except:
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
 @router.put("/actualizar_estado", response_model=dict)
-def actualizar_estado_cita(data: CitaUpdateEstado, db: Session = Depends(get_db)):
+def actualizar_estado_cita(
+    data: CitaUpdateEstado,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
     try:
-        cita = CitaService.actualizar_estado(db, data.id_cita, data.estado)
+        cita, anterior = CitaService.actualizar_estado(db, data.id_cita, data.estado)
+        _ofrecer_slot_liberado(background_tasks, sesiones, cita, anterior)
         return {"success": True, "mensaje": "Estado actualizado", "data": {"estado": cita.estado}}
     except HTTPException as e:
         return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
@@ -50,7 +298,13 @@ def actualizar_estado_cita(data: CitaUpdateEstado, db: Session = Depends(get_db)
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
 @router.put("/{id_cita}/estado", response_model=dict)
-def actualizar_estado_cita_nuevo(id_cita: int, estado_data: dict, db: Session = Depends(get_db)):
+def actualizar_estado_cita_nuevo(
+    id_cita: int,
+    estado_data: dict,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
     """
     Actualiza el estado de una cita médica.
     
@@ -66,7 +320,8 @@ def actualizar_estado_cita_nuevo(id_cita: int, estado_data: dict, db: Session =
         if estado not in ['pendiente', 'confirmada', 'completada', 'cancelada']:
             return {"success": False, "mensaje": "Estado inválido", "error_code": 400}
         
-        cita = CitaService.actualizar_estado(db, id_cita, estado)
+        cita, anterior = CitaService.actualizar_estado(db, id_cita, estado)
+        _ofrecer_slot_liberado(background_tasks, sesiones, cita, anterior)
         return {"success": True, "mensaje": "Estado actualizado exitosamente", "data": {"estado": cita.estado}}
     except HTTPException as e:
         return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
@@ -75,9 +330,15 @@ def actualizar_estado_cita_nuevo(id_cita: int, estado_data: dict, db: Session =
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
 @router.delete("/{cita_id}", response_model=dict)
-def cancelar_cita(cita_id: int, db: Session = Depends(get_db)):
+def cancelar_cita(
+    cita_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
     try:
-        CitaService.cancelar_cita(db, cita_id)
+        cita, anterior = CitaService.cancelar_cita(db, cita_id)
+        _ofrecer_slot_liberado(background_tasks, sesiones, cita, anterior)
         return {"success": True, "mensaje": "Cita cancelada", "data": None}
     except HTTPException as e:
         return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
@@ -0,0 +1,39 @@
+"""
+Router API del panel principal
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services.dashboard_service import DashboardService
+from app.dependencies.auth import require_any_authenticated
+
+router = APIRouter(
+    prefix="/api/dashboard",
+    tags=["Dashboard"],
+    dependencies=[Depends(require_any_authenticated)]
+)
+
+@router.get("/resumen", response_model=dict)
+def resumen(db: Session = Depends(get_db)):
+    """
+    Cifras del panel principal: pacientes, doctores activos, citas de hoy, citas
+    pendientes y confirmadas, y las últimas citas registradas.
+
+    Los valores se calculan con COUNT en la base de datos y se reutilizan durante
+    unos segundos para todos los usuarios.
+    """
+    try:
+        return {
+            "success": True,
+            "mensaje": "Resumen obtenido",
+            "data": DashboardService.resumen(db)
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {
+            "success": False,
+            "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
+            "error_code": 500
+        }
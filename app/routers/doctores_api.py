@@ -1,13 +1,23 @@
 """
 Router API para gestión de Doctores
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 
 from app.database import get_db
 from app.schemas.doctor import DoctorCreate, DoctorUpdate, DoctorResponse, EspecialidadResponse
 from app.services.doctores_service import DoctorService
+from app.services.agenda_service import AgendaService
+from app.services.catalogos_service import CatalogosService, CACHE_CONTROL_CATALOGOS
+from app.repositories import doctores_repository
+from app.utils.paginacion import siguiente_cursor
+from app.utils.proyeccion import crear_proyeccion
+from app.cache import cacheado
+from app.utils.condicional import etag_entidad, no_modificado, respuesta_no_modificada, cabeceras_etag
+from app.models.doctor import Doctor
+from app.models.horario import DiaSemana
 from app.dependencies.auth import require_admin, require_any_authenticated
 
 router = APIRouter(
@@ -15,6 +25,37 @@ router = APIRouter(
     tags=["Doctores"]
 )
 
+def _doctor_listado(d: Doctor) -> dict:
+    return {
+        "id_doctor": d.id_doctor,
+        "nombre": d.nombre,
+        "apellido": d.apellido,
+        "documento": d.documento,
+        "correo": d.correo,
+        "telefono": d.telefono,
+        "licencia": d.licencia,
+        "especialidad": d.especialidad.nombre if d.especialidad else None,
+        "activo": d.activo
+    }
+
+def _doctor_detalle(doctor: Doctor) -> dict:
+    return {
+        "id_doctor": doctor.id_doctor,
+        "nombre": doctor.nombre,
+        "apellido": doctor.apellido,
+        "documento": doctor.documento,
+        "correo": doctor.correo,
+        "telefono": doctor.telefono,
+        "licencia": doctor.licencia,
+        "id_especialidad": doctor.id_especialidad,
+        "especialidad": {
+            "id_especialidad": doctor.especialidad.id_especialidad,
+            "nombre": doctor.especialidad.nombre,
+            "descripcion": doctor.especialidad.descripcion
+        } if doctor.especialidad else None,
+        "activo": doctor.activo
+    }
+
 @router.post("", response_model=dict, status_code=status.HTTP_200_OK)
 def registrar_doctor(
     doctor_data: DoctorCreate,
@@ -61,9 +102,13 @@ def registrar_doctor(
         }
 
 @router.get("", response_model=dict)
+@cacheado(["doctores"])
 def listar_doctores(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir, separadas por coma: especialidad"),
     db: Session = Depends(get_db)
 ):
     """
@@ -71,30 +116,58 @@ def listar_doctores(
     
     - **skip**: Número de registros a saltar (default: 0)
     - **limit**: Límite de registros a retornar (default: 100)
+    - **cursor**: Cursor de la página siguiente (campo next_cursor de la respuesta anterior).
+      Cada página se resuelve con una búsqueda por índice; se recomienda sobre skip para páginas profundas.
+    - **fields**: Columnas a retornar (p. ej. `id_doctor,nombre,apellido`); solo se leen esas columnas
+    - **expand**: Incluye la especialidad completa de cada doctor
     """
     try:
-        doctores = DoctorService.obtener_todos_doctores(db, skip, limit)
+        proyeccion = crear_proyeccion(Doctor, fields, expand, doctores_repository.RELACIONES)
+        doctores = DoctorService.obtener_todos_doctores(db, skip, limit, cursor, proyeccion)
         
-        doctores_data = [
-            {
-                "id_doctor": d.id_doctor,
-                "nombre": d.nombre,
-                "apellido": d.apellido,
-                "documento": d.documento,
-                "correo": d.correo,
-                "telefono": d.telefono,
-                "licencia": d.licencia,
-                "especialidad": d.especialidad.nombre if d.especialidad else None,
-                "activo": d.activo
-            }
-            for d in doctores
-        ]
+        doctores_data = [proyeccion.serializar(d, _doctor_listado) for d in doctores]
         
         return {
             "success": True,
             "mensaje": "Doctores obtenidos con éxito",
-            "data": doctores_data
+            "data": doctores_data,
+            "next_cursor": siguiente_cursor(doctores, doctores_repository.ORDEN_LISTADO, limit)
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception as e:
+        return {
+            "success": False,
+            "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
+            "error_code": 500
+        }
+
+@router.get("/directorio", response_model=dict)
+def obtener_directorio(
+    id_especialidad: Optional[int] = Query(None, description="Solo doctores de esta especialidad"),
+    dia_semana: Optional[DiaSemana] = Query(None, description="Solo doctores que atienden este día"),
+    db: Session = Depends(get_db)
+):
+    """
+    Endpoint del directorio de doctores activos con su especialidad y horarios activos.
+    
+    - **id_especialidad**: Filtra por especialidad (opcional)
+    - **dia_semana**: Filtra por día de atención; los horarios se limitan a ese día (opcional)
+    
+    Reemplaza consultar /api/horarios/doctor/{id} por cada doctor.
+    """
+    try:
+        directorio = DoctorService.obtener_directorio(
+            db, id_especialidad, dia_semana.value if dia_semana else None
+        )
+        
+        return {
+            "success": True,
+            "mensaje": "Directorio obtenido con éxito",
+            "data": directorio
         }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except Exception as e:
         return {
             "success": False,
@@ -105,32 +178,31 @@ def listar_doctores(
 @router.get("/{doctor_id}", response_model=dict)
 def obtener_doctor(
     doctor_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir, separadas por coma: especialidad"),
     db: Session = Depends(get_db)
 ):
     """
     Endpoint para obtener información de un doctor específico por ID.
     
     - **doctor_id**: ID del doctor
+    - **fields** / **expand**: Igual que en el listado de doctores
+
+    Soporta **If-None-Match**: si el doctor (o su especialidad) no cambió se responde 304 sin cuerpo.
     """
     try:
-        doctor = DoctorService.obtener_doctor_por_id(db, doctor_id)
+        proyeccion = crear_proyeccion(Doctor, fields, expand, doctores_repository.RELACIONES)
+        rutas = proyeccion.rutas_incluidas([doctores_repository.RELACIONES["especialidad"]])
+        etag = etag_entidad(db, Doctor, doctor_id, rutas, proyeccion.variante)
+        if etag and no_modificado(request, etag):
+            return respuesta_no_modificada(etag)
+        doctor = DoctorService.obtener_doctor_por_id(db, doctor_id, proyeccion)
+        if etag:
+            response.headers.update(cabeceras_etag(etag))
         
-        doctor_data = {
-            "id_doctor": doctor.id_doctor,
-            "nombre": doctor.nombre,
-            "apellido": doctor.apellido,
-            "documento": doctor.documento,
-            "correo": doctor.correo,
-            "telefono": doctor.telefono,
-            "licencia": doctor.licencia,
-            "id_especialidad": doctor.id_especialidad,
-            "especialidad": {
-                "id_especialidad": doctor.especialidad.id_especialidad,
-                "nombre": doctor.especialidad.nombre,
-                "descripcion": doctor.especialidad.descripcion
-            } if doctor.especialidad else None,
-            "activo": doctor.activo
-        }
+        doctor_data = proyeccion.serializar(doctor, _doctor_detalle)
         
         return {
             "success": True,
@@ -150,6 +222,42 @@ def obtener_doctor(
             "error_code": 500
         }
 
+@router.get("/{doctor_id}/agenda", response_model=dict)
+def obtener_agenda(
+    doctor_id: int,
+    fecha: Optional[date] = Query(None, description="Día de la agenda (default: hoy)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Endpoint para obtener la agenda diaria de un doctor.
+    
+    - **doctor_id**: ID del doctor
+    - **fecha**: Día a consultar en formato YYYY-MM-DD (default: hoy)
+    
+    Retorna los bloques de atención del día, las citas con el nombre del paciente
+    y los huecos libres.
+    """
+    try:
+        agenda = AgendaService.obtener_agenda(db, doctor_id, fecha or date.today())
+        
+        return {
+            "success": True,
+            "mensaje": "Agenda obtenida con éxito",
+            "data": agenda
+        }
+    except HTTPException as e:
+        return {
+            "success": False,
+            "mensaje": e.detail,
+            "error_code": e.status_code
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
+            "error_code": 500
+        }
+
 @router.put("/{doctor_id}", response_model=dict)
 def actualizar_doctor(
     doctor_id: int,
@@ -224,30 +332,28 @@ def eliminar_doctor(
 
 # Endpoint adicional para listar especialidades
 @router.get("/especialidades/listar", response_model=dict)
-def listar_especialidades(db: Session = Depends(get_db)):
+def listar_especialidades(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Endpoint para listar todas las especialidades médicas disponibles.
+
+    Se sirve desde la caché de catálogos con **version** y cabecera **ETag**; con
+    If-None-Match se responde 304 sin cuerpo si el catálogo no cambió.
     """
     try:
-        especialidades = DoctorService.obtener_especialidades(db)
-        
-        especialidades_data = [
-            {
-                "id_especialidad": e.id_especialidad,
-                "nombre": e.nombre,
-                "descripcion": e.descripcion
-            }
-            for e in especialidades
-        ]
-        
-        return {
-            "success": True,
-            "mensaje": "Especialidades obtenidas con éxito",
-            "data": especialidades_data
-        }
+        catalogo = CatalogosService.obtener(db, "especialidades")
     except Exception as e:
         return {
             "success": False,
             "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
             "error_code": 500
-        }
\ No newline at end of file
+        }
+
+    if no_modificado(request, catalogo["etag"]):
+        return respuesta_no_modificada(catalogo["etag"], CACHE_CONTROL_CATALOGOS)
+    response.headers.update(cabeceras_etag(catalogo["etag"], CACHE_CONTROL_CATALOGOS))
+    return {
+        "success": True,
+        "mensaje": "Especialidades obtenidas con éxito",
+        "data": catalogo["data"],
+        "version": catalogo["version"]
+    }
\ No newline at end of file
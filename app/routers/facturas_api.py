@@ -1,11 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from app.database import get_db
+from typing import Optional
+from app.database import get_db, get_session_factory
 from app.schemas.factura import FacturaCreate
 from app.services.facturas_service import FacturaService
+from app.repositories import facturas_repository
+from app.utils.paginacion import siguiente_cursor
+from app.utils.proyeccion import crear_proyeccion
+from app.cache import cacheado
+from app.utils.condicional import etag_entidad, no_modificado, respuesta_no_modificada, cabeceras_etag
+from app.utils.exportacion import respuesta_exportacion
+from app.dependencies.auth import require_admin
+from app.models.factura import Factura
 
 router = APIRouter(prefix="/api/facturas", tags=["Facturación"])
 
+def _factura_listado(f: Factura) -> dict:
+    return {
+        "id_factura": f.id_factura,
+        "id_cita": f.id_cita,
+        "id_metodo_pago": f.id_metodo_pago,
+        "monto": float(f.monto),
+        "estado": f.estado,
+        "fecha_emision": str(f.fecha_emision) if f.fecha_emision else None,
+        "observaciones": f.observaciones
+    }
+
 @router.post("", response_model=dict, status_code=status.HTTP_200_OK)
 def generar_factura(factura_data: FacturaCreate, db: Session = Depends(get_db)):
     try:
@@ -17,27 +37,66 @@ def generar_factura(factura_data: FacturaCreate, db: Session = Depends(get_db)):
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
 @router.get("", response_model=dict)
-def listar_facturas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@cacheado(["facturas", "citas", "pacientes", "doctores", "catalogos:metodos_pago"])
+def listar_facturas(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: cita, metodo_pago, paciente, doctor"),
+    db: Session = Depends(get_db)
+):
     try:
-        facturas = FacturaService.listar_facturas(db, skip, limit)
-        data = [{
-            "id_factura": f.id_factura,
-            "id_cita": f.id_cita,
-            "id_metodo_pago": f.id_metodo_pago,
-            "monto": float(f.monto),
-            "estado": f.estado,
-            "fecha_emision": str(f.fecha_emision) if f.fecha_emision else None,
-            "observaciones": f.observaciones
-        } for f in facturas]
-        return {"success": True, "mensaje": "Facturas obtenidas", "data": data}
+        proyeccion = crear_proyeccion(Factura, fields, expand, facturas_repository.RELACIONES)
+        facturas = FacturaService.listar_facturas(db, skip, limit, cursor, proyeccion)
+        data = [proyeccion.serializar(f, _factura_listado) for f in facturas]
+        return {
+            "success": True,
+            "mensaje": "Facturas obtenidas",
+            "data": data,
+            "next_cursor": siguiente_cursor(facturas, facturas_repository.ORDEN_LISTADO, limit)
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except Exception as e:
         return {"success": False, "mensaje": f"Error interno: {str(e)}", "error_code": 500}
 
+@router.get("/exportar")
+def exportar_facturas(
+    formato: str = Query("ndjson", description="ndjson o csv"),
+    sesiones=Depends(get_session_factory),
+    current_user: dict = Depends(require_admin)
+):
+    """Exporta todas las facturas como NDJSON o CSV en streaming (requiere rol admin)"""
+    try:
+        return respuesta_exportacion(
+            sesiones, "facturas", formato, facturas_repository.COLUMNAS_EXPORTACION,
+            facturas_repository.iterar_exportacion
+        )
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
 @router.get("/{factura_id}", response_model=dict)
-def obtener_factura(factura_id: int, db: Session = Depends(get_db)):
+def obtener_factura(
+    factura_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: cita, metodo_pago, paciente, doctor"),
+    db: Session = Depends(get_db)
+):
+    """Soporta **If-None-Match**: si la factura (y lo expandido) no cambió se responde 304 sin cuerpo."""
     try:
-        factura = FacturaService.obtener_factura(db, factura_id)
-        return {"success": True, "mensaje": "Factura encontrada", "data": factura.to_dict()}
+        proyeccion = crear_proyeccion(Factura, fields, expand, facturas_repository.RELACIONES)
+        etag = etag_entidad(db, Factura, factura_id, proyeccion.rutas_incluidas(), proyeccion.variante)
+        if etag and no_modificado(request, etag):
+            return respuesta_no_modificada(etag)
+        factura = FacturaService.obtener_factura(db, factura_id, proyeccion)
+        if etag:
+            response.headers.update(cabeceras_etag(etag))
+        return {"success": True, "mensaje": "Factura encontrada", "data": proyeccion.serializar(factura)}
     except HTTPException as e:
         return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except:
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.historia import HistoriaCreate
 from app.services.historias_service import HistoriaService
+from app.cache import cacheado
 from app.dependencies.auth import require_doctor
 
 router = APIRouter(prefix="/api/historias", tags=["Historias Clínicas"])
@@ -23,6 +24,7 @@ def crear_historia(
         return {"success": False, "mensaje": "Error interno", "error_code": 500}
 
 @router.get("/{paciente_id}", response_model=dict)
+@cacheado(lambda paciente_id, **_: [f"historias:paciente:{paciente_id}", f"paciente:{paciente_id}", "doctores"])
 def obtener_historias(paciente_id: int, db: Session = Depends(get_db)):
     try:
         historias = HistoriaService.obtener_historias_paciente(db, paciente_id)
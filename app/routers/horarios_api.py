@@ -4,8 +4,9 @@ Router API para gestión de Horarios
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.horario import HorarioCreate, HorarioUpdate, HorarioResponse
+from app.schemas.horario import HorarioCreate, HorarioUpdate, HorarioResponse, PlantillaHorario, PlantillaHorarioLote
 from app.services.horarios_service import HorarioService
+from app.cache import cacheado
 from app.dependencies.auth import require_admin
 
 router = APIRouter(prefix="/api/horarios", tags=["Horarios"])
@@ -36,6 +37,7 @@ def registrar_horario(
         return {"success": False, "mensaje": "Error interno en el servidor", "error_code": 500}
 
 @router.get("/doctor/{doctor_id}", response_model=dict)
+@cacheado(lambda doctor_id, **_: [f"horarios:doctor:{doctor_id}", f"doctor:{doctor_id}"])
 def obtener_horarios_doctor(doctor_id: int, db: Session = Depends(get_db)):
     """Obtiene horarios de un doctor"""
     try:
@@ -51,4 +53,39 @@ def obtener_horarios_doctor(doctor_id: int, db: Session = Depends(get_db)):
     except HTTPException as e:
         return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except Exception:
-        return {"success": False, "mensaje": "Error interno", "error_code": 500}
\ No newline at end of file
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.put("/doctor/{doctor_id}/plantilla", response_model=dict)
+def reemplazar_plantilla(
+    doctor_id: int,
+    plantilla: PlantillaHorario,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin)
+):
+    """Reemplaza la plantilla semanal completa de un doctor (requiere admin)"""
+    try:
+        resumen = HorarioService.reemplazar_plantilla(db, doctor_id, plantilla)
+        return {"success": True, "mensaje": "Plantilla de horarios aplicada", "data": resumen}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno en el servidor", "error_code": 500}
+
+@router.post("/plantilla/lote", response_model=dict)
+def aplicar_plantilla_lote(
+    plantilla: PlantillaHorarioLote,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin)
+):
+    """Aplica una plantilla semanal a varios doctores o a una especialidad completa (requiere admin)"""
+    try:
+        resumen = HorarioService.aplicar_plantilla_lote(db, plantilla)
+        return {
+            "success": True,
+            "mensaje": f"Plantilla aplicada a {len(resumen)} doctores",
+            "data": [{"id_doctor": doctor_id, **cambios} for doctor_id, cambios in resumen.items()]
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno en el servidor", "error_code": 500}
\ No newline at end of file
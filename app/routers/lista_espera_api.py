@@ -0,0 +1,107 @@
+"""
+Router API para la Lista de Espera
+"""
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db, get_session_factory
+from app.schemas.lista_espera import ListaEsperaCreate
+from app.services.lista_espera_service import ListaEsperaService
+from app.repositories import lista_espera_repository
+
+router = APIRouter(prefix="/api/lista-espera", tags=["Lista de Espera"])
+
+@router.post("", response_model=dict, status_code=status.HTTP_200_OK)
+def inscribir(data: ListaEsperaCreate, db: Session = Depends(get_db)):
+    """
+    Inscribe a un paciente en la lista de espera de un doctor o de una especialidad.
+    
+    Cuando se cancela una cita que encaja en su ventana de fechas y horas, el slot se
+    le ofrece (o se agenda directamente si **agendar_automatico** es true).
+    """
+    try:
+        entrada = ListaEsperaService.inscribir(db, data)
+        return {"success": True, "mensaje": "Paciente inscrito en lista de espera", "data": entrada.to_dict()}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.get("", response_model=dict)
+def listar(
+    id_paciente: Optional[int] = None,
+    id_doctor: Optional[int] = None,
+    estado: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Lista las solicitudes de la lista de espera, filtrando por paciente, doctor o estado"""
+    try:
+        entradas = lista_espera_repository.get_all(db, id_paciente, id_doctor, estado, skip, limit)
+        return {"success": True, "mensaje": "Lista de espera obtenida", "data": [e.to_dict() for e in entradas]}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.get("/{entrada_id}", response_model=dict)
+def obtener(entrada_id: int, db: Session = Depends(get_db)):
+    """Obtiene una solicitud de la lista de espera"""
+    try:
+        entrada = ListaEsperaService.obtener(db, entrada_id)
+        return {"success": True, "mensaje": "Solicitud encontrada", "data": entrada.to_dict()}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.post("/{entrada_id}/aceptar", response_model=dict)
+def aceptar_oferta(
+    entrada_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
+    """
+    Acepta el slot ofrecido a una solicitud y agenda la cita.
+
+    Si la oferta ya venció se responde 409 y el slot se ofrece a la siguiente solicitud.
+    """
+    try:
+        entrada = ListaEsperaService.aceptar_oferta(db, entrada_id)
+        return {"success": True, "mensaje": "Cita agendada desde lista de espera", "data": entrada.to_dict()}
+    except HTTPException as e:
+        background_tasks.add_task(ListaEsperaService.vencer_ofertas, sesiones)
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.post("/{entrada_id}/rechazar", response_model=dict)
+def rechazar_oferta(
+    entrada_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sesiones=Depends(get_session_factory)
+):
+    """
+    Rechaza el slot ofrecido a una solicitud. La solicitud sigue en la lista de espera
+    (sin volver a recibir ese slot) y el slot se ofrece a la siguiente.
+    """
+    try:
+        entrada = ListaEsperaService.rechazar_oferta(db, entrada_id)
+        background_tasks.add_task(ListaEsperaService.vencer_ofertas, sesiones)
+        return {"success": True, "mensaje": "Oferta rechazada", "data": entrada.to_dict()}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+@router.delete("/{entrada_id}", response_model=dict)
+def cancelar(entrada_id: int, db: Session = Depends(get_db)):
+    """Retira una solicitud de la lista de espera"""
+    try:
+        ListaEsperaService.cancelar(db, entrada_id)
+        return {"success": True, "mensaje": "Solicitud retirada de la lista de espera", "data": None}
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
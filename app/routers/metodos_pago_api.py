@@ -1,16 +1,33 @@
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.services.facturas_service import FacturaService
+from app.services.catalogos_service import CatalogosService, CACHE_CONTROL_CATALOGOS
+from app.utils.condicional import no_modificado, respuesta_no_modificada, cabeceras_etag
 
 router = APIRouter(prefix="/api/metodos-pago", tags=["Métodos de Pago"])
 
 @router.get("", response_model=dict)
-def listar_metodos_pago(db: Session = Depends(get_db)):
+def listar_metodos_pago(request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Lista los métodos de pago activos desde la caché de catálogos.
+
+    Incluye **version** y la cabecera **ETag**; con If-None-Match se responde 304 sin cuerpo
+    si el catálogo no cambió.
+    """
     try:
-        metodos = FacturaService.listar_metodos_pago(db)
-        data = [{"id_metodo_pago": m.id_metodo_pago, "nombre": m.nombre} for m in metodos]
-        return {"success": True, "mensaje": "Métodos de pago disponibles", "data": data}
+        catalogo = CatalogosService.obtener(db, "metodos_pago")
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
     except:
-        return {"success": False, "mensaje": "Error interno", "error_code": 500}
\ No newline at end of file
+        return {"success": False, "mensaje": "Error interno", "error_code": 500}
+
+    if no_modificado(request, catalogo["etag"]):
+        return respuesta_no_modificada(catalogo["etag"], CACHE_CONTROL_CATALOGOS)
+    response.headers.update(cabeceras_etag(catalogo["etag"], CACHE_CONTROL_CATALOGOS))
+    return {
+        "success": True,
+        "mensaje": "Métodos de pago disponibles",
+        "data": catalogo["data"],
+        "version": catalogo["version"]
+    }
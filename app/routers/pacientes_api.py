@@ -1,19 +1,40 @@
 """
 Router API para gestión de Pacientes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, get_session_factory
 from app.schemas.paciente import PacienteCreate, PacienteUpdate, PacienteResponse, PacienteListResponse
 from app.services.pacientes_service import PacienteService
+from app.repositories import pacientes_repository
+from app.utils.paginacion import siguiente_cursor
+from app.utils.proyeccion import crear_proyeccion
+from app.utils.condicional import etag_entidad, no_modificado, respuesta_no_modificada, cabeceras_etag
+from app.utils.exportacion import respuesta_exportacion
+from app.dependencies.auth import require_admin
+from app.models.paciente import Paciente
+from app.cache import cacheado
 
 router = APIRouter(
     prefix="/api/pacientes",
     tags=["Pacientes"]
 )
 
+def _paciente_listado(p: Paciente) -> dict:
+    return {
+        "id_paciente": p.id_paciente,
+        "nombre": p.nombre,
+        "apellido": p.apellido,
+        "documento": p.documento,
+        "correo": p.correo,
+        "telefono": p.telefono,
+        "fecha_nacimiento": str(p.fecha_nacimiento) if p.fecha_nacimiento else None,
+        "direccion": p.direccion,
+        "created_at": str(p.created_at) if hasattr(p, 'created_at') else None
+    }
+
 @router.post("/registrar", response_model=dict, status_code=status.HTTP_200_OK)
 def registrar_paciente(
     paciente_data: PacienteCreate,
@@ -59,9 +80,12 @@ def registrar_paciente(
         }
 
 @router.get("", response_model=dict)
+@cacheado(["pacientes"])
 def listar_pacientes(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
     db: Session = Depends(get_db)
 ):
     """
@@ -69,29 +93,87 @@ def listar_pacientes(
     
     - **skip**: Número de registros a saltar (default: 0)
     - **limit**: Límite de registros a retornar (default: 100)
+    - **cursor**: Cursor de la página siguiente (campo next_cursor de la respuesta anterior).
+      Cada página se resuelve con una búsqueda por índice; se recomienda sobre skip para páginas profundas.
+    - **fields**: Columnas a retornar (p. ej. `id_paciente,nombre,apellido`); solo se leen esas columnas
     """
     try:
-        pacientes = PacienteService.obtener_todos_pacientes(db, skip, limit)
+        proyeccion = crear_proyeccion(Paciente, fields)
+        pacientes = PacienteService.obtener_todos_pacientes(db, skip, limit, cursor, proyeccion)
         
-        pacientes_data = [
-            {
-                "id_paciente": p.id_paciente,
-                "nombre": p.nombre,
-                "apellido": p.apellido,
-                "documento": p.documento,
-                "correo": p.correo,
-                "telefono": p.telefono,
-                "fecha_nacimiento": str(p.fecha_nacimiento) if p.fecha_nacimiento else None,
-                "direccion": p.direccion,
-                "created_at": str(p.created_at) if hasattr(p, 'created_at') else None
-            }
-            for p in pacientes
-        ]
+        pacientes_data = [proyeccion.serializar(p, _paciente_listado) for p in pacientes]
+        
+        return {
+            "success": True,
+            "mensaje": "Pacientes obtenidos con éxito",
+            "data": pacientes_data,
+            "next_cursor": siguiente_cursor(pacientes, pacientes_repository.ORDEN_LISTADO, limit)
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception as e:
+        return {
+            "success": False,
+            "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
+            "error_code": 500
+        }
+
+@router.get("/buscar", response_model=dict)
+def buscar_pacientes(
+    q: str = Query(..., min_length=2, description="Nombre, apellido, documento o correo (o su comienzo)"),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Endpoint de búsqueda de pacientes mientras se escribe.
+    
+    - **q**: Texto a buscar; cada palabra debe ser el comienzo del nombre, apellido,
+      documento o correo del paciente. No distingue mayúsculas ni tildes.
+    - **limit**: Máximo de resultados (default: 20)
+    
+    Los resultados se ordenan por relevancia: primero los que coinciden con palabras
+    completas y los que coinciden por nombre o apellido.
+    """
+    try:
+        pacientes = PacienteService.buscar_pacientes(db, q, limit)
         
         return {
             "success": True,
             "mensaje": "Pacientes obtenidos con éxito",
-            "data": pacientes_data
+            "data": [_paciente_listado(p) for p in pacientes]
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception as e:
+        return {
+            "success": False,
+            "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
+            "error_code": 500
+        }
+
+@router.get("/exportar")
+def exportar_pacientes(
+    formato: str = Query("ndjson", description="ndjson o csv"),
+    sesiones=Depends(get_session_factory),
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Endpoint para exportar todos los pacientes (requiere rol admin).
+    
+    - **formato**: `ndjson` (un objeto JSON por línea) o `csv`
+    
+    Las filas se envían a medida que se leen de la base de datos, sin cargar la tabla en memoria.
+    """
+    try:
+        return respuesta_exportacion(
+            sesiones, "pacientes", formato, pacientes_repository.COLUMNAS_EXPORTACION,
+            pacientes_repository.iterar_exportacion
+        )
+    except HTTPException as e:
+        return {
+            "success": False,
+            "mensaje": e.detail,
+            "error_code": e.status_code
         }
     except Exception as e:
         return {
@@ -103,20 +185,32 @@ def listar_pacientes(
 @router.get("/{paciente_id}", response_model=dict)
 def obtener_paciente(
     paciente_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por coma"),
     db: Session = Depends(get_db)
 ):
     """
     Endpoint para obtener información de un paciente específico por ID.
     
     - **paciente_id**: ID del paciente
+    - **fields**: Columnas a retornar; solo se leen esas columnas
+
+    Soporta **If-None-Match**: si el paciente no cambió se responde 304 sin cuerpo.
     """
     try:
-        paciente = PacienteService.obtener_paciente_por_id(db, paciente_id)
+        proyeccion = crear_proyeccion(Paciente, fields)
+        etag = etag_entidad(db, Paciente, paciente_id, proyeccion.rutas_incluidas(), proyeccion.variante)
+        if etag and no_modificado(request, etag):
+            return respuesta_no_modificada(etag)
+        paciente = PacienteService.obtener_paciente_por_id(db, paciente_id, proyeccion)
+        if etag:
+            response.headers.update(cabeceras_etag(etag))
         
         return {
             "success": True,
             "mensaje": "Paciente encontrado",
-            "data": paciente.to_dict()
+            "data": proyeccion.serializar(paciente)
         }
     except HTTPException as e:
         return {
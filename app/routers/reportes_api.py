@@ -0,0 +1,152 @@
+"""
+Router API de reportes y estadísticas agregadas
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date, timedelta
+
+from app.database import get_db
+from app.services.reportes_service import ReportesService
+from app.dependencies.auth import require_admin
+
+router = APIRouter(
+    prefix="/api/reportes",
+    tags=["Reportes"],
+    dependencies=[Depends(require_admin)]
+)
+
+# Días que abarca un reporte cuando no se indica fecha_desde
+DIAS_POR_DEFECTO = 30
+
+def _reporte(mensaje: str, calcular, db: Session, fecha_desde: Optional[date], fecha_hasta: Optional[date], *args):
+    """Resuelve el rango por defecto (últimos 30 días) y envuelve el resultado en la respuesta estándar"""
+    try:
+        fecha_hasta = fecha_hasta or date.today()
+        fecha_desde = fecha_desde or fecha_hasta - timedelta(days=DIAS_POR_DEFECTO - 1)
+        return {
+            "success": True,
+            "mensaje": mensaje,
+            "data": calcular(db, fecha_desde, fecha_hasta, *args),
+            "rango": {"fecha_desde": str(fecha_desde), "fecha_hasta": str(fecha_hasta)}
+        }
+    except HTTPException as e:
+        return {"success": False, "mensaje": e.detail, "error_code": e.status_code}
+    except Exception:
+        return {
+            "success": False,
+            "mensaje": "Error interno en el servidor. Intente nuevamente más tarde.",
+            "error_code": 500
+        }
+
+@router.get("/resumen", response_model=dict)
+def resumen(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Cifras principales del periodo: total de citas, completadas, ingresos pagados y doctores activos.
+
+    - **fecha_desde** / **fecha_hasta**: Rango de fechas (default: últimos 30 días)
+    """
+    return _reporte("Resumen obtenido", ReportesService.resumen, db, fecha_desde, fecha_hasta)
+
+@router.get("/citas-por-estado", response_model=dict)
+def citas_por_estado(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Total de citas del rango por estado"""
+    return _reporte("Citas por estado obtenidas", ReportesService.citas_por_estado, db, fecha_desde, fecha_hasta)
+
+@router.get("/citas-por-especialidad", response_model=dict)
+def citas_por_especialidad(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Total de citas del rango por especialidad, de mayor a menor"""
+    return _reporte(
+        "Citas por especialidad obtenidas", ReportesService.citas_por_especialidad, db, fecha_desde, fecha_hasta
+    )
+
+@router.get("/tendencia", response_model=dict)
+def tendencia(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Total de citas por día del rango, incluidos los días sin citas"""
+    return _reporte("Tendencia obtenida", ReportesService.tendencia, db, fecha_desde, fecha_hasta)
+
+@router.get("/top-doctores", response_model=dict)
+def top_doctores(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    limite: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Doctores con más citas en el rango"""
+    return _reporte("Doctores más solicitados obtenidos", ReportesService.top_doctores, db, fecha_desde, fecha_hasta, limite)
+
+@router.get("/ingresos", response_model=dict)
+def ingresos(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Cantidad y monto de las facturas emitidas en el rango, por estado"""
+    return _reporte("Ingresos obtenidos", ReportesService.ingresos, db, fecha_desde, fecha_hasta)
+
+@router.get("/ocupacion", response_model=dict)
+def ocupacion(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Ocupación de cada doctor activo (minutos reservados / minutos de su horario)
+    por semana y en el total del rango. La ocupación es null si no tiene horario.
+    """
+    return _reporte("Ocupación obtenida", ReportesService.ocupacion, db, fecha_desde, fecha_hasta)
+
+@router.get("/tasas-cancelacion", response_model=dict)
+def tasas_cancelacion(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    por: str = Query("doctor", description="doctor, especialidad, dia_semana o anticipacion"),
+    db: Session = Depends(get_db)
+):
+    """
+    Tasas de cancelación e inasistencia de las citas del rango.
+
+    - **por**: Agrupa por doctor, especialidad, día de la semana de la cita o
+      anticipación (días entre el registro de la cita y su fecha)
+
+    La inasistencia cuenta las citas pasadas que siguen pendientes o confirmadas,
+    sobre las citas pasadas no canceladas.
+    """
+    return _reporte("Tasas obtenidas", ReportesService.tasas_cancelacion, db, fecha_desde, fecha_hasta, por)
+
+@router.get("/ingresos-por-periodo", response_model=dict)
+def ingresos_por_periodo(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    periodo: str = Query("mes", description="dia, semana o mes"),
+    agrupar: Optional[str] = Query(None, description="metodo_pago o especialidad"),
+    db: Session = Depends(get_db)
+):
+    """
+    Ingresos por periodo de emisión de la factura, con cantidad y monto por estado
+    (pagada, pendiente, anulada) y el total facturado (pagadas + pendientes).
+
+    - **periodo**: Tamaño de cada periodo; el rango se amplía a periodos completos
+    - **agrupar**: Separa cada periodo por método de pago o por especialidad del doctor
+
+    Los montos se envían como texto decimal exacto (p. ej. "150000.00").
+    """
+    return _reporte(
+        "Ingresos obtenidos", ReportesService.ingresos_por_periodo, db, fecha_desde, fecha_hasta, periodo, agrupar
+    )
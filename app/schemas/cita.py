@@ -2,8 +2,11 @@
 Schemas Pydantic para Cita Médica
 """
 from pydantic import BaseModel, Field, validator
-from typing import Optional
-from datetime import date, time, datetime
+from typing import Optional, List
+from datetime import date, time, datetime, timedelta
+
+# Máximo de citas que se pueden registrar en un solo lote
+MAX_CITAS_LOTE = 100
 
 class CitaBase(BaseModel):
     """Schema base para cita médica"""
@@ -41,6 +44,76 @@ class CitaCreate(CitaBase):
             }
         }
 
+class OcurrenciaCita(BaseModel):
+    """Fecha y hora de una cita dentro de un lote"""
+    fecha: date
+    hora: time
+
+    @validator('fecha')
+    def validar_fecha(cls, v):
+        """Valida que la fecha no sea del pasado"""
+        if v < date.today():
+            raise ValueError('La fecha de la cita no puede ser del pasado')
+        return v
+
+class RecurrenciaCita(BaseModel):
+    """Regla de recurrencia: misma hora cada intervalo_dias, repetida N veces"""
+    fecha_inicio: date
+    hora: time
+    intervalo_dias: int = Field(7, ge=1, le=365)
+    repeticiones: int = Field(..., ge=1, le=MAX_CITAS_LOTE)
+
+    @validator('fecha_inicio')
+    def validar_fecha_inicio(cls, v):
+        """Valida que la fecha no sea del pasado"""
+        if v < date.today():
+            raise ValueError('La fecha de inicio no puede ser del pasado')
+        return v
+
+    def expandir(self) -> List[OcurrenciaCita]:
+        """Genera las ocurrencias de la serie"""
+        return [
+            OcurrenciaCita(fecha=self.fecha_inicio + timedelta(days=i * self.intervalo_dias), hora=self.hora)
+            for i in range(self.repeticiones)
+        ]
+
+class CitaLoteCreate(BaseModel):
+    """Schema para creación de un lote de citas (lista explícita o recurrencia)"""
+    id_paciente: int = Field(..., gt=0)
+    id_doctor: int = Field(..., gt=0)
+    motivo: str = Field(..., min_length=5, max_length=255)
+    observaciones: Optional[str] = None
+    ocurrencias: Optional[List[OcurrenciaCita]] = Field(None, min_length=1, max_length=MAX_CITAS_LOTE)
+    recurrencia: Optional[RecurrenciaCita] = None
+    todo_o_nada: bool = Field(False, description="Si hay algún conflicto no se registra ninguna cita")
+
+    @validator('recurrencia', always=True)
+    def validar_origen(cls, v, values):
+        """Valida que se indique exactamente una de ocurrencias o recurrencia"""
+        if (v is None) == (values.get('ocurrencias') is None):
+            raise ValueError('Debe indicar ocurrencias o recurrencia, pero no ambas')
+        return v
+
+    def expandir(self) -> List[OcurrenciaCita]:
+        """Obtiene la lista de ocurrencias del lote"""
+        return self.recurrencia.expandir() if self.recurrencia else self.ocurrencias
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id_paciente": 1,
+                "id_doctor": 1,
+                "motivo": "Sesión de fisioterapia",
+                "recurrencia": {
+                    "fecha_inicio": "2025-12-02",
+                    "hora": "09:00:00",
+                    "intervalo_dias": 7,
+                    "repeticiones": 12
+                },
+                "todo_o_nada": False
+            }
+        }
+
 class CitaUpdate(BaseModel):
     """Schema para actualización de cita"""
     fecha: Optional[date] = None
@@ -2,7 +2,7 @@
 Schemas Pydantic para Horario
 """
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Optional, List
 from datetime import time, datetime
 
 class HorarioBase(BaseModel):
@@ -45,4 +45,44 @@ class HorarioResponse(HorarioBase):
     created_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BloqueHorario(BaseModel):
+    """Bloque de atención dentro de una plantilla semanal"""
+    dia_semana: str = Field(..., pattern="^(Lunes|Martes|Miércoles|Jueves|Viernes|Sábado|Domingo)$")
+    hora_inicio: time
+    hora_fin: time
+
+    @validator('hora_fin')
+    def validar_hora_fin(cls, v, values):
+        """Valida que hora_fin sea mayor que hora_inicio"""
+        if 'hora_inicio' in values and v <= values['hora_inicio']:
+            raise ValueError('La hora de fin debe ser mayor que la hora de inicio')
+        return v
+
+class PlantillaHorario(BaseModel):
+    """Plantilla semanal completa: reemplaza todos los horarios activos del doctor"""
+    bloques: List[BloqueHorario] = Field(..., max_length=100)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "bloques": [
+                    {"dia_semana": "Lunes", "hora_inicio": "08:00:00", "hora_fin": "12:00:00"},
+                    {"dia_semana": "Lunes", "hora_inicio": "14:00:00", "hora_fin": "18:00:00"},
+                    {"dia_semana": "Miércoles", "hora_inicio": "08:00:00", "hora_fin": "12:00:00"}
+                ]
+            }
+        }
+
+class PlantillaHorarioLote(PlantillaHorario):
+    """Plantilla semanal aplicada a varios doctores o a toda una especialidad"""
+    doctor_ids: Optional[List[int]] = Field(None, min_length=1, max_length=500)
+    id_especialidad: Optional[int] = Field(None, gt=0)
+
+    @validator('id_especialidad', always=True)
+    def validar_destino(cls, v, values):
+        """Valida que se indique exactamente uno de doctor_ids o id_especialidad"""
+        if (v is None) == (values.get('doctor_ids') is None):
+            raise ValueError('Debe indicar doctor_ids o id_especialidad, pero no ambos')
+        return v
@@ -0,0 +1,55 @@
+"""
+Schemas Pydantic para Lista de Espera
+"""
+from pydantic import BaseModel, Field, validator
+from typing import Optional
+from datetime import date, time
+
+class ListaEsperaCreate(BaseModel):
+    """Schema para inscribir a un paciente en la lista de espera"""
+    id_paciente: int = Field(..., gt=0)
+    id_doctor: Optional[int] = Field(None, gt=0)
+    id_especialidad: Optional[int] = Field(None, gt=0)
+    fecha_desde: date
+    fecha_hasta: date
+    hora_desde: Optional[time] = None
+    hora_hasta: Optional[time] = None
+    motivo: str = Field(..., min_length=5, max_length=255)
+    agendar_automatico: bool = Field(False, description="Agendar la cita sin esperar confirmación del paciente")
+
+    @validator('id_especialidad', always=True)
+    def validar_destino(cls, v, values):
+        """Valida que se indique un doctor o una especialidad"""
+        if v is None and values.get('id_doctor') is None:
+            raise ValueError('Debe indicar id_doctor o id_especialidad')
+        return v
+
+    @validator('fecha_hasta')
+    def validar_fecha_hasta(cls, v, values):
+        """Valida que la ventana de fechas sea válida y no esté en el pasado"""
+        if v < date.today():
+            raise ValueError('La fecha final no puede ser del pasado')
+        if 'fecha_desde' in values and v < values['fecha_desde']:
+            raise ValueError('La fecha final no puede ser anterior a la fecha inicial')
+        return v
+
+    @validator('hora_hasta')
+    def validar_hora_hasta(cls, v, values):
+        """Valida que hora_hasta sea mayor que hora_desde"""
+        if v and values.get('hora_desde') and v <= values['hora_desde']:
+            raise ValueError('La hora final debe ser mayor que la hora inicial')
+        return v
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id_paciente": 1,
+                "id_especialidad": 2,
+                "fecha_desde": "2025-12-01",
+                "fecha_hasta": "2025-12-15",
+                "hora_desde": "08:00:00",
+                "hora_hasta": "12:00:00",
+                "motivo": "Control cardiológico",
+                "agendar_automatico": True
+            }
+        }
@@ -0,0 +1,79 @@
+"""
+Servicio de agenda diaria de los doctores
+"""
+from sqlalchemy.orm import Session
+from app.repositories import citas_repository, doctores_repository
+from app.repositories.indice_horarios import indice_horarios
+from app.services.disponibilidad_service import DIAS_SEMANA, DURACION_SLOT_DEFECTO, calcular_huecos
+from app.cache import cache
+from datetime import date
+from fastapi import HTTPException
+
+# Segundos que una agenda permanece en caché. Las escrituras de citas y horarios la
+# invalidan antes; el límite acota cambios que no la invalidan (p. ej. el nombre de un paciente).
+AGENDA_TTL = 300
+
+class AgendaService:
+    """Servicio para la agenda diaria de un doctor"""
+
+    @staticmethod
+    def obtener_agenda(db: Session, doctor_id: int, fecha: date) -> dict:
+        """
+        Obtiene la agenda de un doctor para un día: bloques de atención, citas con el
+        nombre del paciente y huecos libres.
+
+        La agenda se guarda en caché por (doctor, día) y solo se invalida cuando cambia
+        una cita de ese doctor en ese día o alguno de sus horarios.
+
+        Raises:
+            HTTPException: Si el doctor no existe
+        """
+        clave = f"agenda:{doctor_id}:{fecha}"
+        agenda = cache.obtener(clave)
+        if agenda is not None:
+            return agenda
+
+        # Si una cita cambia mientras se arma la agenda, no se guarda la versión leída
+        marca = cache.marca()
+        if not doctores_repository.get_by_id(db, doctor_id):
+            raise HTTPException(status_code=404, detail="Doctor no encontrado")
+
+        dia_semana = DIAS_SEMANA[fecha.weekday()]
+        bloques = indice_horarios.bloques(db, doctor_id).get(dia_semana, [])
+        minutos = indice_horarios.bloques_en_minutos(db, [doctor_id])[doctor_id].get(dia_semana, [])
+        citas = citas_repository.get_agenda_doctor(db, doctor_id, fecha)
+        ocupadas = [c.hora.hour * 60 + c.hora.minute for c in citas if c.estado != 'cancelada']
+
+        agenda = {
+            "id_doctor": doctor_id,
+            "fecha": str(fecha),
+            "dia_semana": dia_semana,
+            "bloques": [
+                {"hora_inicio": str(inicio), "hora_fin": str(fin)}
+                for inicio, fin, _ in bloques
+            ],
+            "citas": [
+                {
+                    "id_cita": c.id_cita,
+                    "hora": str(c.hora),
+                    "estado": c.estado,
+                    "motivo": c.motivo,
+                    "id_paciente": c.id_paciente,
+                    "paciente": f"{c.nombre} {c.apellido}"
+                }
+                for c in citas
+            ],
+            "huecos": [
+                {"hora_inicio": str(inicio), "hora_fin": str(fin)}
+                for inicio, fin in calcular_huecos(minutos, sorted(ocupadas), DURACION_SLOT_DEFECTO)
+            ]
+        }
+
+        cache.guardar(
+            clave,
+            agenda,
+            etiquetas=(f"citas:doctor:{doctor_id}:{fecha}", f"horarios:doctor:{doctor_id}"),
+            ttl=AGENDA_TTL,
+            marca=marca
+        )
+        return agenda
@@ -7,6 +7,9 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.models.usuario import Usuario
+from app.cache import cache
 
 load_dotenv()
 
@@ -15,6 +18,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "clave_secreta_por_defecto_cambiar_en_produ
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
 
+# Segundos que se guarda el id_referencia de los tokens que no lo incluyen. No hay
+# invalidación: la aplicación no cambia el vínculo de un usuario después de crearlo, así
+# que un cambio hecho directamente en la base de datos se ve como mucho tras este plazo.
+ID_REFERENCIA_TTL = 600
+
 # Configuración de hashing de contraseñas con bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -82,7 +90,7 @@ def decode_access_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-def generate_user_token(id_usuario: int, correo: str, rol: str) -> str:
+def generate_user_token(id_usuario: int, correo: str, rol: str, id_referencia: Optional[int] = None) -> str:
     """
     Genera un token JWT para un usuario autenticado.
     
@@ -90,6 +98,7 @@ def generate_user_token(id_usuario: int, correo: str, rol: str) -> str:
         id_usuario: ID del usuario
         correo: Correo del usuario
         rol: Rol del usuario (admin, doctor, paciente)
+        id_referencia: ID del doctor o paciente asociado al usuario
         
     Returns:
         Token JWT
@@ -98,6 +107,35 @@ def generate_user_token(id_usuario: int, correo: str, rol: str) -> str:
         "sub": str(id_usuario),
         "correo": correo,
         "rol": rol,
-        "id_usuario": id_usuario
+        "id_usuario": id_usuario,
+        "id_referencia": id_referencia
     }
-    return create_access_token(token_data)
\ No newline at end of file
+    return create_access_token(token_data)
+
+def obtener_id_referencia(db: Session, current_user: dict) -> Optional[int]:
+    """
+    Obtiene el ID del doctor o paciente asociado al usuario del token.
+    
+    Los tokens emitidos antes de incluir id_referencia se resuelven con una
+    consulta a Usuario que queda en caché ID_REFERENCIA_TTL segundos, así que no
+    se repite en cada petición.
+    
+    Args:
+        db: Sesión de base de datos
+        current_user: Datos decodificados del token
+        
+    Returns:
+        ID de referencia o None si el usuario no tiene uno
+    """
+    if current_user.get("id_referencia") is not None:
+        return current_user["id_referencia"]
+    
+    id_usuario = current_user.get("id_usuario")
+    clave = f"usuario:{id_usuario}:id_referencia"
+    encontrado = cache.obtener(clave)
+    if encontrado is None:
+        fila = db.query(Usuario.id_referencia).filter(Usuario.id_usuario == id_usuario).first()
+        # Se guarda como tupla para distinguir "sin referencia" de "no está en caché"
+        encontrado = (fila.id_referencia if fila else None,)
+        cache.guardar(clave, encontrado, ttl=ID_REFERENCIA_TTL)
+    return encontrado[0]
\ No newline at end of file
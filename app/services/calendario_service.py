@@ -0,0 +1,133 @@
+"""
+Servicio de feeds iCalendar (ICS) de citas para doctores y pacientes
+"""
+from sqlalchemy.orm import Session
+from app.repositories import citas_repository, doctores_repository, pacientes_repository
+from app.services.disponibilidad_service import DURACION_SLOT_DEFECTO
+from app.utils.condicional import calcular_etag
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+from fastapi import HTTPException
+
+FORMATO_FECHA_ICS = "%Y%m%dT%H%M%S"
+
+# STATUS del VEVENT según el estado de la cita
+ESTADOS_ICS = {
+    "pendiente": "TENTATIVE",
+    "confirmada": "CONFIRMED",
+    "completada": "CONFIRMED",
+    "cancelada": "CANCELLED"
+}
+
+def _escapar(texto: Optional[str]) -> str:
+    """Escapa un texto según RFC 5545 (barras, comas, punto y coma y saltos de línea)"""
+    if not texto:
+        return ""
+    return (
+        texto.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+def _linea(contenido: str) -> str:
+    """Termina una línea ICS y la pliega a 75 octetos como exige RFC 5545"""
+    datos = contenido.encode("utf-8")
+    if len(datos) <= 75:
+        return contenido + "\r\n"
+    partes = []
+    while len(datos) > 75:
+        corte = 75 if not partes else 74
+        # No partir un carácter UTF-8 de varios bytes
+        while corte > 0 and (datos[corte] & 0xC0) == 0x80:
+            corte -= 1
+        partes.append(datos[:corte].decode("utf-8"))
+        datos = datos[corte:]
+    partes.append(datos.decode("utf-8"))
+    return "\r\n ".join(partes) + "\r\n"
+
+
+class CalendarioService:
+    """Servicio para exportar las citas como calendario ICS"""
+
+    @staticmethod
+    def validar_propietario(db: Session, id_doctor: Optional[int] = None, id_paciente: Optional[int] = None) -> str:
+        """
+        Verifica que el doctor o paciente exista y retorna el nombre del calendario.
+
+        Raises:
+            HTTPException: Si el doctor o paciente no existe
+        """
+        if id_doctor is not None:
+            doctor = doctores_repository.get_by_id(db, id_doctor)
+            if not doctor:
+                raise HTTPException(status_code=404, detail="Doctor no encontrado")
+            return f"Citas - Dr(a). {doctor.nombre} {doctor.apellido}"
+        paciente = pacientes_repository.get_by_id(db, id_paciente)
+        if not paciente:
+            raise HTTPException(status_code=404, detail="Paciente no encontrado")
+        return f"Citas - {paciente.nombre} {paciente.apellido}"
+
+    @staticmethod
+    def calcular_etag(
+        db: Session,
+        nombre: str,
+        id_doctor: Optional[int] = None,
+        id_paciente: Optional[int] = None
+    ) -> str:
+        """
+        Calcula el ETag débil del feed a partir del nombre del calendario, la cantidad de
+        citas y la última modificación de las citas, pacientes y doctores que incluye.
+
+        Es una sola consulta agregada, así que responder 304 a los clientes que
+        sondean el feed no requiere leer ninguna cita.
+        """
+        version = citas_repository.get_version_feed(db, id_doctor, id_paciente)
+        propietario = f"d{id_doctor}" if id_doctor is not None else f"p{id_paciente}"
+        return "W/" + calcular_etag(propietario, nombre, *version)
+
+    @staticmethod
+    def generar_ics(
+        sesiones: Callable[[], Session],
+        nombre: str,
+        id_doctor: Optional[int] = None,
+        id_paciente: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Genera el calendario línea por línea mientras se leen las citas por lotes.
+
+        El generador se consume después de que la petición terminó, así que abre su
+        propia sesión con la fábrica recibida (dependencia get_session_factory).
+        """
+        db = sesiones()
+        try:
+            yield _linea("BEGIN:VCALENDAR")
+            yield _linea("VERSION:2.0")
+            yield _linea("PRODID:-//Sistema de Gestion de Citas Medicas//ES")
+            yield _linea("CALSCALE:GREGORIAN")
+            yield _linea("METHOD:PUBLISH")
+            yield _linea(f"X-WR-CALNAME:{_escapar(nombre)}")
+
+            duracion = timedelta(minutes=DURACION_SLOT_DEFECTO)
+            for c in citas_repository.iterar_feed(db, id_doctor, id_paciente):
+                inicio = datetime.combine(c.fecha, c.hora)
+                if id_doctor is not None:
+                    resumen = f"Cita: {c.paciente_nombre} {c.paciente_apellido}"
+                else:
+                    resumen = f"Cita con Dr(a). {c.doctor_nombre} {c.doctor_apellido}"
+                yield (
+                    _linea("BEGIN:VEVENT")
+                    + _linea(f"UID:cita-{c.id_cita}@citas-medicas")
+                    + _linea(f"DTSTAMP:{(c.updated_at or inicio).strftime(FORMATO_FECHA_ICS)}")
+                    + _linea(f"DTSTART:{inicio.strftime(FORMATO_FECHA_ICS)}")
+                    + _linea(f"DTEND:{(inicio + duracion).strftime(FORMATO_FECHA_ICS)}")
+                    + _linea(f"SUMMARY:{_escapar(resumen)}")
+                    + _linea(f"DESCRIPTION:{_escapar(c.motivo)}")
+                    + _linea(f"STATUS:{ESTADOS_ICS.get(c.estado, 'TENTATIVE')}")
+                    + _linea("END:VEVENT")
+                )
+
+            yield _linea("END:VCALENDAR")
+        finally:
+            db.close()
@@ -0,0 +1,115 @@
+"""
+Servicio de catálogos (especialidades y métodos de pago) en caché con versión
+"""
+import hashlib
+import json
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.repositories import doctores_repository, facturas_repository
+from app.models.doctor import Especialidad
+from app.models.factura import MetodoPago
+from app.cache import cache
+from typing import Callable, Dict, List
+from fastapi import HTTPException
+
+# Segundos que se conserva un catálogo. Las escrituras por el ORM lo invalidan antes;
+# el límite cubre cambios hechos directamente en la base de datos.
+CATALOGOS_TTL = 3600
+
+# Cabecera Cache-Control de los catálogos: cualquier caché puede guardarlos, pero debe
+# revalidarlos con If-None-Match antes de usarlos (responde 304 si no cambiaron)
+CACHE_CONTROL_CATALOGOS = "public, no-cache"
+
+# Funciones que leen cada catálogo ya serializado
+_CARGAR: Dict[str, Callable[[Session], List[dict]]] = {
+    "especialidades": lambda db: [
+        {"id_especialidad": e.id_especialidad, "nombre": e.nombre, "descripcion": e.descripcion}
+        for e in doctores_repository.get_all_especialidades(db)
+    ],
+    "metodos_pago": lambda db: [
+        {"id_metodo_pago": m.id_metodo_pago, "nombre": m.nombre}
+        for m in facturas_repository.get_all_metodos_pago(db)
+    ]
+}
+
+# Evita que varias peticiones recarguen a la vez el mismo catálogo
+_lock = threading.Lock()
+
+# Clave de Session.info con las etiquetas a invalidar cuando la transacción se confirme
+_PENDIENTES = "catalogos_invalidar"
+
+
+def invalidar_catalogo(nombre: str) -> None:
+    """Descarta el catálogo en caché; la próxima lectura lo recarga"""
+    cache.invalidar(f"catalogos:{nombre}")
+
+
+class CatalogosService:
+    """Servicio de catálogos que casi nunca cambian, servidos desde memoria"""
+
+    @staticmethod
+    def obtener(db: Session, nombre: str) -> dict:
+        """
+        Obtiene un catálogo con su versión y su ETag.
+
+        La versión es la huella del contenido, así que cambia con él y coincide entre
+        procesos sin guardar estado en ninguno. El ETag se forma con la misma huella.
+
+        Returns:
+            Diccionario con version, etag y data
+
+        Raises:
+            HTTPException: Si el catálogo no existe
+        """
+        if nombre not in _CARGAR:
+            raise HTTPException(status_code=404, detail="Catálogo no encontrado")
+
+        clave = f"catalogo:{nombre}"
+        catalogo = cache.obtener(clave)
+        if catalogo is not None:
+            return catalogo
+
+        with _lock:
+            catalogo = cache.obtener(clave)
+            if catalogo is None:
+                marca = cache.marca()
+                data = _CARGAR[nombre](db)
+                huella = hashlib.sha1(
+                    json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+                ).hexdigest()[:16]
+                catalogo = {"version": huella, "etag": f'"{nombre}-{huella}"', "data": data}
+                cache.guardar(
+                    clave, catalogo, etiquetas=(f"catalogos:{nombre}",), ttl=CATALOGOS_TTL, marca=marca
+                )
+        return catalogo
+
+
+def _al_escribir(*etiquetas: str):
+    """
+    Anota en la sesión las etiquetas a invalidar. Los eventos de mapper ocurren en el
+    flush, antes del commit: invalidar ahí permitiría que otra petición recargara el
+    contenido anterior y lo dejara en caché hasta que venza.
+    """
+    def anotar(mapper, connection, target):
+        object_session(target).info.setdefault(_PENDIENTES, set()).update(etiquetas)
+    return anotar
+
+def _al_confirmar(sesion: Session) -> None:
+    etiquetas = sesion.info.pop(_PENDIENTES, None)
+    if etiquetas:
+        cache.invalidar(*etiquetas)
+
+def _al_revertir(sesion: Session) -> None:
+    sesion.info.pop(_PENDIENTES, None)
+
+# Cualquier escritura de los modelos por el ORM invalida su catálogo (y el directorio de
+# doctores, que incluye el nombre de la especialidad) una vez confirmada
+for _modelo, _etiquetas in (
+    (Especialidad, ("catalogos:especialidades", "doctores")),
+    (MetodoPago, ("catalogos:metodos_pago",))
+):
+    for _evento in ("after_insert", "after_update", "after_delete"):
+        event.listen(_modelo, _evento, _al_escribir(*_etiquetas))
+event.listen(Session, "after_commit", _al_confirmar)
+event.listen(Session, "after_rollback", _al_revertir)
@@ -1,40 +1,228 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from app.repositories import citas_repository, pacientes_repository, doctores_repository
-from app.schemas.cita import CitaCreate, CitaUpdate, CitaUpdateEstado
+from app.repositories.indice_horarios import indice_horarios
+from app.services.disponibilidad_service import DIAS_SEMANA
+from app.services.auth_service import obtener_id_referencia
+from app.schemas.cita import CitaCreate, CitaUpdate, CitaUpdateEstado, CitaLoteCreate
 from fastapi import HTTPException
+from typing import Optional, Tuple
+from app.models.cita import CitaMedica
+from app.utils.proyeccion import Proyeccion
+
+# Códigos de error de MySQL para violaciones de integridad
+MYSQL_ENTRADA_DUPLICADA = 1062
+MYSQL_FK_INEXISTENTE = 1452
+
+def mapear_error_integridad(db: Session, error: IntegrityError, id_paciente: int, id_doctor: int) -> HTTPException:
+    """
+    Traduce una violación de integridad al insertar una cita a la respuesta HTTP equivalente.
+    
+    Args:
+        db: Sesión de base de datos (ya revertida)
+        error: Excepción lanzada por el INSERT
+        id_paciente: Paciente de la cita
+        id_doctor: Doctor de la cita
+        
+    Returns:
+        HTTPException 409 si el slot ya está ocupado o 404 si el paciente o el doctor no existen
+    """
+    args = getattr(error.orig, "args", ())
+    codigo = args[0] if args else None
+    mensaje = str(error.orig)
+
+    if codigo == MYSQL_ENTRADA_DUPLICADA or "UNIQUE" in mensaje:
+        return HTTPException(status_code=409, detail="El horario no está disponible")
+
+    if codigo == MYSQL_FK_INEXISTENTE:
+        if "(`id_paciente`)" in mensaje:
+            return HTTPException(status_code=404, detail="Paciente no encontrado")
+        if "(`id_doctor`)" in mensaje:
+            return HTTPException(status_code=404, detail="Doctor no encontrado")
+
+    # El motor no indica qué referencia falló: se consulta solo en este camino de error
+    if not pacientes_repository.get_by_id(db, id_paciente):
+        return HTTPException(status_code=404, detail="Paciente no encontrado")
+    if not doctores_repository.get_by_id(db, id_doctor):
+        return HTTPException(status_code=404, detail="Doctor no encontrado")
+    return HTTPException(status_code=409, detail="El horario no está disponible")
 
 class CitaService:
     @staticmethod
     def crear_cita(db: Session, cita_data: CitaCreate):
-        if not pacientes_repository.get_by_id(db, cita_data.id_paciente):
+        """
+        Registra una cita con un único INSERT.
+        
+        La existencia del paciente y del doctor la garantizan las claves foráneas, y la
+        disponibilidad del slot el índice único sobre (id_doctor, fecha, hora) de las
+        citas activas, por lo que dos reservas simultáneas no pueden ocupar el mismo slot.
+        """
+        try:
+            return citas_repository.create(db, cita_data)
+        except IntegrityError as e:
+            db.rollback()
+            raise mapear_error_integridad(db, e, cita_data.id_paciente, cita_data.id_doctor)
+    
+    @staticmethod
+    def crear_citas_lote(db: Session, lote: CitaLoteCreate) -> dict:
+        """
+        Registra un lote de citas (lista explícita o serie recurrente).
+        
+        Los conflictos de toda la serie se detectan con una sola consulta y las citas
+        libres se insertan en una sola transacción con executemany. Si otra reserva
+        ocupa un slot entre la verificación y el INSERT, se reintenta cita por cita
+        con savepoints para reportar ese conflicto sin perder el resto.
+        
+        Returns:
+            {"creadas": [...], "conflictos": [...]}; si todo_o_nada es True y hay
+            conflictos, no se registra ninguna cita
+            
+        Raises:
+            HTTPException: Si el paciente o el doctor no existen
+        """
+        if not pacientes_repository.get_by_id(db, lote.id_paciente):
             raise HTTPException(status_code=404, detail="Paciente no encontrado")
-        if not doctores_repository.get_by_id(db, cita_data.id_doctor):
+        if not doctores_repository.get_by_id(db, lote.id_doctor):
             raise HTTPException(status_code=404, detail="Doctor no encontrado")
-        if not citas_repository.verificar_disponibilidad(db, cita_data.id_doctor, cita_data.fecha, cita_data.hora):
-            raise HTTPException(status_code=409, detail="El horario no está disponible")
-        return citas_repository.create(db, cita_data)
+
+        ocurrencias = lote.expandir()
+        fechas = [o.fecha for o in ocurrencias]
+        ocupadas = {
+            (fecha, hora) for _, fecha, hora in
+            citas_repository.get_horas_ocupadas(db, [lote.id_doctor], min(fechas), max(fechas))
+        }
+        con_horario = indice_horarios.tiene_horario(db, lote.id_doctor)
+
+        libres, conflictos, vistas = [], [], set()
+        for o in ocurrencias:
+            motivo = None
+            if (o.fecha, o.hora) in vistas:
+                motivo = "Ocurrencia repetida en la solicitud"
+            elif (o.fecha, o.hora) in ocupadas:
+                motivo = "El horario no está disponible"
+            elif con_horario and not indice_horarios.dentro_de_horario(
+                db, lote.id_doctor, DIAS_SEMANA[o.fecha.weekday()], o.hora
+            ):
+                motivo = "La hora está fuera del horario de atención del doctor"
+            vistas.add((o.fecha, o.hora))
+
+            if motivo:
+                conflictos.append({"fecha": str(o.fecha), "hora": str(o.hora), "motivo": motivo})
+            else:
+                libres.append(o)
+
+        if not libres or (conflictos and lote.todo_o_nada):
+            return {"creadas": [], "conflictos": conflictos}
+
+        filas = [{
+            "id_paciente": lote.id_paciente,
+            "id_doctor": lote.id_doctor,
+            "fecha": o.fecha,
+            "hora": o.hora,
+            "motivo": lote.motivo,
+            "observaciones": lote.observaciones,
+            "estado": "pendiente"
+        } for o in libres]
+
+        solicitadas = {(o.fecha, o.hora) for o in libres}
+        try:
+            citas_repository.create_lote(db, filas)
+        except IntegrityError:
+            db.rollback()
+            if lote.todo_o_nada:
+                return {"creadas": [], "conflictos": conflictos + [
+                    {"fecha": str(f["fecha"]), "hora": str(f["hora"]), "motivo": "El horario no está disponible"}
+                    for f in filas if not citas_repository.verificar_disponibilidad(db, lote.id_doctor, f["fecha"], f["hora"])
+                ]}
+            for fila in filas:
+                if not citas_repository.insertar_si_libre(db, fila):
+                    solicitadas.discard((fila["fecha"], fila["hora"]))
+                    conflictos.append({
+                        "fecha": str(fila["fecha"]), "hora": str(fila["hora"]),
+                        "motivo": "El horario no está disponible"
+                    })
+            citas_repository.confirmar_lote(db, filas)
+
+        creadas = sorted(
+            (c for c in citas_repository.get_activas_de_paciente_en_fechas(
+                db, lote.id_paciente, lote.id_doctor, [o.fecha for o in libres]
+            ) if (c.fecha, c.hora) in solicitadas),
+            key=lambda c: (c.fecha, c.hora)
+        )
+        return {
+            "creadas": [{"id_cita": c.id_cita, "fecha": str(c.fecha), "hora": str(c.hora)} for c in creadas],
+            "conflictos": conflictos
+        }
     
     @staticmethod
-    def obtener_cita(db: Session, cita_id: int):
-        cita = citas_repository.get_by_id(db, cita_id)
+    def obtener_cita(db: Session, cita_id: int, proyeccion: Optional[Proyeccion] = None):
+        cita = citas_repository.get_by_id(db, cita_id, proyeccion)
         if not cita:
             raise HTTPException(status_code=404, detail="Cita no encontrada")
         return cita
     
     @staticmethod
-    def listar_citas(db: Session, skip: int = 0, limit: int = 100):
-        return citas_repository.get_all(db, skip, limit)
+    def validar_filtros(**filtros) -> None:
+        """Valida los filtros del listado y la exportación de citas"""
+        if filtros.get("fecha_desde") and filtros.get("fecha_hasta") and filtros["fecha_hasta"] < filtros["fecha_desde"]:
+            raise HTTPException(status_code=400, detail="La fecha final no puede ser anterior a la fecha inicial")
+
+    @staticmethod
+    def listar_citas(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, **filtros):
+        CitaService.validar_filtros(**filtros)
+        return citas_repository.get_all(db, skip, limit, cursor, **filtros)
     
     @staticmethod
-    def actualizar_estado(db: Session, cita_id: int, estado: str):
-        cita = citas_repository.get_by_id(db, cita_id)
+    def listar_citas_usuario(db: Session, current_user: dict, limit: int = 100, cursor: Optional[str] = None, **filtros):
+        """
+        Lista las citas del doctor o paciente autenticado.
+
+        El alcance sale del rol e id_referencia del token, así que se hace una sola
+        consulta sobre el índice del doctor o del paciente.
+
+        Raises:
+            HTTPException: Si el usuario no es doctor ni paciente o no tiene referencia
+        """
+        rol = current_user.get("rol")
+        if rol not in ("doctor", "paciente"):
+            raise HTTPException(status_code=403, detail="Solo doctores y pacientes tienen citas propias")
+        id_referencia = obtener_id_referencia(db, current_user)
+        if id_referencia is None:
+            raise HTTPException(status_code=404, detail=f"El usuario no está asociado a un {rol}")
+
+        filtros["id_doctor" if rol == "doctor" else "id_paciente"] = id_referencia
+        return CitaService.listar_citas(db, 0, limit, cursor, **filtros)
+
+    @staticmethod
+    def actualizar_estado(db: Session, cita_id: int, estado: str) -> Tuple[CitaMedica, str]:
+        """
+        Cambia el estado de una cita.
+
+        Returns:
+            Tupla (cita, estado anterior), para saber si el cambio liberó el slot
+        """
+        cita = citas_repository.get_para_actualizar(db, cita_id)
         if not cita:
             raise HTTPException(status_code=404, detail="Cita no encontrada")
-        return citas_repository.update_estado(db, cita_id, estado)
+        anterior = cita.estado
+        try:
+            return citas_repository.update_estado(db, cita_id, estado), anterior
+        except IntegrityError:
+            # Reactivar una cita cancelada cuyo slot ya fue ocupado por otra
+            db.rollback()
+            raise HTTPException(status_code=409, detail="El horario no está disponible")
     
     @staticmethod
-    def cancelar_cita(db: Session, cita_id: int):
-        cita = citas_repository.get_by_id(db, cita_id)
+    def cancelar_cita(db: Session, cita_id: int) -> Tuple[CitaMedica, str]:
+        """
+        Cancela una cita.
+
+        Returns:
+            Tupla (cita, estado anterior); cancelar dos veces no vuelve a liberar el slot
+        """
+        cita = citas_repository.get_para_actualizar(db, cita_id)
         if not cita:
             raise HTTPException(status_code=404, detail="Cita no encontrada")
-        return citas_repository.delete(db, cita_id)
\ No newline at end of file
+        anterior = cita.estado
+        citas_repository.delete(db, cita_id)
+        return cita, anterior
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Servicio del resumen del panel principal
+"""
+import threading
+from sqlalchemy.orm import Session
+from app.repositories import dashboard_repository
+from app.cache import cache
+from datetime import date
+
+# Segundos que se reutiliza el resumen. Todos los paneles abiertos comparten la misma
+# entrada, así que el costo es un par de consultas por intervalo, no por usuario.
+DASHBOARD_TTL = 10
+
+# Citas que se muestran como actividad reciente
+ACTIVIDAD_RECIENTE = 5
+
+# Evita que varias peticiones recalculen a la vez el resumen recién expirado
+_lock = threading.Lock()
+
+
+class DashboardService:
+    """Servicio del resumen del panel principal"""
+
+    @staticmethod
+    def resumen(db: Session) -> dict:
+        """Conteos del panel principal y últimas citas registradas, en caché por unos segundos"""
+        hoy = date.today()
+        clave = f"dashboard:resumen:{hoy}"
+        resumen = cache.obtener(clave)
+        if resumen is not None:
+            return resumen
+
+        with _lock:
+            resumen = cache.obtener(clave)
+            if resumen is None:
+                resumen = DashboardService._calcular(db, hoy)
+                cache.guardar(clave, resumen, ttl=DASHBOARD_TTL)
+        return resumen
+
+    @staticmethod
+    def _calcular(db: Session, hoy: date) -> dict:
+        pacientes, doctores_activos, citas_hoy, pendientes, confirmadas = dashboard_repository.contar(db, hoy)
+        return {
+            "fecha": str(hoy),
+            "pacientes": pacientes,
+            "doctores_activos": doctores_activos,
+            "citas_hoy": citas_hoy,
+            "citas_pendientes": pendientes,
+            "citas_confirmadas": confirmadas,
+            "actividad_reciente": [
+                {
+                    "id_cita": id_cita,
+                    "fecha": str(fecha),
+                    "hora": str(hora),
+                    "estado": estado,
+                    "paciente": f"{paciente_nombre} {paciente_apellido}",
+                    "doctor": f"{doctor_nombre} {doctor_apellido}"
+                }
+                for id_cita, fecha, hora, estado, paciente_nombre, paciente_apellido, doctor_nombre, doctor_apellido
+                in dashboard_repository.actividad_reciente(db, ACTIVIDAD_RECIENTE)
+            ]
+        }
@@ -0,0 +1,263 @@
+"""
+Servicio de cálculo de disponibilidad (slots libres) de los doctores
+"""
+from sqlalchemy.orm import Session
+from app.repositories import citas_repository, doctores_repository
+from app.repositories.indice_horarios import indice_horarios
+from typing import Dict, List, Iterator, Tuple, Optional
+from datetime import date, time, datetime, timedelta
+from bisect import bisect_right
+from collections import defaultdict
+from heapq import merge
+from itertools import islice
+from fastapi import HTTPException
+
+# Nombres de DiaSemana indexados por date.weekday()
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+# Duración por defecto de un slot de cita, en minutos
+DURACION_SLOT_DEFECTO = 30
+
+# Máximo de días que se pueden consultar en una sola petición
+MAX_DIAS_CONSULTA = 62
+
+# Días de citas ocupadas que se cargan por consulta al buscar los próximos slots
+VENTANA_BUSQUEDA_DIAS = 7
+
+
+def _a_minutos(hora: time) -> int:
+    return hora.hour * 60 + hora.minute
+
+def _a_hora(minutos: int) -> time:
+    return time(minutos // 60, minutos % 60)
+
+def agrupar_ocupadas(ocupadas) -> Dict[int, Dict[date, List[int]]]:
+    """
+    Agrupa las horas ocupadas por doctor y fecha como minutos ordenados.
+
+    Args:
+        ocupadas: Tuplas (id_doctor, fecha, hora) de citas no canceladas
+    """
+    resultado = defaultdict(lambda: defaultdict(list))
+    for id_doctor, fecha, hora in ocupadas:
+        resultado[id_doctor][fecha].append(_a_minutos(hora))
+    for fechas in resultado.values():
+        for horas in fechas.values():
+            horas.sort()
+    return resultado
+
+def iterar_slots_libres(
+    bloques: Dict[str, List[Tuple[int, int]]],
+    ocupadas: Dict[date, List[int]],
+    fecha_desde: date,
+    fecha_hasta: date,
+    duracion: int = DURACION_SLOT_DEFECTO,
+    desde_momento: Optional[datetime] = None
+) -> Iterator[Tuple[date, time]]:
+    """
+    Genera en orden cronológico los slots libres de un doctor.
+
+    Un slot [inicio, inicio + duracion) está ocupado si se solapa con alguna cita no
+    cancelada, que dura DURACION_SLOT_DEFECTO minutos desde su hora: una cita a las
+    08:15 ocupa los slots de las 08:00 y de las 08:30. Los slots se producen de forma
+    perezosa, por lo que el consumidor puede detenerse sin expandir todo el calendario.
+
+    Args:
+        bloques: Bloques de atención del doctor por día de la semana (minutos)
+        ocupadas: Horas ocupadas del doctor por fecha (minutos ordenados)
+        fecha_desde: Primer día del rango (inclusive)
+        fecha_hasta: Último día del rango (inclusive)
+        duracion: Duración del slot en minutos
+        desde_momento: Si se indica, se omiten los slots que comienzan antes
+
+    Yields:
+        Tuplas (fecha, hora) de inicio de cada slot libre
+    """
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        rangos = bloques.get(DIAS_SEMANA[fecha.weekday()])
+        if rangos:
+            horas = ocupadas.get(fecha, [])
+            minimo = 0
+            if desde_momento and fecha == desde_momento.date():
+                minimo = desde_momento.hour * 60 + desde_momento.minute + 1
+            for inicio, fin in rangos:
+                slot = inicio
+                while slot + duracion <= fin:
+                    if slot >= minimo:
+                        # Primera cita que termina después de que el slot comienza
+                        i = bisect_right(horas, slot - DURACION_SLOT_DEFECTO)
+                        if i == len(horas) or horas[i] >= slot + duracion:
+                            yield fecha, _a_hora(slot)
+                    slot += duracion
+        fecha += timedelta(days=1)
+
+def calcular_huecos(
+    rangos: List[Tuple[int, int]],
+    ocupadas: List[int],
+    duracion: int = DURACION_SLOT_DEFECTO
+) -> List[Tuple[time, time]]:
+    """
+    Calcula los huecos libres de un día restando las citas a los bloques de atención.
+
+    Args:
+        rangos: Bloques de atención del día (minutos), ordenados
+        ocupadas: Horas de inicio de las citas no canceladas (minutos), ordenadas
+        duracion: Minutos que ocupa cada cita
+
+    Returns:
+        Lista de rangos (hora_inicio, hora_fin) libres
+    """
+    huecos = []
+    for inicio, fin in rangos:
+        cursor = inicio
+        for hora in ocupadas:
+            if hora + duracion <= cursor or hora >= fin:
+                continue
+            if hora > cursor:
+                huecos.append((_a_hora(cursor), _a_hora(hora)))
+            cursor = max(cursor, hora + duracion)
+        if cursor < fin:
+            huecos.append((_a_hora(cursor), _a_hora(fin)))
+    return huecos
+
+def _slots_de_doctor(doctor_id: int, *args) -> Iterator[Tuple[date, time, int]]:
+    """Etiqueta con el id del doctor los slots de iterar_slots_libres, para mezclarlos"""
+    for fecha, hora in iterar_slots_libres(*args):
+        yield fecha, hora, doctor_id
+
+
+class DisponibilidadService:
+    """Servicio para consulta de disponibilidad de doctores"""
+
+    @staticmethod
+    def validar_rango(fecha_desde: date, fecha_hasta: date) -> Tuple[date, date]:
+        """Valida el rango de fechas y lo recorta para que no incluya días pasados"""
+        if fecha_hasta < fecha_desde:
+            raise HTTPException(status_code=400, detail="La fecha final no puede ser anterior a la fecha inicial")
+        if (fecha_hasta - fecha_desde).days + 1 > MAX_DIAS_CONSULTA:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El rango de fechas no puede superar {MAX_DIAS_CONSULTA} días"
+            )
+        return max(fecha_desde, date.today()), fecha_hasta
+
+    @staticmethod
+    def consultar_disponibilidad(
+        db: Session,
+        doctor_ids: List[int],
+        fecha_desde: date,
+        fecha_hasta: date,
+        duracion: int = DURACION_SLOT_DEFECTO
+    ) -> List[dict]:
+        """
+        Calcula los slots libres de uno o varios doctores en un rango de fechas.
+
+        Se hace una consulta para los doctores, una para sus horarios y una para
+        las citas ocupadas del rango; el resto se calcula en memoria.
+
+        Returns:
+            Lista con la disponibilidad de cada doctor agrupada por fecha
+
+        Raises:
+            HTTPException: Si el rango es inválido o algún doctor no existe
+        """
+        fecha_desde, fecha_hasta = DisponibilidadService.validar_rango(fecha_desde, fecha_hasta)
+        doctor_ids = list(dict.fromkeys(doctor_ids))
+
+        doctores = {d.id_doctor: d for d in doctores_repository.get_by_ids(db, doctor_ids)}
+        faltantes = [i for i in doctor_ids if i not in doctores]
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Doctor no encontrado: {faltantes[0]}")
+
+        bloques = indice_horarios.bloques_en_minutos(db, doctor_ids)
+        ocupadas = agrupar_ocupadas(
+            citas_repository.get_horas_ocupadas(db, doctor_ids, fecha_desde, fecha_hasta)
+        )
+        ahora = datetime.now()
+
+        resultado = []
+        for doctor_id in doctor_ids:
+            por_fecha = defaultdict(list)
+            for fecha, hora in iterar_slots_libres(
+                bloques.get(doctor_id, {}), ocupadas.get(doctor_id, {}),
+                fecha_desde, fecha_hasta, duracion, ahora
+            ):
+                por_fecha[fecha].append(str(hora))
+
+            doctor = doctores[doctor_id]
+            resultado.append({
+                "id_doctor": doctor_id,
+                "doctor": f"{doctor.nombre} {doctor.apellido}",
+                "duracion": duracion,
+                "disponibilidad": [
+                    {"fecha": str(fecha), "horas": horas}
+                    for fecha, horas in por_fecha.items()
+                ]
+            })
+
+        return resultado
+
+    @staticmethod
+    def proximos_slots_especialidad(
+        db: Session,
+        especialidad_id: int,
+        cantidad: int = 10,
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        duracion: int = DURACION_SLOT_DEFECTO
+    ) -> List[dict]:
+        """
+        Busca los primeros slots libres entre todos los doctores activos de una especialidad.
+
+        Los slots de cada doctor se generan de forma perezosa y se mezclan (k-way merge)
+        por fecha y hora. Las citas ocupadas se cargan por ventanas de días, así que
+        la búsqueda se detiene en cuanto se reúnen los slots pedidos sin expandir el
+        calendario completo de cada doctor.
+
+        Returns:
+            Lista de slots {fecha, hora, id_doctor, doctor} en orden cronológico
+
+        Raises:
+            HTTPException: Si la especialidad no existe o el rango es inválido
+        """
+        if not doctores_repository.get_especialidad_by_id(db, especialidad_id):
+            raise HTTPException(status_code=404, detail="La especialidad especificada no existe")
+
+        fecha_desde = fecha_desde or date.today()
+        fecha_hasta = fecha_hasta or fecha_desde + timedelta(days=MAX_DIAS_CONSULTA - 1)
+        fecha_desde, fecha_hasta = DisponibilidadService.validar_rango(fecha_desde, fecha_hasta)
+
+        doctores = {d.id_doctor: d for d in doctores_repository.get_by_especialidad(db, especialidad_id)}
+        if not doctores:
+            return []
+
+        doctor_ids = list(doctores)
+        bloques = indice_horarios.bloques_en_minutos(db, doctor_ids)
+        doctor_ids = [i for i in doctor_ids if bloques[i]]
+        ahora = datetime.now()
+
+        resultado = []
+        inicio = fecha_desde
+        while inicio <= fecha_hasta and len(resultado) < cantidad:
+            fin = min(inicio + timedelta(days=VENTANA_BUSQUEDA_DIAS - 1), fecha_hasta)
+            ocupadas = agrupar_ocupadas(
+                citas_repository.get_horas_ocupadas(db, doctor_ids, inicio, fin)
+            )
+            generadores = [
+                _slots_de_doctor(
+                    doctor_id, bloques[doctor_id], ocupadas.get(doctor_id, {}), inicio, fin, duracion, ahora
+                )
+                for doctor_id in doctor_ids
+            ]
+            for fecha, hora, doctor_id in islice(merge(*generadores), cantidad - len(resultado)):
+                doctor = doctores[doctor_id]
+                resultado.append({
+                    "fecha": str(fecha),
+                    "hora": str(hora),
+                    "id_doctor": doctor_id,
+                    "doctor": f"{doctor.nombre} {doctor.apellido}"
+                })
+            inicio = fin + timedelta(days=1)
+
+        return resultado
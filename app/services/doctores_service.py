@@ -5,9 +5,15 @@ from sqlalchemy.orm import Session
 from app.repositories import doctores_repository
 from app.schemas.doctor import DoctorCreate, DoctorUpdate
 from app.models.doctor import Doctor
+from app.utils.proyeccion import Proyeccion
+from app.cache import cache
 from typing import Optional, List
 from fastapi import HTTPException
 
+# Segundos que el directorio permanece en caché. Las escrituras de doctores y horarios
+# lo invalidan antes; el límite acota cambios que no lo invalidan (p. ej. especialidades).
+DIRECTORIO_TTL = 300
+
 class DoctorService:
     """Servicio para gestión de doctores"""
     
@@ -64,13 +70,14 @@ class DoctorService:
         return doctor
     
     @staticmethod
-    def obtener_doctor_por_id(db: Session, doctor_id: int) -> Optional[Doctor]:
+    def obtener_doctor_por_id(db: Session, doctor_id: int, proyeccion: Optional[Proyeccion] = None) -> Optional[Doctor]:
         """
         Obtiene un doctor por su ID.
         
         Args:
             db: Sesión de base de datos
             doctor_id: ID del doctor
+            proyeccion: Campos y relaciones pedidos con fields/expand
             
         Returns:
             Doctor encontrado o None
@@ -78,7 +85,7 @@ class DoctorService:
         Raises:
             HTTPException: Si el doctor no existe
         """
-        doctor = doctores_repository.get_by_id(db, doctor_id)
+        doctor = doctores_repository.get_by_id(db, doctor_id, proyeccion)
         if not doctor:
             raise HTTPException(
                 status_code=404,
@@ -87,19 +94,27 @@ class DoctorService:
         return doctor
     
     @staticmethod
-    def obtener_todos_doctores(db: Session, skip: int = 0, limit: int = 100) -> List[Doctor]:
+    def obtener_todos_doctores(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        proyeccion: Optional[Proyeccion] = None
+    ) -> List[Doctor]:
         """
         Obtiene lista de doctores con paginación.
         
         Args:
             db: Sesión de base de datos
-            skip: Número de registros a saltar
+            skip: Número de registros a saltar (si no se usa cursor)
             limit: Límite de registros a retornar
+            cursor: Cursor de la página anterior
+            proyeccion: Campos y relaciones pedidos con fields/expand
             
         Returns:
             Lista de doctores
         """
-        return doctores_repository.get_all(db, skip, limit)
+        return doctores_repository.get_all(db, skip, limit, cursor, proyeccion)
     
     @staticmethod
     def obtener_doctores_por_especialidad(db: Session, especialidad_id: int) -> List[Doctor]:
@@ -115,6 +130,66 @@ class DoctorService:
         """
         return doctores_repository.get_by_especialidad(db, especialidad_id)
     
+    @staticmethod
+    def obtener_directorio(
+        db: Session,
+        especialidad_id: Optional[int] = None,
+        dia_semana: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Obtiene el directorio de doctores activos con su especialidad y horarios.
+        
+        El directorio se guarda en caché por filtro y se invalida cuando cambia
+        cualquier doctor u horario.
+        
+        Args:
+            db: Sesión de base de datos
+            especialidad_id: Filtra por especialidad
+            dia_semana: Filtra por día de atención
+            
+        Returns:
+            Lista de doctores con sus horarios
+            
+        Raises:
+            HTTPException: Si la especialidad no existe
+        """
+        clave = f"directorio:{especialidad_id}:{dia_semana}"
+        directorio = cache.obtener(clave)
+        if directorio is not None:
+            return directorio
+        
+        marca = cache.marca()
+        if especialidad_id is not None and not doctores_repository.get_especialidad_by_id(db, especialidad_id):
+            raise HTTPException(
+                status_code=404,
+                detail="La especialidad especificada no existe"
+            )
+        
+        directorio = [
+            {
+                "id_doctor": d.id_doctor,
+                "nombre": d.nombre,
+                "apellido": d.apellido,
+                "telefono": d.telefono,
+                "licencia": d.licencia,
+                "id_especialidad": d.id_especialidad,
+                "especialidad": d.especialidad.nombre if d.especialidad else None,
+                "horarios": [
+                    {
+                        "id_horario": h.id_horario,
+                        "dia_semana": h.dia_semana,
+                        "hora_inicio": str(h.hora_inicio),
+                        "hora_fin": str(h.hora_fin)
+                    }
+                    for h in sorted(d.horarios, key=lambda h: h.hora_inicio)
+                ]
+            }
+            for d in doctores_repository.get_directorio(db, especialidad_id, dia_semana)
+        ]
+        
+        cache.guardar(clave, directorio, etiquetas=("doctores",), ttl=DIRECTORIO_TTL, marca=marca)
+        return directorio
+    
     @staticmethod
     def actualizar_doctor(db: Session, doctor_id: int, doctor_data: DoctorUpdate) -> Doctor:
         """
@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 from app.repositories import facturas_repository, citas_repository
 from app.schemas.factura import FacturaCreate
 from fastapi import HTTPException
+from typing import Optional
+from app.utils.proyeccion import Proyeccion
 
 class FacturaService:
     @staticmethod
@@ -16,15 +18,21 @@ class FacturaService:
         return facturas_repository.create(db, factura_data)
     
     @staticmethod
-    def obtener_factura(db: Session, factura_id: int):
-        factura = facturas_repository.get_by_id(db, factura_id)
+    def obtener_factura(db: Session, factura_id: int, proyeccion: Optional[Proyeccion] = None):
+        factura = facturas_repository.get_by_id(db, factura_id, proyeccion)
         if not factura:
             raise HTTPException(status_code=404, detail="Factura no encontrada")
         return factura
     
     @staticmethod
-    def listar_facturas(db: Session, skip: int = 0, limit: int = 100):
-        return facturas_repository.get_all(db, skip, limit)
+    def listar_facturas(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        proyeccion: Optional[Proyeccion] = None
+    ):
+        return facturas_repository.get_all(db, skip, limit, cursor, proyeccion)
     
     @staticmethod
     def listar_metodos_pago(db: Session):
@@ -3,11 +3,33 @@ Servicio de lógica de negocio para Horarios
 """
 from sqlalchemy.orm import Session
 from app.repositories import horarios_repository, doctores_repository
-from app.schemas.horario import HorarioCreate, HorarioUpdate
+from app.schemas.horario import HorarioCreate, HorarioUpdate, BloqueHorario, PlantillaHorario, PlantillaHorarioLote
 from app.models.horario import Horario
-from typing import List
+from typing import List, Dict
+from collections import defaultdict
 from fastapi import HTTPException
 
+def validar_plantilla(bloques: List[BloqueHorario]) -> None:
+    """
+    Verifica en memoria que los bloques de una plantilla no se solapen entre sí.
+    
+    Raises:
+        HTTPException: Si dos bloques del mismo día se solapan
+    """
+    por_dia = defaultdict(list)
+    for b in bloques:
+        por_dia[b.dia_semana].append((b.hora_inicio, b.hora_fin))
+    
+    for dia, rangos in por_dia.items():
+        rangos.sort()
+        for (inicio_a, fin_a), (inicio_b, fin_b) in zip(rangos, rangos[1:]):
+            if inicio_b < fin_a:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"La plantilla tiene bloques que se solapan el día {dia}: "
+                           f"{inicio_a}-{fin_a} y {inicio_b}-{fin_b}"
+                )
+
 class HorarioService:
     """Servicio para gestión de horarios"""
     
@@ -74,4 +96,34 @@ class HorarioService:
         if not horario:
             raise HTTPException(status_code=404, detail="Horario no encontrado")
         
-        return horarios_repository.delete(db, horario_id)
\ No newline at end of file
+        return horarios_repository.delete(db, horario_id)
+    
+    @staticmethod
+    def reemplazar_plantilla(db: Session, doctor_id: int, plantilla: PlantillaHorario) -> dict:
+        """Reemplaza de forma atómica la plantilla semanal de un doctor"""
+        doctor = doctores_repository.get_by_id(db, doctor_id)
+        if not doctor:
+            raise HTTPException(status_code=404, detail="Doctor no encontrado")
+        
+        validar_plantilla(plantilla.bloques)
+        return horarios_repository.reemplazar_plantilla(db, [doctor_id], plantilla.bloques)[doctor_id]
+    
+    @staticmethod
+    def aplicar_plantilla_lote(db: Session, plantilla: PlantillaHorarioLote) -> Dict[int, dict]:
+        """Aplica una plantilla semanal a varios doctores o a todos los de una especialidad"""
+        validar_plantilla(plantilla.bloques)
+        
+        if plantilla.id_especialidad:
+            if not doctores_repository.get_especialidad_by_id(db, plantilla.id_especialidad):
+                raise HTTPException(status_code=404, detail="La especialidad especificada no existe")
+            doctor_ids = [d.id_doctor for d in doctores_repository.get_by_especialidad(db, plantilla.id_especialidad)]
+        else:
+            doctor_ids = list(dict.fromkeys(plantilla.doctor_ids))
+            encontrados = {d.id_doctor for d in doctores_repository.get_by_ids(db, doctor_ids)}
+            faltantes = [i for i in doctor_ids if i not in encontrados]
+            if faltantes:
+                raise HTTPException(status_code=404, detail=f"Doctor no encontrado: {faltantes[0]}")
+        
+        if not doctor_ids:
+            return {}
+        return horarios_repository.reemplazar_plantilla(db, doctor_ids, plantilla.bloques)
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Servicio de lógica de negocio para la Lista de Espera
+"""
+import os
+from sqlalchemy.orm import Session
+from app.repositories import lista_espera_repository, pacientes_repository, doctores_repository, citas_repository
+from app.schemas.lista_espera import ListaEsperaCreate
+from app.schemas.cita import CitaCreate
+from app.services.citas_service import CitaService
+from app.services.notificaciones_service import NotificacionService
+from app.models.lista_espera import ListaEspera
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Optional
+from fastapi import HTTPException
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Horas que tiene un paciente para aceptar un slot ofrecido (como máximo, hasta la hora del slot)
+OFERTA_VIGENCIA_HORAS = float(os.getenv("LISTA_ESPERA_VIGENCIA_OFERTA_HORAS", "12"))
+
+class ListaEsperaService:
+    """Servicio para gestión de la lista de espera y reasignación de slots liberados"""
+
+    @staticmethod
+    def inscribir(db: Session, data: ListaEsperaCreate) -> ListaEspera:
+        """
+        Inscribe a un paciente en la lista de espera de un doctor o de una especialidad.
+
+        Raises:
+            HTTPException: Si el paciente, el doctor o la especialidad no existen
+        """
+        if not pacientes_repository.get_by_id(db, data.id_paciente):
+            raise HTTPException(status_code=404, detail="Paciente no encontrado")
+        if data.id_doctor and not doctores_repository.get_by_id(db, data.id_doctor):
+            raise HTTPException(status_code=404, detail="Doctor no encontrado")
+        if data.id_especialidad and not doctores_repository.get_especialidad_by_id(db, data.id_especialidad):
+            raise HTTPException(status_code=404, detail="La especialidad especificada no existe")
+        return lista_espera_repository.create(db, data)
+
+    @staticmethod
+    def obtener(db: Session, entrada_id: int) -> ListaEspera:
+        """Obtiene una solicitud de la lista de espera"""
+        entrada = lista_espera_repository.get_by_id(db, entrada_id)
+        if not entrada:
+            raise HTTPException(status_code=404, detail="Solicitud de lista de espera no encontrada")
+        return entrada
+
+    @staticmethod
+    def cancelar(db: Session, entrada_id: int) -> ListaEspera:
+        """Retira una solicitud de la lista de espera"""
+        entrada = ListaEsperaService.obtener(db, entrada_id)
+        if entrada.estado in ('asignada', 'cancelada'):
+            raise HTTPException(status_code=400, detail=f"La solicitud ya está {entrada.estado}")
+        return lista_espera_repository.cancelar(db, entrada)
+
+    @staticmethod
+    def aceptar_oferta(db: Session, entrada_id: int) -> ListaEspera:
+        """
+        Agenda la cita del slot ofrecido a una solicitud.
+
+        Raises:
+            HTTPException: Si la solicitud no tiene una oferta pendiente, la oferta venció
+                o el slot ya fue ocupado
+        """
+        entrada = ListaEsperaService.obtener(db, entrada_id)
+        if entrada.estado != 'ofrecida':
+            raise HTTPException(status_code=400, detail="La solicitud no tiene una oferta pendiente")
+        if entrada.oferta_expira and entrada.oferta_expira <= datetime.now():
+            raise HTTPException(status_code=409, detail="La oferta venció")
+        cita = ListaEsperaService._agendar(db, entrada, entrada.oferta_id_doctor, entrada.oferta_fecha, entrada.oferta_hora)
+        if not cita:
+            lista_espera_repository.reactivar(db, entrada)
+            raise HTTPException(status_code=409, detail="El horario ofrecido ya no está disponible")
+        return lista_espera_repository.asignar(db, entrada, cita)
+
+    @staticmethod
+    def rechazar_oferta(db: Session, entrada_id: int) -> ListaEspera:
+        """
+        Rechaza el slot ofrecido. La solicitud sigue en la cola y el slot se ofrece a la
+        siguiente con vencer_ofertas().
+
+        Raises:
+            HTTPException: Si la solicitud no tiene una oferta pendiente
+        """
+        entrada = ListaEsperaService.obtener(db, entrada_id)
+        if entrada.estado != 'ofrecida':
+            raise HTTPException(status_code=400, detail="La solicitud no tiene una oferta pendiente")
+        return lista_espera_repository.rechazar(db, entrada)
+
+    @staticmethod
+    def _agendar(db: Session, entrada: ListaEspera, doctor_id: int, fecha: date, hora: time):
+        """Agenda la cita de una solicitud; retorna None si no se pudo (slot ocupado, conflicto del paciente)"""
+        try:
+            return CitaService.crear_cita(db, CitaCreate(
+                id_paciente=entrada.id_paciente,
+                id_doctor=doctor_id,
+                fecha=fecha,
+                hora=hora,
+                motivo=entrada.motivo,
+                observaciones="Agendada desde lista de espera"
+            ))
+        except (HTTPException, ValueError):
+            return None
+
+    @staticmethod
+    def _notificar(entrada: ListaEspera) -> None:
+        """Avisa al paciente del slot que se le ofreció o de la cita que se le agendó"""
+        slot = f"{entrada.oferta_fecha} a las {entrada.oferta_hora:%H:%M}"
+        if entrada.estado == 'asignada':
+            asunto = "Cita agendada desde la lista de espera"
+            mensaje = f"Se liberó un horario y le agendamos su cita para el {slot}."
+        else:
+            asunto = "Hay un horario disponible para usted"
+            mensaje = (
+                f"Se liberó un horario el {slot}. Puede aceptarlo o rechazarlo hasta el "
+                f"{entrada.oferta_expira:%Y-%m-%d %H:%M}; después se ofrecerá a otro paciente."
+            )
+        NotificacionService.enviar(entrada.paciente.correo if entrada.paciente else None, asunto, mensaje)
+
+    @staticmethod
+    def _reasignar(db: Session, doctor_id: int, fecha: date, hora: time) -> Optional[ListaEspera]:
+        """
+        Ofrece un slot libre a la solicitud en espera más antigua que lo acepte, o agenda
+        la cita directamente si la solicitud lo permite. Si no se puede agendar con una
+        solicitud (p. ej. el paciente ya tiene otra cita a esa hora) se pasa a la siguiente.
+        """
+        if datetime.combine(fecha, hora) <= datetime.now():
+            return None
+        # El slot ya espera la respuesta de otra solicitud: no se ofrece dos veces
+        if lista_espera_repository.hay_oferta_vigente(db, doctor_id, fecha, hora, datetime.now()):
+            return None
+        doctor = doctores_repository.get_by_id(db, doctor_id)
+        if not doctor:
+            return None
+
+        descartadas = []
+        while True:
+            # El slot pudo ocuparse (o la cita reactivarse) antes de ejecutar la tarea
+            if (doctor_id, fecha, hora) in citas_repository.get_horas_ocupadas(db, [doctor_id], fecha, fecha):
+                return None
+
+            entrada = lista_espera_repository.buscar_candidata(
+                db, doctor_id, doctor.id_especialidad, fecha, hora, descartadas
+            )
+            if not entrada:
+                return None
+
+            if not entrada.agendar_automatico:
+                expira = min(datetime.now() + timedelta(hours=OFERTA_VIGENCIA_HORAS), datetime.combine(fecha, hora))
+                entrada = lista_espera_repository.ofrecer(db, entrada, doctor_id, fecha, hora, expira)
+                ListaEsperaService._notificar(entrada)
+                return entrada
+
+            cita = ListaEsperaService._agendar(db, entrada, doctor_id, fecha, hora)
+            if cita:
+                entrada = lista_espera_repository.asignar(db, entrada, cita)
+                ListaEsperaService._notificar(entrada)
+                return entrada
+            descartadas.append(entrada.id_lista_espera)
+
+    @staticmethod
+    def procesar_slot_liberado(
+        sesiones: Callable[[], Session],
+        doctor_id: int,
+        fecha: date,
+        hora: time
+    ) -> Optional[ListaEspera]:
+        """
+        Reasigna un slot liberado a la lista de espera (ver _reasignar).
+
+        Se ejecuta fuera del ciclo de la petición (BackgroundTasks), por lo que abre
+        su propia sesión con la fábrica recibida (dependencia get_session_factory).
+        """
+        db = sesiones()
+        try:
+            return ListaEsperaService._reasignar(db, doctor_id, fecha, hora)
+        except Exception:
+            logger.exception("Error al reasignar el slot liberado del doctor %s (%s %s)", doctor_id, fecha, hora)
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def vencer_ofertas(sesiones: Callable[[], Session]) -> int:
+        """
+        Devuelve a la cola las solicitudes cuya oferta venció o fue rechazada y ofrece
+        cada slot a la siguiente solicitud. Se ejecuta después de rechazar una oferta y
+        periódicamente con python -m app.cli.vencer_ofertas.
+
+        Returns:
+            Número de ofertas vencidas procesadas
+        """
+        db = sesiones()
+        try:
+            slots = lista_espera_repository.reactivar_vencidas(db, datetime.now())
+            for doctor_id, fecha, hora in slots:
+                try:
+                    ListaEsperaService._reasignar(db, doctor_id, fecha, hora)
+                except Exception:
+                    logger.exception("Error al reasignar el slot vencido del doctor %s (%s %s)", doctor_id, fecha, hora)
+                    db.rollback()
+            return len(slots)
+        finally:
+            db.close()
@@ -0,0 +1,57 @@
+"""
+Servicio de notificaciones por correo electrónico.
+
+Si SMTP_HOST no está configurado los mensajes solo se registran en el log, de modo
+que el resto de la aplicación funciona igual en desarrollo.
+"""
+import logging
+import os
+import smtplib
+from email.message import EmailMessage
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_REMITENTE = os.getenv("SMTP_REMITENTE", "no-responder@clinica.com")
+
+# Segundos máximos de espera al servidor SMTP
+SMTP_TIMEOUT = 10
+
+class NotificacionService:
+    """Envío de avisos a pacientes"""
+
+    @staticmethod
+    def enviar(destinatario: Optional[str], asunto: str, mensaje: str) -> bool:
+        """
+        Envía un correo. Los errores se registran y no se propagan: una notificación
+        fallida no debe deshacer la operación que la originó.
+
+        Returns:
+            True si el correo se entregó al servidor SMTP
+        """
+        if not destinatario:
+            logger.warning("Notificación sin destinatario: %s", asunto)
+            return False
+        if not SMTP_HOST:
+            logger.info("Notificación para %s (SMTP no configurado): %s\n%s", destinatario, asunto, mensaje)
+            return False
+
+        correo = EmailMessage()
+        correo["From"] = SMTP_REMITENTE
+        correo["To"] = destinatario
+        correo["Subject"] = asunto
+        correo.set_content(mensaje)
+        try:
+            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT) as servidor:
+                servidor.starttls()
+                if SMTP_USER:
+                    servidor.login(SMTP_USER, SMTP_PASSWORD)
+                servidor.send_message(correo)
+            return True
+        except Exception:
+            logger.exception("No se pudo enviar la notificación a %s", destinatario)
+            return False
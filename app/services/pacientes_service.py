@@ -3,9 +3,11 @@ Servicio de lógica de negocio para Pacientes
 """
 from sqlalchemy.orm import Session
 from app.repositories import pacientes_repository
+from app.repositories.indice_pacientes import tokenizar
 from app.schemas.paciente import PacienteCreate, PacienteUpdate
 from app.models.paciente import Paciente
 from app.models.usuario import Usuario
+from app.utils.proyeccion import Proyeccion
 from typing import Optional, List
 from fastapi import HTTPException
 from passlib.context import CryptContext
@@ -76,6 +78,7 @@ class PacienteService:
             # Si falla la creación del usuario, eliminar el paciente creado
             db.delete(paciente)
             db.commit()
+            pacientes_repository.invalidar_cache(paciente.id_paciente)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error al crear el usuario: {str(e)}"
@@ -84,13 +87,14 @@ class PacienteService:
         return paciente
     
     @staticmethod
-    def obtener_paciente_por_id(db: Session, paciente_id: int) -> Optional[Paciente]:
+    def obtener_paciente_por_id(db: Session, paciente_id: int, proyeccion: Optional[Proyeccion] = None) -> Optional[Paciente]:
         """
         Obtiene un paciente por su ID.
         
         Args:
             db: Sesión de base de datos
             paciente_id: ID del paciente
+            proyeccion: Campos y relaciones pedidos con fields/expand
             
         Returns:
             Paciente encontrado o None
@@ -98,7 +102,7 @@ class PacienteService:
         Raises:
             HTTPException: Si el paciente no existe
         """
-        paciente = pacientes_repository.get_by_id(db, paciente_id)
+        paciente = pacientes_repository.get_by_id(db, paciente_id, proyeccion)
         if not paciente:
             raise HTTPException(
                 status_code=404,
@@ -107,19 +111,50 @@ class PacienteService:
         return paciente
     
     @staticmethod
-    def obtener_todos_pacientes(db: Session, skip: int = 0, limit: int = 100) -> List[Paciente]:
+    def obtener_todos_pacientes(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        proyeccion: Optional[Proyeccion] = None
+    ) -> List[Paciente]:
         """
         Obtiene lista de pacientes con paginación.
         
         Args:
             db: Sesión de base de datos
-            skip: Número de registros a saltar
+            skip: Número de registros a saltar (si no se usa cursor)
             limit: Límite de registros a retornar
+            cursor: Cursor de la página anterior
+            proyeccion: Campos y relaciones pedidos con fields/expand
             
         Returns:
             Lista de pacientes
         """
-        return pacientes_repository.get_all(db, skip, limit)
+        return pacientes_repository.get_all(db, skip, limit, cursor, proyeccion)
+    
+    @staticmethod
+    def buscar_pacientes(db: Session, texto: str, limit: int = 20) -> List[Paciente]:
+        """
+        Busca pacientes por prefijo de nombre, apellido, documento o correo.
+        
+        Args:
+            db: Sesión de base de datos
+            texto: Texto escrito por el usuario
+            limit: Límite de registros a retornar
+            
+        Returns:
+            Lista de pacientes ordenada por relevancia
+            
+        Raises:
+            HTTPException: Si el texto no contiene letras ni números
+        """
+        if not tokenizar(texto):
+            raise HTTPException(
+                status_code=400,
+                detail="La búsqueda debe contener letras o números"
+            )
+        return pacientes_repository.buscar(db, texto, limit)
     
     @staticmethod
     def actualizar_paciente(db: Session, paciente_id: int, paciente_data: PacienteUpdate) -> Paciente:
@@ -0,0 +1,507 @@
+"""
+Servicio de reportes y estadísticas agregadas
+"""
+import numpy as np
+from sqlalchemy.orm import Session
+from app.repositories import reportes_repository
+from app.models.cita import EstadoCita
+from app.services.disponibilidad_service import DIAS_SEMANA, DURACION_SLOT_DEFECTO
+from app.cache import cache
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+
+# Segundos que un reporte permanece en caché. Las escrituras de citas y facturas lo
+# invalidan antes; el límite acota cambios que no lo invalidan (p. ej. nombres de doctores
+# o una reconstrucción de estadistica_diaria desde otro proceso).
+REPORTES_TTL = 300
+
+# Máximo de días que abarca un reporte
+MAX_DIAS_REPORTE = 366
+
+# Periodos y agrupaciones del reporte de ingresos
+PERIODOS = ("dia", "semana", "mes")
+AGRUPACIONES = ("metodo_pago", "especialidad")
+ESTADOS_FACTURA = ("pagada", "pendiente", "anulada")
+
+# Agrupaciones del reporte de cancelación e inasistencia
+AGRUPACIONES_TASAS = ("doctor", "especialidad", "dia_semana", "anticipacion")
+
+# Nombres de los tramos de estadisticas_repository.TRAMOS_ANTICIPACION
+NOMBRES_ANTICIPACION = ("Mismo día", "1 día", "2 a 7 días", "8 a 14 días", "15 a 30 días", "31 días o más")
+
+# Máximo de periodos por consulta de ingresos
+MAX_PERIODOS = 366
+
+# Segundos que se guarda el periodo en curso
+INGRESOS_ABIERTO_TTL = 60
+
+# Segundos que se guarda un periodo cerrado. Solo cambia si se actualiza una factura
+# emitida en él, y eso lo invalida; el límite acota lo que no pasa por esa invalidación
+# (nombres de métodos de pago o especialidades, escrituras desde otro proceso).
+INGRESOS_CERRADO_TTL = 3600
+
+
+def _meses(fecha_desde: date, fecha_hasta: date) -> List[str]:
+    """Meses (YYYY-MM) que toca el rango, para las etiquetas de invalidación"""
+    meses = []
+    anio, mes = fecha_desde.year, fecha_desde.month
+    while (anio, mes) <= (fecha_hasta.year, fecha_hasta.month):
+        meses.append(f"{anio:04d}-{mes:02d}")
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+def _cacheado(reporte: str, rango: Tuple[date, date], etiquetas: List[str], calcular: Callable[[], object]):
+    """Obtiene el reporte de la caché o lo calcula y lo guarda por (reporte, rango)"""
+    clave = f"reporte:{reporte}:{rango[0]}:{rango[1]}"
+    resultado = cache.obtener(clave)
+    if resultado is None:
+        marca = cache.marca()
+        resultado = calcular()
+        cache.guardar(clave, resultado, etiquetas=etiquetas, ttl=REPORTES_TTL, marca=marca)
+    return resultado
+
+def _etiquetas(fecha_desde: date, fecha_hasta: date) -> List[str]:
+    return [f"reportes:{mes}" for mes in _meses(fecha_desde, fecha_hasta)]
+
+def _inicio_periodo(fecha: date, periodo: str) -> date:
+    if periodo == "semana":
+        return fecha - timedelta(days=fecha.weekday())
+    if periodo == "mes":
+        return fecha.replace(day=1)
+    return fecha
+
+def _fin_periodo(inicio: date, periodo: str) -> date:
+    if periodo == "semana":
+        return inicio + timedelta(days=6)
+    if periodo == "mes":
+        return (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return inicio
+
+def _a_fecha(valor) -> date:
+    """DATE() retorna date en MySQL y texto en SQLite"""
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor))
+
+def _montos(por_estado: Dict[str, list]) -> dict:
+    """Serializa cantidades y montos por estado; los montos van como texto para no perder precisión"""
+    resultado = {
+        estado: {"cantidad": cantidad, "monto": str(monto.quantize(Decimal("0.01")))}
+        for estado, (cantidad, monto) in por_estado.items()
+    }
+    resultado["facturado"] = str((por_estado["pagada"][1] + por_estado["pendiente"][1]).quantize(Decimal("0.01")))
+    return resultado
+
+def _vacio() -> Dict[str, list]:
+    return {estado: [0, Decimal(0)] for estado in ESTADOS_FACTURA}
+
+def _sumar(destino: Dict[str, list], origen: dict) -> None:
+    """Suma a destino los montos serializados de un periodo"""
+    for estado in ESTADOS_FACTURA:
+        destino[estado][0] += origen[estado]["cantidad"]
+        destino[estado][1] += Decimal(origen[estado]["monto"])
+
+def _columnas(filas: list, cantidad: int) -> tuple:
+    """Transpone las filas de una consulta en una tupla de columnas"""
+    return tuple(zip(*filas)) if filas else ((),) * cantidad
+
+def cargar_ocupacion(db: Session, fecha_desde: date, fecha_hasta: date) -> Tuple[List[tuple], Dict[str, np.ndarray]]:
+    """
+    Lee las columnas mínimas del reporte de ocupación y las convierte en arreglos.
+
+    Returns:
+        Tupla (doctores, datos): los doctores activos ordenados por id y un diccionario
+        de arreglos con los bloques de horario (bloque_doctor, bloque_dia, bloque_minutos)
+        y las citas reservadas por día (reserva_doctor, reserva_dia, reserva_citas),
+        donde reserva_dia es el número de días desde fecha_desde
+    """
+    doctores = reportes_repository.doctores_activos(db)
+    id_doctor, dia_semana, hora_inicio, hora_fin = _columnas(reportes_repository.bloques_horario(db), 4)
+    reserva_doctor, fecha, citas = _columnas(
+        reportes_repository.citas_reservadas_por_dia(db, fecha_desde, fecha_hasta), 3
+    )
+
+    inicio = np.array([h.hour * 60 + h.minute for h in hora_inicio], dtype=np.int64)
+    fin = np.array([h.hour * 60 + h.minute for h in hora_fin], dtype=np.int64)
+    datos = {
+        "id_doctores": np.array([d[0] for d in doctores], dtype=np.int64),
+        "bloque_doctor": np.array(id_doctor, dtype=np.int64),
+        "bloque_dia": np.array([DIAS_SEMANA.index(d) for d in dia_semana], dtype=np.int64),
+        "bloque_minutos": fin - inicio,
+        "reserva_doctor": np.array(reserva_doctor, dtype=np.int64),
+        "reserva_dia": (np.array(fecha, dtype="datetime64[D]") - np.datetime64(fecha_desde, "D")).astype(np.int64),
+        "reserva_citas": np.array(citas, dtype=np.int64)
+    }
+    return doctores, datos
+
+def _filas(ids: np.ndarray, valores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Posición de cada valor en ids (ordenado) y máscara de los valores que están en ids"""
+    fila = np.searchsorted(ids, valores)
+    valido = fila < len(ids)
+    valido[valido] = ids[fila[valido]] == valores[valido]
+    return fila, valido
+
+def _acumular(filas: int, columnas: int, fila: np.ndarray, columna: np.ndarray, valores: np.ndarray) -> np.ndarray:
+    """Matriz filas x columnas con la suma de los valores de cada celda (fila, columna)"""
+    suma = np.bincount(fila * columnas + columna, weights=valores, minlength=filas * columnas)
+    return suma.astype(np.int64).reshape(filas, columnas)
+
+def calcular_ocupacion(
+    fecha_desde: date,
+    fecha_hasta: date,
+    datos: Dict[str, np.ndarray],
+    duracion: int = DURACION_SLOT_DEFECTO
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Minutos programados y reservados por doctor y semana, con operaciones sobre arreglos.
+
+    Los bloques semanales de horario se expanden a una grilla doctores x días del rango
+    y las citas se suman en la misma grilla; luego ambas se reducen por semana (lunes a
+    domingo, recortadas al rango). Cada cita ocupa `duracion` minutos.
+
+    Returns:
+        Tupla (inicios, programados, reservados): el día (desde fecha_desde) en que empieza
+        cada semana y dos matrices de minutos de forma (doctores, semanas)
+    """
+    ids = datos["id_doctores"]
+    dias = (fecha_hasta - fecha_desde).days + 1
+
+    # Semana tipo: minutos de atención de cada doctor por día de la semana
+    fila, valido = _filas(ids, datos["bloque_doctor"])
+    semanal = _acumular(len(ids), 7, fila[valido], datos["bloque_dia"][valido], datos["bloque_minutos"][valido])
+
+    dia_semana = (fecha_desde.weekday() + np.arange(dias)) % 7
+    programados = semanal[:, dia_semana]
+
+    dia = datos["reserva_dia"]
+    fila, valido = _filas(ids, datos["reserva_doctor"])
+    valido &= (dia >= 0) & (dia < dias)
+    reservados = _acumular(len(ids), dias, fila[valido], dia[valido], datos["reserva_citas"][valido] * duracion)
+
+    inicios = np.flatnonzero((dia_semana == 0) | (np.arange(dias) == 0))
+    return inicios, np.add.reduceat(programados, inicios, axis=1), np.add.reduceat(reservados, inicios, axis=1)
+
+def _proporcion(reservados: np.ndarray, programados: np.ndarray) -> list:
+    """reservados / programados redondeado, con None donde no hay minutos programados"""
+    proporcion = np.divide(
+        reservados, programados,
+        out=np.full(np.shape(reservados), np.nan),
+        where=np.asarray(programados) > 0
+    )
+    return np.where(np.isnan(proporcion), None, np.round(proporcion, 4)).tolist()
+
+def _tasa(parte: int, total: int) -> Optional[float]:
+    return round(parte / total, 4) if total else None
+
+def _tasas(citas: int, canceladas: int, completadas: int, no_asistidas: int) -> dict:
+    """Conteos y tasas de cancelación (sobre todas) e inasistencia (sobre las pasadas no canceladas)"""
+    return {
+        "citas": citas,
+        "canceladas": canceladas,
+        "completadas": completadas,
+        "no_asistidas": no_asistidas,
+        "tasa_cancelacion": _tasa(canceladas, citas),
+        "tasa_inasistencia": _tasa(no_asistidas, completadas + no_asistidas)
+    }
+
+
+class ReportesService:
+    """Servicio de reportes calculados en la base de datos con GROUP BY"""
+
+    @staticmethod
+    def validar_rango(fecha_desde: date, fecha_hasta: date) -> Tuple[date, date]:
+        """Valida que el rango de fechas sea coherente y no demasiado largo"""
+        if fecha_hasta < fecha_desde:
+            raise HTTPException(status_code=400, detail="La fecha final no puede ser anterior a la fecha inicial")
+        if (fecha_hasta - fecha_desde).days + 1 > MAX_DIAS_REPORTE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El rango de fechas no puede superar {MAX_DIAS_REPORTE} días"
+            )
+        return fecha_desde, fecha_hasta
+
+    @staticmethod
+    def citas_por_estado(db: Session, fecha_desde: date, fecha_hasta: date) -> dict:
+        """Total de citas del rango por estado (incluye los estados sin citas)"""
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+
+        def calcular():
+            totales = dict(reportes_repository.citas_por_estado(db, *rango))
+            return {e.value: totales.get(e.value, 0) for e in EstadoCita}
+
+        return _cacheado("estados", rango, _etiquetas(*rango), calcular)
+
+    @staticmethod
+    def citas_por_especialidad(db: Session, fecha_desde: date, fecha_hasta: date) -> List[dict]:
+        """Total de citas del rango por especialidad, de mayor a menor"""
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+
+        def calcular():
+            return [
+                {"id_especialidad": id_especialidad, "especialidad": nombre, "total": total}
+                for id_especialidad, nombre, total in reportes_repository.citas_por_especialidad(db, *rango)
+            ]
+
+        return _cacheado("especialidades", rango, _etiquetas(*rango), calcular)
+
+    @staticmethod
+    def tendencia(db: Session, fecha_desde: date, fecha_hasta: date) -> List[dict]:
+        """Total de citas por día del rango, con los días sin citas en cero"""
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+
+        def calcular():
+            totales = dict(reportes_repository.citas_por_dia(db, *rango))
+            dias = (rango[1] - rango[0]).days + 1
+            return [
+                {"fecha": str(fecha), "total": totales.get(fecha, 0)}
+                for fecha in (rango[0] + timedelta(days=i) for i in range(dias))
+            ]
+
+        return _cacheado("tendencia", rango, _etiquetas(*rango), calcular)
+
+    @staticmethod
+    def top_doctores(db: Session, fecha_desde: date, fecha_hasta: date, limite: int = 5) -> List[dict]:
+        """Doctores con más citas en el rango"""
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+
+        def calcular():
+            return [
+                {
+                    "id_doctor": id_doctor,
+                    "doctor": f"{nombre} {apellido}",
+                    "especialidad": especialidad,
+                    "total": total
+                }
+                for id_doctor, nombre, apellido, especialidad, total
+                in reportes_repository.top_doctores(db, *rango, limite)
+            ]
+
+        return _cacheado(f"top_doctores:{limite}", rango, _etiquetas(*rango), calcular)
+
+    @staticmethod
+    def ingresos(db: Session, fecha_desde: date, fecha_hasta: date) -> dict:
+        """Montos facturados (sin anuladas), pagados y pendientes de las citas del rango"""
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+
+        def calcular():
+            facturado, pagado = reportes_repository.montos(db, *rango)
+            facturado, pagado = facturado or 0, pagado or 0
+            return {
+                "facturado": float(facturado),
+                "pagado": float(pagado),
+                "pendiente": float(facturado - pagado)
+            }
+
+        return _cacheado("ingresos", rango, _etiquetas(*rango), calcular)
+
+    @staticmethod
+    def resumen(db: Session, fecha_desde: date, fecha_hasta: date) -> dict:
+        """Cifras principales del periodo: citas, completadas, ingresos pagados y doctores activos"""
+        estados = ReportesService.citas_por_estado(db, fecha_desde, fecha_hasta)
+        ingresos = ReportesService.ingresos(db, fecha_desde, fecha_hasta)
+
+        doctores_activos = cache.obtener("reporte:doctores_activos")
+        if doctores_activos is None:
+            marca = cache.marca()
+            doctores_activos = reportes_repository.contar_doctores_activos(db)
+            cache.guardar(
+                "reporte:doctores_activos", doctores_activos,
+                etiquetas=("doctores",), ttl=REPORTES_TTL, marca=marca
+            )
+
+        return {
+            "total_citas": sum(estados.values()),
+            "completadas": estados[EstadoCita.COMPLETADA.value],
+            "ingresos_pagados": ingresos["pagado"],
+            "doctores_activos": doctores_activos
+        }
+
+    @staticmethod
+    def ingresos_por_periodo(
+        db: Session,
+        fecha_desde: date,
+        fecha_hasta: date,
+        periodo: str = "mes",
+        agrupar: Optional[str] = None
+    ) -> dict:
+        """
+        Ingresos de las facturas por periodo de emisión (día, semana o mes), separados
+        por estado y opcionalmente por método de pago o especialidad.
+
+        El rango se amplía a periodos completos. Las sumas se hacen en SQL sobre DECIMAL
+        y se acumulan con Decimal. Cada periodo se guarda en caché por separado, así
+        que solo se consultan los periodos que no estén ya calculados; los cerrados
+        se conservan hasta que cambie una factura emitida en ellos o venza
+        INGRESOS_CERRADO_TTL.
+
+        Raises:
+            HTTPException: Si el periodo, la agrupación o el rango no son válidos
+        """
+        if periodo not in PERIODOS:
+            raise HTTPException(status_code=400, detail="Periodo no válido. Use dia, semana o mes")
+        if agrupar is not None and agrupar not in AGRUPACIONES:
+            raise HTTPException(status_code=400, detail="Agrupación no válida. Use metodo_pago o especialidad")
+        if fecha_hasta < fecha_desde:
+            raise HTTPException(status_code=400, detail="La fecha final no puede ser anterior a la fecha inicial")
+
+        inicios = [_inicio_periodo(fecha_desde, periodo)]
+        while _fin_periodo(inicios[-1], periodo) < fecha_hasta:
+            inicios.append(_fin_periodo(inicios[-1], periodo) + timedelta(days=1))
+            if len(inicios) > MAX_PERIODOS:
+                raise HTTPException(status_code=400, detail=f"El rango no puede superar {MAX_PERIODOS} periodos")
+
+        def clave(inicio: date) -> str:
+            return f"ingresos:{periodo}:{agrupar}:{inicio}"
+
+        periodos = {inicio: cache.obtener(clave(inicio)) for inicio in inicios}
+        faltantes = [inicio for inicio, valor in periodos.items() if valor is None]
+
+        if faltantes:
+            marca = cache.marca()
+            grupos = {inicio: {} for inicio in faltantes}
+            filas = reportes_repository.facturas_por_dia(
+                db, faltantes[0], _fin_periodo(faltantes[-1], periodo), agrupar
+            )
+            for dia, id_grupo, nombre, estado, cantidad, monto in filas:
+                inicio = _inicio_periodo(_a_fecha(dia), periodo)
+                if inicio not in grupos:
+                    continue
+                grupo = grupos[inicio].setdefault(id_grupo, (nombre, _vacio()))
+                grupo[1][estado][0] += cantidad
+                grupo[1][estado][1] += monto or 0
+
+            hoy = date.today()
+            for inicio in faltantes:
+                fin = _fin_periodo(inicio, periodo)
+                total = _vacio()
+                for _, por_estado in grupos[inicio].values():
+                    for estado in ESTADOS_FACTURA:
+                        total[estado][0] += por_estado[estado][0]
+                        total[estado][1] += por_estado[estado][1]
+
+                valor = {"inicio": str(inicio), "fin": str(fin), **_montos(total)}
+                if agrupar:
+                    valor["grupos"] = sorted(
+                        ({"id": id_grupo, "nombre": nombre, **_montos(por_estado)}
+                         for id_grupo, (nombre, por_estado) in grupos[inicio].items()),
+                        key=lambda g: g["nombre"]
+                    )
+                periodos[inicio] = valor
+                cache.guardar(
+                    clave(inicio),
+                    valor,
+                    etiquetas=[f"facturas:{mes}" for mes in _meses(inicio, fin)],
+                    ttl=INGRESOS_CERRADO_TTL if fin < hoy else INGRESOS_ABIERTO_TTL,
+                    marca=marca
+                )
+
+        total = _vacio()
+        for valor in periodos.values():
+            _sumar(total, valor)
+
+        return {
+            "periodo": periodo,
+            "agrupar": agrupar,
+            "total": _montos(total),
+            "periodos": [periodos[inicio] for inicio in inicios]
+        }
+
+    @staticmethod
+    def ocupacion(db: Session, fecha_desde: date, fecha_hasta: date) -> dict:
+        """
+        Ocupación de los doctores activos: minutos reservados sobre minutos programados
+        en su horario, por semana y en el total del rango.
+
+        Se usa el horario vigente para todo el rango y las citas no canceladas de
+        estadistica_diaria; cada cita cuenta como un slot de DURACION_SLOT_DEFECTO minutos.
+        """
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+
+        def calcular():
+            doctores, datos = cargar_ocupacion(db, *rango)
+            inicios, programados, reservados = calcular_ocupacion(*rango, datos)
+            fines = np.append(inicios[1:] - 1, (rango[1] - rango[0]).days)
+            por_doctor = _proporcion(reservados, programados)
+            total_programados, total_reservados = programados.sum(axis=1), reservados.sum(axis=1)
+            totales = _proporcion(total_reservados, total_programados)
+
+            return {
+                "semanas": [
+                    {"inicio": str(rango[0] + timedelta(days=i)), "fin": str(rango[0] + timedelta(days=f))}
+                    for i, f in zip(inicios.tolist(), fines.tolist())
+                ],
+                "doctores": [
+                    {
+                        "id_doctor": id_doctor,
+                        "doctor": f"{nombre} {apellido}",
+                        "especialidad": especialidad,
+                        "minutos_programados": programado,
+                        "minutos_reservados": reservado,
+                        "ocupacion": total,
+                        "ocupacion_semanal": semanal
+                    }
+                    for (id_doctor, nombre, apellido, especialidad), programado, reservado, total, semanal
+                    in zip(doctores, total_programados.tolist(), total_reservados.tolist(), totales, por_doctor)
+                ],
+                "total": {
+                    "minutos_programados": int(programados.sum()),
+                    "minutos_reservados": int(reservados.sum()),
+                    "ocupacion": _proporcion(reservados.sum(), programados.sum()),
+                    "ocupacion_semanal": _proporcion(reservados.sum(axis=0), programados.sum(axis=0))
+                }
+            }
+
+        return _cacheado("ocupacion", rango, _etiquetas(*rango) + ["doctores"], calcular)
+
+    @staticmethod
+    def tasas_cancelacion(db: Session, fecha_desde: date, fecha_hasta: date, por: str = "doctor") -> dict:
+        """
+        Tasas de cancelación e inasistencia de las citas del rango por doctor,
+        especialidad, día de la semana o anticipación con que se registraron.
+
+        Una cita es inasistencia si su fecha ya pasó y sigue pendiente o confirmada.
+        Se calcula sobre estadistica_anticipacion, no sobre cita_medica.
+
+        Raises:
+            HTTPException: Si la agrupación o el rango no son válidos
+        """
+        if por not in AGRUPACIONES_TASAS:
+            raise HTTPException(
+                status_code=400,
+                detail="Agrupación no válida. Use doctor, especialidad, dia_semana o anticipacion"
+            )
+        rango = ReportesService.validar_rango(fecha_desde, fecha_hasta)
+        hoy = date.today()
+
+        def calcular():
+            grupos = {}
+            for id_grupo, nombre, estado, pasada, total in reportes_repository.citas_por_grupo_y_estado(
+                db, *rango, hoy, por
+            ):
+                if por == "dia_semana":
+                    id_grupo = _a_fecha(id_grupo).weekday()
+                    nombre = DIAS_SEMANA[id_grupo]
+                elif por == "anticipacion":
+                    nombre = NOMBRES_ANTICIPACION[id_grupo]
+                conteo = grupos.setdefault(id_grupo, [nombre, 0, 0, 0, 0])
+                conteo[1] += total
+                if estado == EstadoCita.CANCELADA.value:
+                    conteo[2] += total
+                elif estado == EstadoCita.COMPLETADA.value:
+                    conteo[3] += total
+                elif pasada:
+                    conteo[4] += total
+
+            filas = [{"id": id_grupo, "nombre": conteo[0], **_tasas(*conteo[1:])} for id_grupo, conteo in grupos.items()]
+            if por in ("dia_semana", "anticipacion"):
+                filas.sort(key=lambda f: f["id"])
+            else:
+                filas.sort(key=lambda f: (-f["citas"], f["nombre"]))
+
+            return {
+                "por": por,
+                "grupos": filas,
+                "total": _tasas(*(sum(conteo[i] for conteo in grupos.values()) for i in range(1, 5)))
+            }
+
+        return _cacheado(f"tasas:{por}:{hoy}", rango, _etiquetas(*rango), calcular)
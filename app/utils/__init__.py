@@ -0,0 +1,14 @@
+"""
+Utilidades compartidas por repositorios, servicios y routers
+"""
+from app.utils.paginacion import codificar_cursor, paginar, siguiente_cursor
+from app.utils.proyeccion import Proyeccion, aplicar_proyeccion, crear_proyeccion
+
+__all__ = [
+    "codificar_cursor",
+    "paginar",
+    "siguiente_cursor",
+    "Proyeccion",
+    "aplicar_proyeccion",
+    "crear_proyeccion"
+]
@@ -0,0 +1,82 @@
+"""
+Peticiones condicionales (ETag / If-None-Match) con respuesta 304
+"""
+import hashlib
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+
+# Cache-Control de las respuestas con datos de un usuario: el navegador puede guardarlas,
+# los proxies no, y siempre se revalidan con If-None-Match antes de usarlas
+CACHE_CONTROL_PRIVADO = "private, no-cache"
+
+
+def calcular_etag(*partes: Any) -> str:
+    """ETag fuerte (entre comillas) a partir de las partes que identifican la representación"""
+    huella = hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()[:20]
+    return f'"{huella}"'
+
+def no_modificado(request: Request, etag: str) -> bool:
+    """Indica si el ETag está en el If-None-Match de la petición (comparación débil, como indica HTTP)"""
+    cabecera = request.headers.get("if-none-match")
+    if not cabecera:
+        return False
+    etiquetas = [e.strip() for e in cabecera.split(",")]
+    return "*" in etiquetas or etag.removeprefix("W/") in (e.removeprefix("W/") for e in etiquetas)
+
+def cabeceras_etag(etag: str, cache_control: str = CACHE_CONTROL_PRIVADO) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+def respuesta_no_modificada(etag: str, cache_control: str = CACHE_CONTROL_PRIVADO) -> Response:
+    """Respuesta 304 sin cuerpo con las mismas cabeceras de caché que la respuesta completa"""
+    return Response(status_code=304, headers=cabeceras_etag(etag, cache_control))
+
+def version_entidad(db: Session, modelo, id_valor: Any, rutas: Sequence[Tuple[Any, ...]] = ()) -> Optional[tuple]:
+    """
+    Lee solo updated_at de una fila y de las filas relacionadas que incluye su respuesta,
+    sin cargar los objetos ni sus relaciones.
+
+    Args:
+        modelo: Modelo con columna updated_at y clave primaria simple
+        id_valor: Valor de la clave primaria
+        rutas: Rutas de relaciones incluidas en la respuesta, p. ej. (Doctor.especialidad,)
+
+    Returns:
+        Tupla de updated_at (la fila y luego cada relación, None si no tiene), o None si
+        la fila no existe
+    """
+    clave = modelo.__mapper__.primary_key[0]
+    consulta = select(modelo.updated_at).where(clave == id_valor)
+    for ruta in rutas:
+        origen = modelo
+        for relacion in ruta:
+            destino = aliased(relacion.property.mapper.class_)
+            consulta = consulta.outerjoin(destino, getattr(origen, relacion.key).of_type(destino))
+            origen = destino
+        consulta = consulta.add_columns(origen.updated_at)
+    return db.execute(consulta).first()
+
+def etag_entidad(
+    db: Session,
+    modelo,
+    id_valor: Any,
+    rutas: Sequence[Tuple[Any, ...]] = (),
+    variante: str = ""
+) -> Optional[str]:
+    """
+    ETag de la representación de una entidad, derivado de (tabla, id, updated_at) de la
+    fila y de sus relaciones incluidas. `variante` distingue representaciones distintas
+    de la misma fila (p. ej. ?fields= o ?expand=).
+
+    updated_at tiene resolución de segundos, así que dos cambios de la misma fila en el
+    mismo segundo comparten ETag.
+
+    Returns:
+        El ETag, o None si la fila no existe
+    """
+    version = version_entidad(db, modelo, id_valor, rutas)
+    if version is None:
+        return None
+    return calcular_etag(modelo.__tablename__, id_valor, *version, variante)
@@ -0,0 +1,102 @@
+"""
+Exportación de consultas completas como NDJSON o CSV en streaming
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.utils.proyeccion import serializar_valor
+
+# Tipos de contenido por formato de exportación
+FORMATOS_EXPORTACION = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+# Filas que se agrupan en cada fragmento de la respuesta
+FILAS_POR_FRAGMENTO = 200
+
+
+def _filas(sesiones: Callable[[], Session], consulta: Callable[[Session], Iterable[Any]]) -> Iterator[Any]:
+    """
+    Ejecuta la consulta con su propia sesión y la recorre fila a fila.
+
+    La respuesta se consume después de que termina la petición, así que no se
+    puede usar la sesión de get_db: se abre una con la fábrica recibida.
+    """
+    db = sesiones()
+    try:
+        yield from consulta(db)
+    finally:
+        db.close()
+
+def _fragmentos(lineas: Iterator[str]) -> Iterator[str]:
+    fragmento = []
+    for linea in lineas:
+        fragmento.append(linea)
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield "".join(fragmento)
+            fragmento.clear()
+    if fragmento:
+        yield "".join(fragmento)
+
+def generar_ndjson(filas: Iterable[Any], columnas: Sequence[str]) -> Iterator[str]:
+    """Genera un objeto JSON por línea para cada fila"""
+    for fila in filas:
+        yield json.dumps(
+            {c: serializar_valor(v) for c, v in zip(columnas, fila)},
+            ensure_ascii=False
+        ) + "\n"
+
+def generar_csv(filas: Iterable[Any], columnas: Sequence[str]) -> Iterator[str]:
+    """Genera la cabecera y una línea CSV por fila"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def linea(valores) -> str:
+        escritor.writerow(valores)
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto
+
+    yield linea(columnas)
+    for fila in filas:
+        yield linea([serializar_valor(v) for v in fila])
+
+def respuesta_exportacion(
+    sesiones: Callable[[], Session],
+    nombre: str,
+    formato: str,
+    columnas: Sequence[str],
+    consulta: Callable[[Session], Iterable[Any]]
+) -> StreamingResponse:
+    """
+    Construye la respuesta de una exportación.
+
+    Las filas se leen por lotes con un cursor del lado del servidor y se escriben a
+    medida que llegan, así que la memoria por petición no depende del tamaño de la tabla.
+
+    Args:
+        sesiones: Fábrica de sesiones (dependencia get_session_factory)
+        nombre: Nombre base del archivo descargado
+        formato: "ndjson" o "csv"
+        columnas: Nombres de las columnas, en el orden de las filas de la consulta
+        consulta: Función que recibe una sesión y retorna las filas a exportar
+
+    Raises:
+        HTTPException: Si el formato no es válido
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=400, detail="Formato no válido. Use ndjson o csv")
+    generador = generar_ndjson if formato == "ndjson" else generar_csv
+    return StreamingResponse(
+        _fragmentos(generador(_filas(sesiones, consulta), columnas)),
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'}
+    )
@@ -0,0 +1,89 @@
+"""
+Paginación por cursor (keyset) para los listados
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+def _convertir(columna, valor: Any) -> Any:
+    """Convierte un valor del cursor al tipo Python de la columna"""
+    tipo = columna.type.python_type
+    if tipo in (date, datetime, time):
+        return tipo.fromisoformat(valor)
+    return tipo(valor)
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """Codifica los valores de la clave de orden de la última fila como un cursor opaco"""
+    datos = json.dumps([_serializar(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str, columnas: Sequence) -> List[Any]:
+    """
+    Decodifica un cursor generado por codificar_cursor.
+
+    Raises:
+        HTTPException: Si el cursor no es válido para estas columnas
+    """
+    try:
+        datos = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(datos)
+        if not isinstance(valores, list) or len(valores) != len(columnas):
+            raise ValueError
+        return [_convertir(c, v) for c, v in zip(columnas, valores)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+def _posteriores(columnas: Sequence, valores: Sequence[Any]):
+    """
+    Condición "fila > cursor" para una clave de orden compuesta.
+
+    Se expande como (a > x) OR (a = x AND b > y) OR ... en lugar de comparar tuplas,
+    y se añade a >= x para que MySQL la resuelva con un rango sobre el índice.
+    """
+    alternativas = []
+    for i, columna in enumerate(columnas):
+        iguales = [columnas[j] == valores[j] for j in range(i)]
+        alternativas.append(and_(*iguales, columna > valores[i]))
+    if len(columnas) == 1:
+        return alternativas[0]
+    return and_(columnas[0] >= valores[0], or_(*alternativas))
+
+def paginar(query: Query, columnas: Sequence, cursor: Optional[str] = None, skip: int = 0, limit: int = 100) -> list:
+    """
+    Aplica orden, cursor y límite a una consulta.
+
+    Con cursor cada página es una búsqueda sobre el índice de la clave de orden,
+    sin importar cuán profunda sea. Sin cursor se mantiene OFFSET skip por
+    compatibilidad con los clientes existentes.
+
+    Args:
+        query: Consulta base
+        columnas: Columnas de la clave de orden; la última debe ser la clave primaria
+        cursor: Cursor opaco devuelto como next_cursor en la página anterior
+        skip: Registros a saltar cuando no se usa cursor
+        limit: Límite de registros a retornar
+    """
+    query = query.order_by(*columnas)
+    if cursor:
+        query = query.filter(_posteriores(columnas, decodificar_cursor(cursor, columnas)))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def siguiente_cursor(filas: list, columnas: Sequence, limit: int) -> Optional[str]:
+    """Cursor de la página siguiente, o None si esta página fue la última"""
+    if not filas or len(filas) < limit:
+        return None
+    ultima = filas[-1]
+    return codificar_cursor([getattr(ultima, c.key) for c in columnas])
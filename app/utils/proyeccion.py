@@ -0,0 +1,162 @@
+"""
+Selección de campos (?fields=) y expansión de relaciones (?expand=) en las respuestas
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+# Ruta de relaciones desde el modelo base hasta el objeto a expandir,
+# p. ej. (CitaMedica.doctor, Doctor.especialidad)
+RutaRelacion = Tuple[Any, ...]
+
+
+def _lista(valor: Optional[str]) -> List[str]:
+    if not valor:
+        return []
+    return list(dict.fromkeys(p.strip() for p in valor.split(",") if p.strip()))
+
+def serializar_valor(valor: Any) -> Any:
+    """Convierte un valor de columna igual que los to_dict() de los modelos"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime, time)):
+        return str(valor)
+    return valor
+
+
+class Proyeccion:
+    """
+    Campos y relaciones pedidos para un modelo.
+
+    Se traduce a opciones de carga de SQLAlchemy: load_only con las columnas
+    pedidas (más las claves que se necesitan internamente) y selectinload por
+    cada relación expandida, de modo que se lee exactamente lo que se retorna.
+    """
+
+    def __init__(self, modelo, campos: List[str], expandir: List[str], relaciones: Dict[str, RutaRelacion]):
+        self.modelo = modelo
+        self.campos = campos
+        self.expandir = expandir
+        self.relaciones = relaciones
+
+    def opciones(self, columnas_requeridas: Sequence = (), precargadas: Sequence = ()) -> list:
+        """
+        Opciones de carga para Query.options().
+
+        Args:
+            columnas_requeridas: Columnas que deben cargarse aunque no se retornen
+                (por ejemplo la clave de orden de la paginación por cursor)
+            precargadas: Relaciones que la consulta ya carga con joinedload; las
+                expansiones que pasan por ellas continúan desde ese join
+        """
+        opciones = []
+        if self.campos:
+            mapper = self.modelo.__mapper__
+            columnas = [getattr(self.modelo, c) for c in self.campos]
+            columnas += [getattr(self.modelo, c.key) for c in mapper.primary_key]
+            columnas += list(columnas_requeridas)
+            for nombre in self.expandir:
+                # La clave foránea de la primera relación es necesaria para cargarla
+                for columna in self.relaciones[nombre][0].property.local_columns:
+                    columnas.append(getattr(self.modelo, mapper.get_property_by_column(columna).key))
+            opciones.append(load_only(*dict.fromkeys(columnas)))
+        unidas = {r.property for r in precargadas}
+        for nombre in self.expandir:
+            ruta = self.relaciones[nombre]
+            carga = joinedload(ruta[0]) if ruta[0].property in unidas else selectinload(ruta[0])
+            for relacion in ruta[1:]:
+                carga = carga.selectinload(relacion)
+            opciones.append(carga)
+        return opciones
+
+    def rutas_incluidas(self, por_defecto: Sequence[RutaRelacion] = ()) -> List[RutaRelacion]:
+        """
+        Relaciones cuyos datos van en la respuesta: las expandidas y, si no se pidió
+        ?fields=, las que usa la representación por defecto del endpoint.
+        """
+        rutas = [] if self.campos else list(por_defecto)
+        return rutas + [self.relaciones[nombre] for nombre in self.expandir]
+
+    @property
+    def variante(self) -> str:
+        """Identifica la representación pedida, para distinguir sus ETag"""
+        return f"{','.join(self.campos)};{','.join(self.expandir)}"
+
+    def serializar(self, objeto, formato: Optional[Callable[[Any], dict]] = None) -> dict:
+        """
+        Construye la respuesta de un objeto.
+
+        Args:
+            objeto: Instancia del modelo
+            formato: Representación por defecto del endpoint; se usa cuando no se pidió
+                ?fields= (si no se indica, to_dict() del modelo)
+        """
+        if self.campos:
+            datos = {c: serializar_valor(getattr(objeto, c)) for c in self.campos}
+        else:
+            datos = formato(objeto) if formato else objeto.to_dict()
+        for nombre in self.expandir:
+            relacionado = objeto
+            for relacion in self.relaciones[nombre]:
+                relacionado = getattr(relacionado, relacion.key) if relacionado is not None else None
+            datos[nombre] = relacionado.to_dict() if relacionado is not None else None
+        return datos
+
+
+def crear_proyeccion(
+    modelo,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    relaciones: Optional[Dict[str, RutaRelacion]] = None
+) -> Proyeccion:
+    """
+    Valida los parámetros fields y expand de una petición.
+
+    Args:
+        modelo: Modelo SQLAlchemy del recurso
+        fields: Columnas separadas por coma; vacío retorna la representación por defecto
+        expand: Relaciones separadas por coma, entre las claves de relaciones
+        relaciones: Relaciones expandibles del recurso
+
+    Raises:
+        HTTPException: Si se pide un campo o relación que no existe
+    """
+    relaciones = relaciones or {}
+    permitidos = {
+        c.key for c in modelo.__mapper__.column_attrs
+        if all(col.computed is None for col in c.columns)
+    }
+
+    campos = _lista(fields)
+    invalidos = [c for c in campos if c not in permitidos]
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Campo no válido: {invalidos[0]}")
+
+    expandir = _lista(expand)
+    invalidas = [r for r in expandir if r not in relaciones]
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Relación no expandible: {invalidas[0]}")
+
+    return Proyeccion(modelo, campos, expandir, relaciones)
+
+def aplicar_proyeccion(query, proyeccion: Optional[Proyeccion], precargar: Sequence = (), columnas_requeridas: Sequence = ()):
+    """
+    Aplica a una consulta las opciones de carga de la proyección.
+
+    Args:
+        query: Consulta sobre el modelo de la proyección
+        proyeccion: Campos y relaciones pedidos, o None para la representación por defecto
+        precargar: Relaciones que usa la representación por defecto; se cargan con
+            joinedload solo si no se pidió ?fields=
+        columnas_requeridas: Columnas que deben cargarse aunque no se retornen
+    """
+    precargadas = ()
+    if proyeccion is None or not proyeccion.campos:
+        precargadas = tuple(precargar)
+        query = query.options(*(joinedload(r) for r in precargadas))
+    if proyeccion is not None:
+        query = query.options(*proyeccion.opciones(columnas_requeridas, precargadas))
+    return query
@@ -7,9 +7,11 @@ const API_ENDPOINTS = {
     // Pacientes
     pacientes: '/api/pacientes',
     registrarPaciente: '/api/pacientes/registrar',
+    buscarPacientes: (texto) => `/api/pacientes/buscar?${construirQuery({ q: texto })}`,
     
     // Doctores
     doctores: '/api/doctores',
+    directorioDoctores: '/api/doctores/directorio',
     especialidades: '/api/doctores/especialidades/listar',
     
     // Horarios
@@ -18,16 +20,35 @@ const API_ENDPOINTS = {
     
     // Citas
     citas: '/api/citas',
+    citasFiltradas: (filtros = {}) => `/api/citas?${construirQuery(filtros)}`,
+    misCitas: (filtros = {}) => `/api/citas/mias?${construirQuery(filtros)}`,
+    exportarCitas: (filtros = {}) => `/api/citas/exportar?${construirQuery(filtros)}`,
     actualizarEstadoCita: '/api/citas/actualizar_estado',
+    disponibilidad: (idDoctor, desde, hasta) => `/api/citas/disponibilidad?id_doctor=${idDoctor}&fecha_desde=${desde}&fecha_hasta=${hasta || desde}`,
     
     // Historias
     historias: '/api/historias',
     
     // Facturas
     facturas: '/api/facturas',
-    metodosPago: '/api/metodos-pago'
+    metodosPago: '/api/metodos-pago',
+    
+    // Dashboard
+    dashboardResumen: '/api/dashboard/resumen',
+
+    // Reportes
+    reporte: (nombre, rango = {}) => `/api/reportes/${nombre}?${construirQuery(rango)}`
 };
 
+// Construye el query string omitiendo filtros vacíos; los arreglos repiten el parámetro
+function construirQuery(filtros) {
+    const params = new URLSearchParams();
+    Object.entries(filtros).forEach(([clave, valor]) => {
+        [].concat(valor).filter(v => v !== '' && v != null).forEach(v => params.append(clave, v));
+    });
+    return params.toString();
+}
+
 // Helpers para peticiones HTTP
 async function apiFetch(url, options = {}) {
     const token = localStorage.getItem('token');
@@ -0,0 +1,894 @@
+"""
+Pruebas de la API del Sistema de Gestión de Citas Médicas.
+
+Se ejecutan contra una base SQLite temporal que reemplaza a MySQL mediante
+dependency_overrides sobre get_db.
+"""
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import SCRIPT_GUARDAR, CacheCompartida, cache
+from app.database import Base, get_db, get_session_factory
+from app.main import app
+from app.models import (
+    CitaMedica, Doctor, EstadisticaAnticipacion, Especialidad, Factura, ListaEspera, MetodoPago, Paciente, Usuario
+)
+from app.repositories import citas_repository, estadisticas_repository
+from app.repositories.indice_horarios import indice_horarios
+from app.repositories.indice_pacientes import indice_pacientes
+from app.services.auth_service import generate_user_token
+from app.services.citas_service import CitaService
+from app.services.disponibilidad_service import DIAS_SEMANA, VENTANA_BUSQUEDA_DIAS
+from app.services.lista_espera_service import ListaEsperaService
+from app.services.notificaciones_service import NotificacionService
+from app.services.reportes_service import calcular_ocupacion
+
+
+class AlmacenLocal:
+    """Almacén en memoria con la parte de la interfaz de redis que usa CacheCompartida"""
+
+    def __init__(self):
+        self.valores, self.conjuntos, self.expira = {}, {}, {}
+        self.ahora = 0
+
+    def _vigente(self, clave):
+        if clave in self.expira and self.expira[clave] <= self.ahora:
+            self.delete(clave)
+        return clave in self.valores or clave in self.conjuntos
+
+    def get(self, clave):
+        return self.valores.get(clave) if self._vigente(clave) else None
+
+    def set(self, clave, valor, ex=None):
+        self.valores[clave] = valor
+        self.expira.pop(clave, None)
+        if ex is not None:
+            self.expira[clave] = self.ahora + ex
+
+    def delete(self, *claves):
+        for clave in claves:
+            self.valores.pop(clave, None)
+            self.conjuntos.pop(clave, None)
+            self.expira.pop(clave, None)
+
+    def sadd(self, clave, *miembros):
+        self._vigente(clave)
+        self.conjuntos.setdefault(clave, set()).update(miembros)
+
+    def expire(self, clave, segundos):
+        if self._vigente(clave):
+            self.expira[clave] = self.ahora + segundos
+
+    def smembers(self, clave):
+        return set(self.conjuntos.get(clave, ())) if self._vigente(clave) else set()
+
+    def incr(self, clave):
+        self.valores[clave] = int(self.get(clave) or 0) + 1
+        return self.valores[clave]
+
+    def scan_iter(self, match):
+        prefijo = match.rstrip("*")
+        return [c for c in [*self.valores, *self.conjuntos] if c.startswith(prefijo) and self._vigente(c)]
+
+    def eval(self, script, numkeys, *argumentos):
+        """Equivale a SCRIPT_GUARDAR (único script que usa CacheCompartida); sin hilos es atómico"""
+        assert script == SCRIPT_GUARDAR
+        (contador, clave, *conjuntos), (marca, valor, ttl, ttl_etiquetas) = argumentos[:numkeys], argumentos[numkeys:]
+        if marca != "" and int(self.get(contador) or 0) != int(marca):
+            return 0
+        self.set(clave, valor, ex=int(ttl))
+        for conjunto in conjuntos:
+            self.sadd(conjunto, clave)
+            self.expire(conjunto, int(ttl_etiquetas))
+        return 1
+
+
+@pytest.fixture()
+def sesion_local(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'citas.db'}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+        pool_size=40,
+        max_overflow=0
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configurar_sqlite(conexion, _registro):
+        conexion.execute("PRAGMA foreign_keys=ON")
+        conexion.execute("PRAGMA journal_mode=WAL")
+
+    Base.metadata.create_all(bind=engine)
+    SesionPrueba = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def _get_db():
+        db = SesionPrueba()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_session_factory] = lambda: SesionPrueba
+    indice_horarios.limpiar()
+    indice_pacientes.limpiar()
+    cache.limpiar()
+    yield SesionPrueba
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+@pytest.fixture()
+def client(sesion_local):
+    return TestClient(app)
+
+
+@pytest.fixture()
+def datos(sesion_local):
+    db = sesion_local()
+    especialidad = Especialidad(nombre="Cardiología")
+    db.add(especialidad)
+    db.flush()
+    doctor = Doctor(
+        nombre="Laura", apellido="Martínez", documento="98765432",
+        correo="laura.martinez@clinica.com", licencia="MED-2023-010",
+        id_especialidad=especialidad.id_especialidad, activo=True
+    )
+    paciente = Paciente(
+        nombre="Juan", apellido="Pérez", documento="123456789",
+        correo="juan.perez@email.com", telefono="3101234567",
+        fecha_nacimiento=date(1990, 5, 15)
+    )
+    db.add_all([doctor, paciente])
+    db.commit()
+    ids = {"id_doctor": doctor.id_doctor, "id_paciente": paciente.id_paciente}
+    db.close()
+    return ids
+
+
+def _paciente(sesion_local, documento):
+    db = sesion_local()
+    paciente = Paciente(
+        nombre="Paciente", apellido=documento, documento=documento,
+        correo=f"{documento}@email.com", telefono="3000000000", fecha_nacimiento=date(1985, 1, 1)
+    )
+    db.add(paciente)
+    db.commit()
+    paciente_id = paciente.id_paciente
+    db.close()
+    return paciente_id
+
+
+def _doctor(sesion_local, documento, especialidad_id=1):
+    db = sesion_local()
+    doctor = Doctor(
+        nombre="Doctor", apellido=documento, documento=documento, correo=f"{documento}@clinica.com",
+        licencia=f"MED-{documento}", id_especialidad=especialidad_id, activo=True
+    )
+    db.add(doctor)
+    db.commit()
+    doctor_id = doctor.id_doctor
+    db.close()
+    return doctor_id
+
+
+def _lista_espera(client, datos, paciente_id, fecha, **cambios):
+    solicitud = {
+        "id_paciente": paciente_id,
+        "id_doctor": datos["id_doctor"],
+        "fecha_desde": str(fecha),
+        "fecha_hasta": str(fecha),
+        "motivo": "Control cardiológico"
+    }
+    solicitud.update(cambios)
+    return client.post("/api/lista-espera", json=solicitud).json()["data"]
+
+
+def _admin():
+    return {"Authorization": f"Bearer {generate_user_token(1, 'admin@clinica.com', 'admin')}"}
+
+
+def _cita(datos, fecha, hora, **cambios):
+    cita = {
+        "id_paciente": datos["id_paciente"],
+        "id_doctor": datos["id_doctor"],
+        "fecha": str(fecha),
+        "hora": str(hora),
+        "motivo": "Control rutinario"
+    }
+    cita.update(cambios)
+    return cita
+
+
+def test_reservas_concurrentes_un_ganador_por_slot(client, datos, sesion_local):
+    fecha = date.today() + timedelta(days=1)
+    slots = [time(8, 0), time(8, 30), time(9, 0), time(9, 30)]
+    peticiones = [_cita(datos, fecha, slots[i % len(slots)]) for i in range(200)]
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        respuestas = list(executor.map(lambda c: (c["hora"], client.post("/api/citas", json=c).json()), peticiones))
+
+    for slot in slots:
+        del_slot = [r for hora, r in respuestas if hora == str(slot)]
+        exitosas = [r for r in del_slot if r["success"]]
+        assert len(exitosas) == 1
+        assert all(r["error_code"] == 409 for r in del_slot if not r["success"])
+
+    db = sesion_local()
+    assert db.query(CitaMedica).filter(CitaMedica.estado != 'cancelada').count() == len(slots)
+    db.close()
+
+
+def test_slot_cancelado_se_puede_reservar_de_nuevo(client, datos):
+    fecha = date.today() + timedelta(days=1)
+    primera = client.post("/api/citas", json=_cita(datos, fecha, time(10, 0))).json()
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(10, 0))).json()["error_code"] == 409
+
+    client.delete(f"/api/citas/{primera['data']['id_cita']}")
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(10, 0))).json()["success"]
+
+
+def test_referencias_inexistentes_responden_404(client, datos):
+    fecha = date.today() + timedelta(days=1)
+    sin_paciente = client.post("/api/citas", json=_cita(datos, fecha, time(11, 0), id_paciente=999)).json()
+    sin_doctor = client.post("/api/citas", json=_cita(datos, fecha, time(11, 0), id_doctor=999)).json()
+
+    assert sin_paciente["error_code"] == 404
+    assert sin_paciente["mensaje"] == "Paciente no encontrado"
+    assert sin_doctor["error_code"] == 404
+    assert sin_doctor["mensaje"] == "Doctor no encontrado"
+
+
+def test_buscar_pacientes_por_prefijo_sin_tildes(client, datos):
+    assert [p["documento"] for p in client.get("/api/pacientes/buscar?q=juan PER").json()["data"]] == ["123456789"]
+    assert client.get("/api/pacientes/buscar?q=1234").json()["data"][0]["id_paciente"] == datos["id_paciente"]
+
+    client.put(f"/api/pacientes/{datos['id_paciente']}", json={"nombre": "Andrés"})
+    assert client.get("/api/pacientes/buscar?q=juan").json()["data"][0]["nombre"] == "Andrés"
+    assert len(client.get("/api/pacientes/buscar?q=andr").json()["data"]) == 1
+    assert client.get("/api/pacientes/buscar?q=andres gom").json()["data"] == []
+
+
+def test_reportes_se_invalidan_al_cambiar_citas(client, datos):
+    fecha = date.today() + timedelta(days=1)
+    admin = {"Authorization": f"Bearer {generate_user_token(1, 'admin@clinica.com', 'admin')}"}
+    url = f"/api/reportes/citas-por-estado?fecha_desde={date.today()}&fecha_hasta={fecha}"
+    cita = client.post("/api/citas", json=_cita(datos, fecha, time(8, 0))).json()["data"]
+
+    assert client.get(url, headers=admin).json()["data"]["pendiente"] == 1
+
+    client.delete(f"/api/citas/{cita['id_cita']}")
+    estados = client.get(url, headers=admin).json()["data"]
+    assert (estados["pendiente"], estados["cancelada"]) == (0, 1)
+
+
+def test_detalle_responde_304_si_no_cambio(client, datos):
+    url = f"/api/pacientes/{datos['id_paciente']}"
+    etag = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"{url}?fields=nombre", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_listado_en_cache_compartida_se_invalida_al_reservar(client, datos):
+    fecha = date.today() + timedelta(days=1)
+    url = f"/api/citas?id_doctor={datos['id_doctor']}"
+    anterior, almacen = cache.backend, AlmacenLocal()
+    cache.usar(CacheCompartida(almacen))
+    try:
+        assert len(client.get(url).json()["data"]) == 0
+        assert any(c.startswith("cache:valor:respuesta:") for c in almacen.valores)
+        assert len(client.get(url).json()["data"]) == 0
+
+        client.post("/api/citas", json=_cita(datos, fecha, time(9, 0)))
+        assert len(client.get(url).json()["data"]) == 1
+    finally:
+        cache.usar(anterior)
+
+
+def test_lista_espera_ofrece_slot_y_lo_reofrece_al_rechazar(client, datos, sesion_local, monkeypatch):
+    avisos = []
+    monkeypatch.setattr(NotificacionService, "enviar", staticmethod(lambda correo, asunto, mensaje: avisos.append(correo)))
+    fecha = date.today() + timedelta(days=2)
+    cita = client.post("/api/citas", json=_cita(datos, fecha, time(10, 0))).json()["data"]
+    primera = _lista_espera(client, datos, _paciente(sesion_local, "2001"), fecha)
+    segunda = _lista_espera(client, datos, _paciente(sesion_local, "2002"), fecha)
+    assert primera["estado"] == "activa"
+
+    client.delete(f"/api/citas/{cita['id_cita']}")
+    oferta = client.get(f"/api/lista-espera/{primera['id_lista_espera']}").json()["data"]
+    assert (oferta["estado"], oferta["oferta"]["hora"]) == ("ofrecida", "10:00:00")
+    assert avisos == ["2001@email.com"]
+
+    client.post(f"/api/lista-espera/{primera['id_lista_espera']}/rechazar")
+    assert client.get(f"/api/lista-espera/{primera['id_lista_espera']}").json()["data"]["estado"] == "activa"
+    assert client.get(f"/api/lista-espera/{segunda['id_lista_espera']}").json()["data"]["estado"] == "ofrecida"
+    assert avisos == ["2001@email.com", "2002@email.com"]
+
+    # La oferta vence sin respuesta: no se puede aceptar y la solicitud vuelve a la cola
+    db = sesion_local()
+    db.query(ListaEspera).filter(ListaEspera.id_lista_espera == segunda["id_lista_espera"]).update(
+        {"oferta_expira": datetime.now() - timedelta(minutes=1)}
+    )
+    db.commit()
+    db.close()
+    assert client.post(f"/api/lista-espera/{segunda['id_lista_espera']}/aceptar").json()["error_code"] == 409
+    assert client.get(f"/api/lista-espera/{segunda['id_lista_espera']}").json()["data"]["estado"] == "activa"
+    assert client.get(f"/api/lista-espera/{primera['id_lista_espera']}").json()["data"]["estado"] == "activa"
+
+
+def test_lista_espera_no_ofrece_dos_veces_el_mismo_slot(client, datos, sesion_local, monkeypatch):
+    avisos = []
+    monkeypatch.setattr(NotificacionService, "enviar", staticmethod(lambda correo, asunto, mensaje: avisos.append(correo)))
+    fecha = date.today() + timedelta(days=2)
+    cita = client.post("/api/citas", json=_cita(datos, fecha, time(10, 0))).json()["data"]
+    primera = _lista_espera(client, datos, _paciente(sesion_local, "4001"), fecha)
+    segunda = _lista_espera(client, datos, _paciente(sesion_local, "4002"), fecha)
+
+    # Cancelar una cita ya cancelada no vuelve a liberar el slot
+    assert client.delete(f"/api/citas/{cita['id_cita']}").json()["success"]
+    assert client.delete(f"/api/citas/{cita['id_cita']}").json()["success"]
+    client.put(f"/api/citas/{cita['id_cita']}/estado", json={"estado": "cancelada"})
+    # Ni una tarea repetida para el mismo slot mientras la oferta sigue vigente
+    assert ListaEsperaService.procesar_slot_liberado(sesion_local, datos["id_doctor"], fecha, time(10, 0)) is None
+
+    assert client.get(f"/api/lista-espera/{primera['id_lista_espera']}").json()["data"]["estado"] == "ofrecida"
+    assert client.get(f"/api/lista-espera/{segunda['id_lista_espera']}").json()["data"]["estado"] == "activa"
+    assert avisos == ["4001@email.com"]
+
+
+def test_lista_espera_agenda_automatico_con_la_siguiente_si_falla(client, datos, sesion_local, monkeypatch):
+    monkeypatch.setattr(NotificacionService, "enviar", staticmethod(lambda correo, asunto, mensaje: True))
+    fecha = date.today() + timedelta(days=2)
+    cita = client.post("/api/citas", json=_cita(datos, fecha, time(11, 0))).json()["data"]
+    primera = _lista_espera(client, datos, _paciente(sesion_local, "3001"), fecha, agendar_automatico=True)
+    segunda = _lista_espera(client, datos, _paciente(sesion_local, "3002"), fecha, agendar_automatico=True)
+
+    crear_cita = CitaService.crear_cita
+
+    def _crear_cita(db, cita_data):
+        if cita_data.id_paciente == primera["id_paciente"]:
+            raise HTTPException(status_code=409, detail="El paciente ya tiene una cita a esa hora")
+        return crear_cita(db, cita_data)
+
+    monkeypatch.setattr(CitaService, "crear_cita", staticmethod(_crear_cita))
+    client.delete(f"/api/citas/{cita['id_cita']}")
+
+    assert client.get(f"/api/lista-espera/{primera['id_lista_espera']}").json()["data"]["estado"] == "activa"
+    asignada = client.get(f"/api/lista-espera/{segunda['id_lista_espera']}").json()["data"]
+    assert asignada["estado"] == "asignada"
+    nueva = client.get(f"/api/citas/{asignada['id_cita']}").json()["data"]
+    assert (nueva["id_paciente"], nueva["hora"]) == (segunda["id_paciente"], "11:00:00")
+
+
+def test_horario_solapado_se_rechaza_y_se_puede_reservar_fuera_de_horario(client, datos):
+    fecha = date.today() + timedelta(days=1)
+    dia = DIAS_SEMANA[fecha.weekday()]
+    horario = {"id_doctor": datos["id_doctor"], "dia_semana": dia, "hora_inicio": "08:00:00", "hora_fin": "12:00:00"}
+    assert client.post("/api/horarios", json=horario, headers=_admin()).json()["success"]
+
+    solapado = client.post("/api/horarios", json={**horario, "hora_inicio": "11:00:00", "hora_fin": "13:00:00"}, headers=_admin())
+    assert solapado.json()["error_code"] == 409
+    assert client.post("/api/horarios", json={**horario, "hora_inicio": "12:00:00", "hora_fin": "14:00:00"}, headers=_admin()).json()["success"]
+
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(16, 0))).json()["success"]
+
+
+def test_cache_compartida_expira_valores_y_conjuntos_de_etiquetas():
+    almacen = AlmacenLocal()
+    compartida = CacheCompartida(almacen, ttl_etiquetas=600)
+    compartida.guardar("corta", 1, ["doctor:12"], ttl=60)
+    compartida.guardar("sin_ttl", 2, ["doctor:12", "citas:doctor:12:2026-10-20"])
+
+    almacen.ahora = 61
+    assert compartida.obtener("corta") is None
+    assert compartida.obtener("sin_ttl") == 2
+
+    almacen.ahora = 601
+    assert compartida.obtener("sin_ttl") is None
+    assert almacen.scan_iter(match="cache:etiqueta:*") == []
+
+
+def test_cache_compartida_no_guarda_con_una_marca_invalidada_por_otro_proceso():
+    almacen = AlmacenLocal()
+    proceso, otro_proceso = CacheCompartida(almacen), CacheCompartida(almacen)
+
+    marca = proceso.marca()
+    otro_proceso.invalidar("citas")
+    proceso.guardar("listado", ["obsoleto"], ["citas"], marca=marca)
+    assert proceso.obtener("listado") is None
+    assert almacen.scan_iter(match="cache:etiqueta:*") == []
+
+    proceso.guardar("listado", ["vigente"], ["citas"], marca=proceso.marca())
+    assert otro_proceso.obtener("listado") == ["vigente"]
+    otro_proceso.invalidar("citas")
+    assert proceso.obtener("listado") is None
+
+
+def test_feed_ics_con_citas_y_304_hasta_que_cambia_el_paciente(client, datos, sesion_local):
+    fecha = date.today() + timedelta(days=3)
+    client.post("/api/citas", json=_cita(datos, fecha, time(9, 30), motivo="Control; presión, arterial"))
+    # updated_at tiene resolución de segundos: se retrasa para que el cambio posterior se note
+    with sesion_local() as db:
+        ayer = datetime.now() - timedelta(days=1)
+        for modelo in (CitaMedica, Paciente, Doctor):
+            db.query(modelo).update({modelo.updated_at: ayer})
+        db.commit()
+    url = f"/api/calendario/doctor/{datos['id_doctor']}.ics"
+
+    feed = client.get(url)
+    assert feed.headers["content-type"].startswith("text/calendar")
+    assert "X-WR-CALNAME:Citas - Dr(a). Laura Martínez\r\n" in feed.text
+    assert f"DTSTART:{fecha:%Y%m%d}T093000\r\n" in feed.text
+    assert "SUMMARY:Cita: Juan Pérez\r\n" in feed.text
+    assert "DESCRIPTION:Control\\; presión\\, arterial\r\n" in feed.text
+    assert feed.text.endswith("END:VCALENDAR\r\n")
+
+    etag = feed.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # Renombrar al paciente cambia el contenido del feed, así que también su ETag
+    client.put(f"/api/pacientes/{datos['id_paciente']}", json={"nombre": "Andrés"})
+    renombrado = client.get(url, headers={"If-None-Match": etag})
+    assert renombrado.status_code == 200
+    assert "SUMMARY:Cita: Andrés Pérez\r\n" in renombrado.text
+
+
+def test_exportar_citas_csv_con_cabecera_filas_y_filtros(client, datos):
+    manana = date.today() + timedelta(days=1)
+    for fecha, hora in ((manana, time(9, 0)), (manana, time(10, 0)), (manana + timedelta(days=1), time(9, 0))):
+        client.post("/api/citas", json=_cita(datos, fecha, hora, motivo="Control, general"))
+
+    respuesta = client.get(
+        "/api/citas/exportar",
+        params={"formato": "csv", "fecha_hasta": str(manana), "id_doctor": datos["id_doctor"]},
+        headers=_admin()
+    )
+    assert respuesta.headers["content-type"].startswith("text/csv")
+    assert respuesta.headers["content-disposition"] == 'attachment; filename="citas.csv"'
+    cabecera, *filas = list(csv.reader(io.StringIO(respuesta.text)))
+    assert cabecera[:4] == ["id_cita", "fecha", "hora", "estado"]
+    assert [(f[1], f[2], f[4], f[7]) for f in filas] == [
+        (str(manana), "09:00:00", "Control, general", "Juan"),
+        (str(manana), "10:00:00", "Control, general", "Juan"),
+    ]
+
+    por_hora = client.get("/api/citas/exportar", params={"formato": "csv", "hora": "09:00:00"}, headers=_admin())
+    assert len(por_hora.text.splitlines()) == 3
+    assert client.get("/api/citas/exportar", params={"formato": "xml"}, headers=_admin()).json()["error_code"] == 400
+
+
+def test_catalogo_se_invalida_al_confirmar_y_su_version_es_la_huella(client, datos, sesion_local):
+    url = "/api/doctores/especialidades/listar"
+    inicial = client.get(url).json()
+    assert [e["nombre"] for e in inicial["data"]] == ["Cardiología"]
+
+    with sesion_local() as db:
+        db.add(Especialidad(nombre="Pediatría"))
+        db.flush()
+        # Sin confirmar, la caché debe seguir con el contenido vigente
+        assert client.get(url).json()["version"] == inicial["version"]
+        db.rollback()
+    assert client.get(url).json()["version"] == inicial["version"]
+
+    with sesion_local() as db:
+        db.add(Especialidad(nombre="Pediatría"))
+        db.commit()
+    nuevo = client.get(url)
+    assert [e["nombre"] for e in nuevo.json()["data"]] == ["Cardiología", "Pediatría"]
+    assert nuevo.json()["version"] != inicial["version"]
+    assert nuevo.headers["etag"] == f'"especialidades-{nuevo.json()["version"]}"'
+
+
+def test_directorio_filtra_por_dia_y_refleja_horarios_nuevos(client, datos):
+    url = "/api/doctores/directorio"
+    assert client.get(url, params={"dia_semana": "Lunes"}).json()["data"] == []
+
+    horario = {"id_doctor": datos["id_doctor"], "dia_semana": "Lunes", "hora_inicio": "14:00:00", "hora_fin": "18:00:00"}
+    assert client.post("/api/horarios", json=horario, headers=_admin()).json()["success"]
+    client.post("/api/horarios", json={**horario, "dia_semana": "Martes"}, headers=_admin())
+
+    lunes = client.get(url, params={"dia_semana": "Lunes"}).json()["data"]
+    assert [(d["nombre"], d["especialidad"]) for d in lunes] == [("Laura", "Cardiología")]
+    assert [(h["dia_semana"], h["hora_inicio"]) for h in lunes[0]["horarios"]] == [("Lunes", "14:00:00")]
+    assert len(client.get(url).json()["data"][0]["horarios"]) == 2
+    assert client.get(url, params={"id_especialidad": 999}).json()["error_code"] == 404
+
+
+def test_mis_citas_segun_el_token_con_y_sin_id_referencia(client, datos, sesion_local):
+    manana = date.today() + timedelta(days=1)
+    otro = _paciente(sesion_local, "555")
+    client.post("/api/citas", json=_cita(datos, manana, time(9, 0)))
+    client.post("/api/citas", json=_cita(datos, manana, time(10, 0)))
+    client.post("/api/citas", json=_cita({**datos, "id_paciente": otro}, manana, time(11, 0)))
+    with sesion_local() as db:
+        db.add(Usuario(correo="juan@email.com", contrasena_hash="x", rol="paciente", id_referencia=datos["id_paciente"]))
+        db.commit()
+
+    def mias(token, **params):
+        return client.get("/api/citas/mias", params=params, headers={"Authorization": f"Bearer {token}"}).json()
+
+    paciente = generate_user_token(7, "juan@email.com", "paciente", datos["id_paciente"])
+    assert [c["hora"] for c in mias(paciente)["data"]] == ["09:00:00", "10:00:00"]
+    # Token sin id_referencia: se resuelve con el usuario
+    sin_referencia = generate_user_token(1, "juan@email.com", "paciente")
+    assert [c["hora"] for c in mias(sin_referencia, limit=1)["data"]] == ["09:00:00"]
+
+    doctor = generate_user_token(8, "laura@clinica.com", "doctor", datos["id_doctor"])
+    assert [c["id_paciente"] for c in mias(doctor)["data"]] == [datos["id_paciente"], datos["id_paciente"], otro]
+    assert mias(doctor, estado="cancelada")["data"] == []
+    assert mias(_admin()["Authorization"].split()[1])["error_code"] == 403
+
+
+def test_disponibilidad_bloquea_los_slots_que_se_solapan_con_una_cita(client, datos):
+    fecha = date.today() + timedelta(days=2)
+    horario = {"id_doctor": datos["id_doctor"], "dia_semana": DIAS_SEMANA[fecha.weekday()],
+               "hora_inicio": "08:00:00", "hora_fin": "10:00:00"}
+    assert client.post("/api/horarios", json=horario, headers=_admin()).json()["success"]
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(8, 15))).json()["success"]
+
+    def horas(duracion):
+        data = client.get("/api/citas/disponibilidad", params={
+            "id_doctor": datos["id_doctor"], "fecha_desde": str(fecha), "duracion": duracion
+        }).json()["data"]
+        return data[0]["disponibilidad"][0]["horas"]
+
+    # La cita ocupa 08:15-08:45: bloquea el slot que la contiene y el siguiente
+    assert horas(30) == ["09:00:00", "09:30:00"]
+    assert horas(60) == ["09:00:00"]
+    assert horas(15) == ["08:00:00", "08:45:00", "09:00:00", "09:15:00", "09:30:00", "09:45:00"]
+
+
+def test_proximos_slots_de_especialidad_mezcla_doctores_en_orden(client, datos, sesion_local):
+    desde = date.today() + timedelta(days=1)
+    fecha = desde + timedelta(days=1)
+    otro = _doctor(sesion_local, "777")
+    for doctor_id, inicio, fin in ((datos["id_doctor"], "08:00:00", "09:00:00"), (otro, "08:15:00", "09:15:00")):
+        horario = {"id_doctor": doctor_id, "dia_semana": DIAS_SEMANA[fecha.weekday()], "hora_inicio": inicio, "hora_fin": fin}
+        assert client.post("/api/horarios", json=horario, headers=_admin()).json()["success"]
+
+    def slots(cantidad):
+        respuesta = client.get("/api/citas/disponibilidad/especialidad/1", params={
+            "cantidad": cantidad, "fecha_desde": str(desde)
+        }).json()
+        return [(s["fecha"], s["hora"], s["doctor"]) for s in respuesta["data"]]
+
+    laura, otro_doctor = "Laura Martínez", "Doctor 777"
+    primera_semana = [
+        (str(fecha), "08:00:00", laura), (str(fecha), "08:15:00", otro_doctor),
+        (str(fecha), "08:30:00", laura), (str(fecha), "08:45:00", otro_doctor)
+    ]
+    assert slots(3) == primera_semana[:3]
+
+    # La semana siguiente cae fuera de la primera ventana: la búsqueda continúa en la próxima
+    siguiente = fecha + timedelta(days=7)
+    assert siguiente > desde + timedelta(days=VENTANA_BUSQUEDA_DIAS - 1)
+    assert slots(6) == primera_semana + [(str(siguiente), "08:00:00", laura), (str(siguiente), "08:15:00", otro_doctor)]
+
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(8, 15), id_doctor=otro)).json()["success"]
+    assert slots(2) == [(str(fecha), "08:00:00", laura), (str(fecha), "08:30:00", laura)]
+
+    desconocida = client.get("/api/citas/disponibilidad/especialidad/999").json()
+    assert not desconocida["success"] and desconocida["error_code"] == 404
+
+
+def test_agenda_del_doctor_con_bloques_citas_y_huecos(client, datos):
+    fecha = date.today() + timedelta(days=2)
+    horario = {"id_doctor": datos["id_doctor"], "dia_semana": DIAS_SEMANA[fecha.weekday()],
+               "hora_inicio": "08:00:00", "hora_fin": "12:00:00"}
+    assert client.post("/api/horarios", json=horario, headers=_admin()).json()["success"]
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(9, 0))).json()["success"]
+
+    def agenda():
+        return client.get(f"/api/doctores/{datos['id_doctor']}/agenda", params={"fecha": str(fecha)}).json()["data"]
+
+    def huecos(data):
+        return [(h["hora_inicio"], h["hora_fin"]) for h in data["huecos"]]
+
+    data = agenda()
+    assert data["bloques"] == [{"hora_inicio": "08:00:00", "hora_fin": "12:00:00"}]
+    assert [(c["hora"], c["paciente"]) for c in data["citas"]] == [("09:00:00", "Juan Pérez")]
+    assert huecos(data) == [("08:00:00", "09:00:00"), ("09:30:00", "12:00:00")]
+
+    # Una cita en otro día del mismo doctor no invalida la agenda ya guardada
+    clave = f"agenda:{datos['id_doctor']}:{fecha}"
+    assert client.post("/api/citas", json=_cita(datos, fecha + timedelta(days=7), time(10, 0))).json()["success"]
+    assert cache.obtener(clave) == data
+
+    assert client.post("/api/citas", json=_cita(datos, fecha, time(10, 0))).json()["success"]
+    assert cache.obtener(clave) is None
+    assert huecos(agenda()) == [("08:00:00", "09:00:00"), ("09:30:00", "10:00:00"), ("10:30:00", "12:00:00")]
+
+
+def test_lote_todo_o_nada_y_parcial_con_conflictos(client, datos):
+    inicio = date.today() + timedelta(days=1)
+    ocupada = inicio + timedelta(days=7)
+    assert client.post("/api/citas", json=_cita(datos, ocupada, time(9, 0))).json()["success"]
+    lote = {
+        "id_paciente": datos["id_paciente"], "id_doctor": datos["id_doctor"], "motivo": "Terapia semanal",
+        "recurrencia": {"fecha_inicio": str(inicio), "hora": "09:00:00", "intervalo_dias": 7, "repeticiones": 3},
+        "todo_o_nada": True
+    }
+
+    rechazado = client.post("/api/citas/lote", json=lote).json()
+    assert rechazado["error_code"] == 409
+    assert rechazado["data"]["conflictos"] == [
+        {"fecha": str(ocupada), "hora": "09:00:00", "motivo": "El horario no está disponible"}
+    ]
+    assert len(client.get("/api/citas").json()["data"]) == 1
+
+    parcial = client.post("/api/citas/lote", json={**lote, "todo_o_nada": False}).json()
+    assert parcial["success"]
+    assert [c["fecha"] for c in parcial["data"]["creadas"]] == [str(inicio), str(inicio + timedelta(days=14))]
+    assert len(parcial["data"]["conflictos"]) == 1
+    assert len(client.get("/api/citas").json()["data"]) == 3
+
+    ambos = client.post("/api/citas/lote", json={**lote, "ocurrencias": [{"fecha": str(inicio), "hora": "10:00:00"}]})
+    assert ambos.status_code == 422
+
+
+def test_plantilla_de_horarios_reemplaza_los_bloques_del_doctor(client, datos):
+    for dia in ("Lunes", "Martes"):
+        horario = {"id_doctor": datos["id_doctor"], "dia_semana": dia, "hora_inicio": "08:00:00", "hora_fin": "12:00:00"}
+        assert client.post("/api/horarios", json=horario, headers=_admin()).json()["success"]
+    url = f"/api/horarios/doctor/{datos['id_doctor']}"
+    assert len(client.get(url).json()["data"]) == 2
+
+    plantilla = {"bloques": [
+        {"dia_semana": "Lunes", "hora_inicio": "08:00:00", "hora_fin": "12:00:00"},
+        {"dia_semana": "Miércoles", "hora_inicio": "14:00:00", "hora_fin": "18:00:00"},
+        {"dia_semana": "Jueves", "hora_inicio": "14:00:00", "hora_fin": "18:00:00"}
+    ]}
+    resumen = client.put(f"{url}/plantilla", json=plantilla, headers=_admin()).json()["data"]
+    assert resumen == {"creados": 1, "actualizados": 1, "desactivados": 0, "sin_cambios": 1}
+    assert sorted((h["dia_semana"], h["hora_inicio"]) for h in client.get(url).json()["data"]) == [
+        ("Jueves", "14:00:00"), ("Lunes", "08:00:00"), ("Miércoles", "14:00:00")
+    ]
+
+    solapada = {"bloques": plantilla["bloques"] + [{"dia_semana": "Lunes", "hora_inicio": "11:00:00", "hora_fin": "13:00:00"}]}
+    assert client.put(f"{url}/plantilla", json=solapada, headers=_admin()).json()["error_code"] == 409
+    assert len(client.get(url).json()["data"]) == 3
+
+    vacia = client.put(f"{url}/plantilla", json={"bloques": []}, headers=_admin()).json()["data"]
+    assert vacia["desactivados"] == 3
+    assert client.get(url).json()["data"] == []
+
+
+def test_cursor_recorre_las_citas_por_fecha_hora_e_id_sin_repetir(client, datos, sesion_local):
+    otro = _doctor(sesion_local, "777")
+    manana = date.today() + timedelta(days=1)
+    pasado = manana + timedelta(days=1)
+    # Desordenadas y con empates en (fecha, hora) entre doctores, resueltos por id
+    for doctor, fecha, hora in ((datos["id_doctor"], pasado, time(8, 0)), (otro, manana, time(10, 0)),
+                                (datos["id_doctor"], manana, time(10, 0)), (otro, manana, time(9, 0)),
+                                (otro, pasado, time(8, 0))):
+        assert client.post("/api/citas", json=_cita({**datos, "id_doctor": doctor}, fecha, hora)).json()["success"]
+
+    vistas, cursor = [], None
+    while True:
+        pagina = client.get("/api/citas", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        vistas += [(c["fecha"], c["hora"], c["id_cita"]) for c in pagina["data"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+
+    assert vistas == sorted(vistas)
+    assert [i for _, _, i in vistas] == [4, 2, 3, 1, 5]
+    assert client.get("/api/citas", params={"cursor": "no-es-un-cursor"}).json()["error_code"] == 400
+
+
+def test_listado_de_citas_filtra_en_el_servidor(client, datos, sesion_local):
+    otro = _paciente(sesion_local, "888")
+    manana = date.today() + timedelta(days=1)
+    pasado = manana + timedelta(days=1)
+    ids = [client.post("/api/citas", json=_cita(d, f, h)).json()["data"]["id_cita"] for d, f, h in (
+        (datos, manana, time(9, 0)), (datos, pasado, time(9, 0)),
+        ({**datos, "id_paciente": otro}, manana, time(10, 0)), ({**datos, "id_paciente": otro}, pasado, time(11, 0))
+    )]
+    client.put(f"/api/citas/{ids[1]}/estado", json={"estado": "confirmada"})
+    client.put(f"/api/citas/{ids[2]}/estado", json={"estado": "cancelada"})
+
+    def listar(**filtros):
+        respuesta = client.get("/api/citas", params=filtros).json()
+        return [c["id_cita"] for c in respuesta["data"]] if respuesta["success"] else respuesta["error_code"]
+
+    assert listar(id_paciente=otro) == [ids[2], ids[3]]
+    assert listar(estado=["confirmada", "cancelada"]) == [ids[2], ids[1]]
+    assert listar(fecha_desde=str(pasado)) == [ids[1], ids[3]]
+    assert listar(fecha_hasta=str(manana), hora="09:00:00") == [ids[0]]
+    assert listar(id_doctor=datos["id_doctor"], id_paciente=datos["id_paciente"], estado="pendiente") == [ids[0]]
+    assert listar(fecha_desde=str(pasado), fecha_hasta=str(manana)) == 400
+    assert client.get("/api/citas", params={"estado": "inexistente"}).status_code == 422
+
+
+def test_proyeccion_de_campos_y_expansion_de_relaciones(client, datos):
+    manana = date.today() + timedelta(days=1)
+    id_cita = client.post("/api/citas", json=_cita(datos, manana, time(9, 0))).json()["data"]["id_cita"]
+
+    listado = client.get("/api/citas", params={"fields": "fecha,estado"}).json()["data"]
+    assert listado == [{"fecha": str(manana), "estado": "pendiente"}]
+
+    detalle = client.get(f"/api/citas/{id_cita}", params={"fields": "hora", "expand": "doctor,especialidad"}).json()["data"]
+    assert set(detalle) == {"hora", "doctor", "especialidad"}
+    assert detalle["doctor"]["nombre"] == "Laura"
+    assert detalle["especialidad"]["nombre"] == "Cardiología"
+
+    completo = client.get(f"/api/citas/{id_cita}", params={"expand": "paciente"}).json()["data"]
+    assert completo["paciente"]["documento"] == "123456789"
+    assert completo["motivo"] == "Control rutinario"
+
+    assert client.get("/api/citas", params={"fields": "contrasena"}).json()["error_code"] == 400
+    assert client.get("/api/citas", params={"expand": "facturas"}).json()["error_code"] == 400
+
+
+def _facturas(sesion_local, datos, facturas):
+    """Inserta citas completadas con su factura: (fecha_emision, monto, estado, metodo)"""
+    db = sesion_local()
+    metodos = {}
+    for i, (emision, monto, estado, metodo) in enumerate(facturas):
+        if metodo not in metodos:
+            metodos[metodo] = MetodoPago(nombre=metodo)
+            db.add(metodos[metodo])
+            db.flush()
+        cita = CitaMedica(
+            id_paciente=datos["id_paciente"], id_doctor=datos["id_doctor"], fecha=emision.date(),
+            hora=time(8 + i, 0),
+            motivo="Control general", estado="completada"
+        )
+        db.add(cita)
+        db.flush()
+        db.add(Factura(
+            id_cita=cita.id_cita, id_metodo_pago=metodos[metodo].id_metodo_pago,
+            monto=Decimal(monto), estado=estado, fecha_emision=emision
+        ))
+    db.commit()
+    db.close()
+
+
+def test_ingresos_por_periodo_suma_decimales_exactos(client, datos, sesion_local):
+    _facturas(sesion_local, datos, [
+        (datetime(2025, 3, 3, 9), "0.10", "pagada", "Efectivo"),
+        (datetime(2025, 3, 3, 10), "0.20", "pagada", "Tarjeta"),
+        (datetime(2025, 3, 20, 11), "99999.99", "pendiente", "Efectivo"),
+        (datetime(2025, 3, 21, 12), "50.00", "anulada", "Tarjeta"),
+        (datetime(2025, 4, 1, 13), "1234567.01", "pagada", "Efectivo"),
+    ])
+    respuesta = client.get("/api/reportes/ingresos-por-periodo", params={
+        "fecha_desde": "2025-03-15", "fecha_hasta": "2025-04-10", "agrupar": "metodo_pago"
+    }, headers=_admin()).json()["data"]
+
+    marzo, abril = respuesta["periodos"]
+    assert (marzo["inicio"], marzo["fin"], abril["fin"]) == ("2025-03-01", "2025-03-31", "2025-04-30")
+    assert marzo["pagada"] == {"cantidad": 2, "monto": "0.30"}
+    assert marzo["facturado"] == "100000.29"
+    assert marzo["anulada"] == {"cantidad": 1, "monto": "50.00"}
+    assert [(g["nombre"], g["facturado"]) for g in marzo["grupos"]] == [("Efectivo", "100000.09"), ("Tarjeta", "0.20")]
+    assert respuesta["total"]["facturado"] == "1334567.30"
+    assert respuesta["total"]["pagada"]["monto"] == "1234567.31"
+
+
+def test_dashboard_resume_conteos_y_actividad_reciente(client, datos, sesion_local):
+    _paciente(sesion_local, "999")
+    with sesion_local() as db:
+        db.add(CitaMedica(id_paciente=datos["id_paciente"], id_doctor=datos["id_doctor"], fecha=date.today(),
+                          hora=time(7, 0), motivo="Control general", estado="completada"))
+        db.commit()
+    manana = date.today() + timedelta(days=1)
+    ids = [client.post("/api/citas", json=_cita(datos, manana, time(8 + i, 0))).json()["data"]["id_cita"] for i in range(5)]
+    client.put(f"/api/citas/{ids[0]}/estado", json={"estado": "confirmada"})
+
+    resumen = client.get("/api/dashboard/resumen", headers=_admin()).json()["data"]
+    assert {k: resumen[k] for k in ("pacientes", "doctores_activos", "citas_hoy", "citas_pendientes", "citas_confirmadas")} == {
+        "pacientes": 2, "doctores_activos": 1, "citas_hoy": 1, "citas_pendientes": 4, "citas_confirmadas": 1
+    }
+    assert [c["id_cita"] for c in resumen["actividad_reciente"]] == ids[::-1]
+    assert resumen["actividad_reciente"][0]["paciente"] == "Juan Pérez"
+
+    # Se reutiliza durante DASHBOARD_TTL aunque cambien los datos
+    client.put(f"/api/citas/{ids[1]}/estado", json={"estado": "confirmada"})
+    assert client.get("/api/dashboard/resumen", headers=_admin()).json()["data"]["citas_confirmadas"] == 1
+    assert client.get("/api/dashboard/resumen").status_code == 403
+
+
+def test_calcular_ocupacion_contra_un_caso_calculado_a_mano():
+    # Miércoles 8 a martes 14 de enero: semanas [mié-dom] y [lun-mar]
+    desde, hasta = date(2025, 1, 8), date(2025, 1, 14)
+    datos = {
+        "id_doctores": np.array([3, 7]),
+        # Doctor 3: lunes 08-12 y 14-16, miércoles 09-10. Doctor 7: sábado 08-09.
+        # El 99 no está activo y se ignora.
+        "bloque_doctor": np.array([3, 3, 3, 7, 99]),
+        "bloque_dia": np.array([0, 0, 2, 5, 0]),
+        "bloque_minutos": np.array([240, 120, 60, 60, 480]),
+        # Citas por día desde `desde`; las de fuera del rango y del doctor 99 se ignoran
+        "reserva_doctor": np.array([3, 3, 7, 99, 3, 3]),
+        "reserva_dia": np.array([0, 5, 3, 0, 9, -1]),
+        "reserva_citas": np.array([1, 4, 2, 5, 3, 3])
+    }
+
+    inicios, programados, reservados = calcular_ocupacion(desde, hasta, datos, duracion=30)
+
+    assert inicios.tolist() == [0, 5]
+    assert programados.tolist() == [[60, 360], [60, 0]]
+    assert reservados.tolist() == [[30, 120], [60, 0]]
+
+
+def test_tasas_de_cancelacion_e_inasistencia_por_grupo(client, datos, sesion_local):
+    otro = _doctor(sesion_local, "777")
+    hoy = date.today()
+    # (doctor, estado, días desde el registro hasta la cita); todas hace 3 días
+    pasadas = [
+        (datos["id_doctor"], "completada", 7), (datos["id_doctor"], "pendiente", 0),
+        (datos["id_doctor"], "cancelada", 1), (datos["id_doctor"], "confirmada", 17),
+        (otro, "completada", 37), (otro, "cancelada", 0)
+    ]
+    with sesion_local() as db:
+        for i, (doctor, estado, anticipacion) in enumerate(pasadas):
+            db.add(CitaMedica(id_paciente=datos["id_paciente"], id_doctor=doctor, fecha=hoy - timedelta(days=3),
+                              hora=time(8 + i, 0), motivo="Control general", estado=estado,
+                              created_at=datetime.combine(hoy - timedelta(days=3 + anticipacion), time(12, 0))))
+        db.commit()
+        estadisticas_repository.reconstruir(db)
+    # Una cita futura registrada por la API se suma sin reconstruir; no cuenta como inasistencia
+    client.post("/api/citas", json=_cita(datos, hoy + timedelta(days=2), time(9, 0)))
+
+    def tasas(por):
+        return client.get("/api/reportes/tasas-cancelacion", headers=_admin(), params={
+            "por": por, "fecha_desde": str(hoy - timedelta(days=5)), "fecha_hasta": str(hoy + timedelta(days=5))
+        }).json()["data"]
+
+    campos = ("citas", "canceladas", "completadas", "no_asistidas", "tasa_cancelacion", "tasa_inasistencia")
+    por_doctor = tasas("doctor")
+    assert [(g["nombre"], *(g[c] for c in campos)) for g in por_doctor["grupos"]] == [
+        ("Laura Martínez", 5, 1, 1, 2, 0.2, 0.6667),
+        ("Doctor 777", 2, 1, 1, 0, 0.5, 0.0)
+    ]
+    assert [por_doctor["total"][c] for c in campos] == [7, 2, 2, 2, 0.2857, 0.5]
+
+    assert [(g["nombre"], *(g[c] for c in campos)) for g in tasas("anticipacion")["grupos"]] == [
+        ("Mismo día", 2, 1, 0, 1, 0.5, 1.0),
+        ("1 día", 1, 1, 0, 0, 1.0, None),
+        ("2 a 7 días", 2, 0, 1, 0, 0.0, 0.0),
+        ("15 a 30 días", 1, 0, 0, 1, 0.0, 1.0),
+        ("31 días o más", 1, 0, 1, 0, 0.0, 0.0)
+    ]
+
+
+def test_tramo_de_anticipacion_usa_el_mismo_registro_al_crear_y_al_cambiar(client, datos, sesion_local, monkeypatch):
+    class RelojAtrasado(datetime):
+        """Reloj de la aplicación en otro día que el CURRENT_TIMESTAMP de la base de datos"""
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) - timedelta(days=2)
+
+    monkeypatch.setattr(citas_repository, "datetime", RelojAtrasado)
+    manana = date.today() + timedelta(days=1)
+    id_cita = client.post("/api/citas", json=_cita(datos, manana, time(9, 0))).json()["data"]["id_cita"]
+    client.post("/api/citas/lote", json={
+        "id_paciente": datos["id_paciente"], "id_doctor": datos["id_doctor"], "motivo": "Terapia semanal",
+        "ocurrencias": [{"fecha": str(manana), "hora": "10:00:00"}]
+    })
+    client.put(f"/api/citas/{id_cita}/estado", json={"estado": "confirmada"})
+    client.delete(f"/api/citas/{id_cita}")
+
+    def acumulado():
+        with sesion_local() as db:
+            return sorted(
+                (f.anticipacion, f.estado, f.citas) for f in db.query(EstadisticaAnticipacion)
+                if f.citas != 0
+            )
+
+    incremental = acumulado()
+    # Registradas (según la aplicación) tres días antes de la cita: tramo "2 a 7 días"
+    assert incremental == [(2, "cancelada", 1), (2, "pendiente", 1)]
+    with sesion_local() as db:
+        estadisticas_repository.reconstruir(db)
+    assert acumulado() == incremental